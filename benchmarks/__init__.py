@@ -0,0 +1,8 @@
+"""
+Benchmark suite of the ecodev_cloud library, run against local stand-ins (MinIO and Azurite)
+of the cloud object storages (see docker-compose.override.yml).
+
+Run all suites (or some of them) from the dev container with
+    python3 -m benchmarks [--suites load_save listing] [--output results.jsonl]
+Every measure is emitted as one json line, to be tracked over time.
+"""
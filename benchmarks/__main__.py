@@ -0,0 +1,53 @@
+"""
+Entry point running the benchmark suites: python3 -m benchmarks --help
+"""
+import argparse
+from pathlib import Path
+from typing import Callable
+
+from benchmarks import bench_compression
+from benchmarks import bench_decoding
+from benchmarks import bench_exists
+from benchmarks import bench_listing
+from benchmarks import bench_load_save
+from benchmarks import bench_memory
+from benchmarks import bench_mmap
+from benchmarks import bench_transfer
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import create_locations
+from benchmarks.bench_utils import delete_locations
+from benchmarks.bench_utils import write_results
+from ecodev_cloud.cloud.cloud import Cloud
+
+SUITES: dict[str, Callable[[list[Cloud]], list[BenchResult]]] = {
+    bench_load_save.SUITE: bench_load_save.run,
+    bench_listing.SUITE: bench_listing.run,
+    bench_transfer.SUITE: bench_transfer.run,
+    bench_exists.SUITE: bench_exists.run,
+    bench_mmap.SUITE: bench_mmap.run,
+    bench_compression.SUITE: bench_compression.run,
+    bench_decoding.SUITE: bench_decoding.run,
+    bench_memory.SUITE: bench_memory.run,
+}
+
+
+def main() -> None:
+    """
+    Run the selected benchmark suites against the selected clouds and emit their json lines
+    """
+    parser = argparse.ArgumentParser(description='ecodev_cloud benchmarks')
+    parser.add_argument('--suites', nargs='+', choices=list(SUITES), default=list(SUITES))
+    parser.add_argument('--clouds', nargs='+', type=Cloud, default=list(Cloud))
+    parser.add_argument('--output', type=Path, default=None, help='json lines file to append to')
+    args = parser.parse_args()
+
+    create_locations()
+    try:
+        for suite in args.suites:
+            write_results(SUITES[suite](args.clouds), args.output)
+    finally:
+        delete_locations()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of wire compression of text-like files: stored bytes and save / load latencies
+"""
+from benchmarks.bench_load_save import GENERATORS
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from benchmarks.bench_utils import object_size
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import JSON_EXT
+from ecodev_cloud.file_processing.compression_processing import GZIP_ENCODING
+from ecodev_cloud.file_processing.compression_processing import zstandard
+from ecodev_cloud.file_processing.compression_processing import ZSTD_ENCODING
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'compression'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/compression'
+SIZE = 16 * 1024 * 1024
+EXTENSIONS = [CSV_EXT, JSON_EXT]
+
+
+def run(clouds: list[Cloud], repeat: int = 5) -> list[BenchResult]:
+    """
+    Benchmark save and load of SIZE bytes csv and json files, uncompressed and compressed with
+     every available encoding. The size column holds the number of stored bytes.
+    """
+    encodings = [None, GZIP_ENCODING] + ([ZSTD_ENCODING] if zstandard else [])
+    results = []
+    for cloud in clouds:
+        location = BENCH_LOCATIONS[cloud]
+        for extension in EXTENSIONS:
+            data = GENERATORS[extension](SIZE)
+            for encoding in encodings:
+                file_path = BENCH_DIRECTORY / f'{encoding or "raw"}/example{extension}'
+                case = f'{extension[1:]}_{encoding or "raw"}'
+                save_cloud_data(file_path, data, cloud=cloud, location=location,
+                                compression=encoding)
+                size = object_size(file_path, cloud)
+                results.append(measure(SUITE, case, cloud, 'save', lambda: save_cloud_data(
+                    file_path, data, cloud=cloud, location=location, compression=encoding),
+                    size, repeat))
+                results.append(measure(SUITE, case, cloud, 'load', lambda: load_cloud_data(
+                    file_path, cloud=cloud, location=location), size, repeat))
+    return results
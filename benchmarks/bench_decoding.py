@@ -0,0 +1,48 @@
+"""
+Benchmark of bulk loads of CPU heavy formats: decoding threads against 1 to N decoding processes
+"""
+import os
+
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from benchmarks.bench_utils import object_size
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_copy_file
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_batch
+from ecodev_cloud.constants import GPKG_EXT
+from ecodev_cloud.constants import NETCDF_EXT
+from ecodev_cloud.constants import TIF_EXT
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'decoding'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/decoding'
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+EXTENSIONS = [TIF_EXT, NETCDF_EXT, GPKG_EXT]
+COPIES = 32
+
+
+def run(clouds: list[Cloud], repeat: int = 3) -> list[BenchResult]:
+    """
+    Benchmark the bulk load of COPIES copies of every example file, decoded by threads (operation
+     threads) then by pools of 1, 2, 4... processes up to the number of cores.
+    """
+    cores = os.cpu_count() or 1
+    counts = sorted({min(2 ** power, cores) for power in range(cores.bit_length() + 1)})
+    results = []
+    for cloud in clouds:
+        location = BENCH_LOCATIONS[cloud]
+        for extension in EXTENSIONS:
+            example = DATA_DIRECTORY / f'example{extension}'
+            file_paths = [BENCH_DIRECTORY / f'{index}{extension}' for index in range(COPIES)]
+            for file_path in file_paths:
+                cloud_copy_file(example, file_path, cloud=cloud, location=location)
+            size = COPIES * object_size(file_paths[0], cloud)
+            results.append(measure(SUITE, extension[1:], cloud, 'threads',
+                                   lambda: load_cloud_batch(file_paths, cloud=cloud,
+                                                            location=location), size, repeat))
+            results.extend(measure(SUITE, extension[1:], cloud, f'{count}_processes',
+                                   lambda: load_cloud_batch(file_paths, cloud=cloud,
+                                                            location=location, processes=count),
+                                   size, repeat) for count in counts)
+    return results
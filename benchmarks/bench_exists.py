@@ -0,0 +1,51 @@
+"""
+Benchmark of bulk existence checks: cloud_exists_many against one check per path
+"""
+from pathlib import Path
+
+from benchmarks.bench_listing import FOLDERS
+from benchmarks.bench_listing import populate
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from ecodev_cloud.cloud.blob.blob_helpers import blob_exists
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_exists_many
+from ecodev_cloud.cloud.s3.s3_helpers import s3_exists
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'exists'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/exists'
+KEY_COUNT = 10000
+
+
+def run(clouds: list[Cloud], repeat: int = 3) -> list[BenchResult]:
+    """
+    Benchmark existence checks of paths clustered in one folder (half of them missing), and of
+     paths scattered over FOLDERS folders. The requests column holds the request count savings.
+    """
+    results = []
+    for cloud in clouds:
+        populate(cloud, BENCH_DIRECTORY, KEY_COUNT)
+        cases = {
+            'clustered': [BENCH_DIRECTORY / f'0/{index}.txt'
+                          for index in range(0, KEY_COUNT, FOLDERS // 2)],
+            'scattered': [BENCH_DIRECTORY / f'{index}/{index}.txt' for index in range(FOLDERS)],
+        }
+        for case, file_paths in cases.items():
+            results.extend(_bench_exists(cloud, case, file_paths, repeat))
+    return results
+
+
+def _bench_exists(cloud: Cloud, case: str, file_paths: list[Path], repeat: int
+                  ) -> list[BenchResult]:
+    """
+    Benchmark the existence check of file_paths, one path at a time then in bulk
+    """
+    location = BENCH_LOCATIONS[cloud]
+    exists = blob_exists if cloud == Cloud.AZURE else s3_exists
+    return [measure(SUITE, case, cloud, 'one_by_one',
+                    lambda: [exists(fp, location=location) for fp in file_paths], 0, repeat),
+            measure(SUITE, case, cloud, 'bulk',
+                    lambda: cloud_exists_many(file_paths, cloud=cloud, location=location),
+                    0, repeat)]
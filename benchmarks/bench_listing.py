@@ -0,0 +1,64 @@
+"""
+Benchmark of cloud_rglob / cloud_iterdir over large synthetic prefixes
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from ecodev_cloud.cloud.blob.blob_container import container
+from ecodev_cloud.cloud.blob.blob_helpers import blob_iterdir
+from ecodev_cloud.cloud.blob.blob_helpers import blob_rglob
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.s3.s3_bucket import s3
+from ecodev_cloud.cloud.s3.s3_helpers import s3_iterdir
+from ecodev_cloud.cloud.s3.s3_helpers import s3_rglob
+from ecodev_cloud.path_utils import forge_key
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'listing'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/listing'
+KEY_COUNTS = [1000, 10000]
+FOLDERS = 100
+
+
+def run(clouds: list[Cloud], key_counts: list[int] | None = None, repeat: int = 3
+        ) -> list[BenchResult]:
+    """
+    Benchmark recursive and direct listings of prefixes holding key_counts (tiny) objects,
+     spread over FOLDERS sub folders.
+    """
+    results = []
+    for cloud in clouds:
+        for count in key_counts or KEY_COUNTS:
+            folder = BENCH_DIRECTORY / str(count)
+            populate(cloud, folder, count)
+            rglob, iterdir = (blob_rglob, blob_iterdir) if cloud == Cloud.AZURE else (
+                s3_rglob, s3_iterdir)
+            location = BENCH_LOCATIONS[cloud]
+            results.append(measure(SUITE, f'{count}_keys', cloud, 'rglob',
+                                   lambda: list(rglob(folder, location=location)), 0, repeat))
+            results.append(measure(SUITE, f'{count}_keys', cloud, 'iterdir',
+                                   lambda: list(iterdir(folder, location=location)), 0, repeat))
+    return results
+
+
+def populate(cloud: Cloud, folder: Path, count: int) -> None:
+    """
+    Create count empty objects in folder (done with raw concurrent puts, not benchmarked)
+    """
+    keys = [forge_key(folder / f'{index % FOLDERS}/{index}.txt') for index in range(count)]
+    if cloud == Cloud.AZURE:
+        blob_container = container(BENCH_LOCATIONS[cloud])
+
+        def put(key: str) -> None:
+            blob_container.upload_blob(name=key, data=b'', overwrite=True)
+    else:
+        client = s3().meta.client
+
+        def put(key: str) -> None:
+            client.put_object(Bucket=BENCH_LOCATIONS[cloud], Key=key, Body=b'')
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(put, keys))
@@ -0,0 +1,128 @@
+"""
+Benchmark of save_cloud_data / load_cloud_data for every supported extension at several sizes
+"""
+import tempfile
+from pathlib import Path
+from typing import Any
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from shapely.geometry import Polygon
+
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from benchmarks.bench_utils import object_size
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_copy_file
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import GPKG_EXT
+from ecodev_cloud.constants import JSON_EXT
+from ecodev_cloud.constants import LATEX_EXT
+from ecodev_cloud.constants import NETCDF_EXT
+from ecodev_cloud.constants import NPY_EXT
+from ecodev_cloud.constants import NPY_NPZ_EXT
+from ecodev_cloud.constants import SHP_EXT
+from ecodev_cloud.constants import TIF_EXT
+from ecodev_cloud.constants import TXT_EXT
+from ecodev_cloud.constants import XLSX_EXT
+from ecodev_cloud.constants import ZIP_EXT
+from ecodev_cloud.path_utils import forge_store_path
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'load_save'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/load_save'
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+SIZES = [10 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+XLSX_MAX_SIZE = 1024 * 1024
+GENERATORS: dict[str, Callable[[int], Any]] = {
+    NPY_EXT: lambda size: np.random.rand(size // 8),
+    NPY_NPZ_EXT: lambda size: np.random.rand(size // 8),
+    CSV_EXT: lambda size: _dataframe(size),
+    XLSX_EXT: lambda size: {'bla': _dataframe(min(size, XLSX_MAX_SIZE))},
+    JSON_EXT: lambda size: [{'index': i, 'value': str(i)} for i in range(size // 32)],
+    TXT_EXT: lambda size: 'benchmark line\n' * (size // 15),
+    LATEX_EXT: lambda size: 'benchmark line\n' * (size // 15),
+    SHP_EXT: lambda size: _polygon(size),
+}
+"""
+Extensions without a saver at all sizes: the example test file is uploaded as is
+"""
+EXAMPLES: list[str] = [TIF_EXT, NETCDF_EXT, GPKG_EXT]
+
+
+def run(clouds: list[Cloud], sizes: list[int] | None = None, repeat: int = 5
+        ) -> list[BenchResult]:
+    """
+    Benchmark save and load of every extension, for all clouds and sizes
+    """
+    results = []
+    for cloud in clouds:
+        for extension, generator in GENERATORS.items():
+            for size in sizes or SIZES:
+                file_path = BENCH_DIRECTORY / f'{size}/example{extension}'
+                results.extend(_bench_save_load(cloud, file_path, generator(size), repeat))
+        results.extend(_bench_zip(cloud, sizes or SIZES, repeat))
+        for extension in EXAMPLES:
+            results.append(_bench_example(cloud, DATA_DIRECTORY / f'example{extension}', repeat))
+    return results
+
+
+def _bench_save_load(cloud: Cloud, file_path: Path, data: Any, repeat: int) -> list[BenchResult]:
+    """
+    Benchmark the save then the load of data at file_path
+    """
+    location, case = BENCH_LOCATIONS[cloud], f'{file_path.parent.name}{file_path.suffix}'
+    save_cloud_data(file_path, data, cloud=cloud, location=location)
+    size = object_size(forge_store_path(file_path), cloud)
+    return [measure(SUITE, case, cloud, 'save',
+                    lambda: save_cloud_data(file_path, data, cloud=cloud, location=location),
+                    size, repeat),
+            measure(SUITE, case, cloud, 'load',
+                    lambda: load_cloud_data(file_path, cloud=cloud, location=location),
+                    size, repeat)]
+
+
+def _bench_zip(cloud: Cloud, sizes: list[int], repeat: int) -> list[BenchResult]:
+    """
+    Benchmark zipped folders: a folder of 10 random binary files per size
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            for index in range(10):
+                (Path(folder) / f'file_{index}.bin').write_bytes(np.random.bytes(size // 10))
+            results.extend(_bench_save_load(
+                cloud, BENCH_DIRECTORY / f'{size}/example{ZIP_EXT}', Path(folder), repeat))
+    return results
+
+
+def _bench_example(cloud: Cloud, file_path: Path, repeat: int) -> BenchResult:
+    """
+    Benchmark the load of an example test file
+    """
+    location = BENCH_LOCATIONS[cloud]
+    cloud_copy_file(file_path, file_path, cloud=cloud, location=location)
+    return measure(SUITE, f'example{file_path.suffix}', cloud, 'load',
+                   lambda: load_cloud_data(file_path, cloud=cloud, location=location),
+                   object_size(file_path, cloud), repeat)
+
+
+def _dataframe(size: int) -> pd.DataFrame:
+    """
+    Random dataframe of roughly size bytes once written as csv
+    """
+    rows = max(1, size // 40)
+    return pd.DataFrame({'key': np.arange(rows), 'value': np.random.rand(rows),
+                         'label': np.random.choice(['a', 'b', 'c'], rows)})
+
+
+def _polygon(size: int) -> Polygon:
+    """
+    Polygon (a circle) with a number of vertices proportional to size
+    """
+    angles = np.linspace(0, 2 * np.pi, max(4, size // 16))
+    return Polygon(zip(np.cos(angles), np.sin(angles)))
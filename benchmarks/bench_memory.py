@@ -0,0 +1,77 @@
+"""
+Benchmark of the cloud read path memory: peak memory of a load relative to the object size
+"""
+import multiprocessing
+import resource
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from benchmarks.bench_utils import MEGA
+from benchmarks.bench_utils import object_size
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfData
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfVariable
+from ecodev_cloud.file_processing.tif_processing import GeoArray
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'memory'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/memory'
+SIZE = 256 * MEGA
+WIDTH = 4096
+
+
+def run(clouds: list[Cloud], repeat: int = 3) -> list[BenchResult]:
+    """
+    Benchmark the load of about SIZE bytes objects (npy, and netcdf and tif opened without
+     reading their values). Each case gives two results: load (peak python memory, traced) and
+     load_rss (peak RSS increase of a fresh process doing it once), to be compared with size
+     (the stored object size): a copy free read path peaks close to 1x.
+    """
+    rows = SIZE // 4 // WIDTH
+    array = np.random.rand(rows, WIDTH).astype(np.float32)
+    data = {BENCH_DIRECTORY / 'array.npy': array,
+            BENCH_DIRECTORY / 'array.nc': NetcdfData(
+                dimensions={'y': rows, 'x': WIDTH},
+                variables={'values': NetcdfVariable(array, ('y', 'x'), chunks=(256, WIDTH))}),
+            BENCH_DIRECTORY / 'array.tif': GeoArray(array, (0., 1., 0., 0., 0., -1.), '')}
+    results = []
+    for cloud in clouds:
+        for file_path, file_data in data.items():
+            save_cloud_data(file_path, file_data, cloud=cloud, location=BENCH_LOCATIONS[cloud])
+            results.extend(_bench_memory(cloud, file_path, repeat))
+    return results
+
+
+def _bench_memory(cloud: Cloud, file_path: Path, repeat: int) -> list[BenchResult]:
+    """
+    Benchmark the load of file_path object from cloud
+    """
+    size = object_size(file_path, cloud)
+    result = measure(SUITE, file_path.name, cloud, 'load', lambda: _load(cloud, file_path),
+                     size, repeat)
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        rss = pool.apply(_peak_rss_increase, (cloud, file_path))
+    return [result, result.model_copy(update={'operation': 'load_rss',
+                                              'peak_memory_mb': rss / MEGA})]
+
+
+def _load(cloud: Cloud, file_path: Path) -> None:
+    """
+    Load file_path object
+    """
+    load_cloud_data(file_path, cloud=cloud, location=BENCH_LOCATIONS[cloud])
+
+
+def _peak_rss_increase(cloud: Cloud, file_path: Path) -> int:
+    """
+    Peak RSS increase (in bytes) of the current process during one _load
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _load(cloud, file_path)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024
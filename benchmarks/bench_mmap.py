@@ -0,0 +1,70 @@
+"""
+Benchmark of memory mapped npy loading: peak RSS of a partial scan, fully loaded or memory mapped
+"""
+import multiprocessing
+import resource
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_utils import BENCH_LOCATIONS
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from benchmarks.bench_utils import MEGA
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.disk.disk_saver import disk_save
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+SUITE = 'mmap'
+BENCH_DIRECTORY = ROOT_DIRECTORY / 'benchmarks/mmap'
+SIZE = 256 * MEGA
+SCANNED = 0.01
+
+
+def run(clouds: list[Cloud], repeat: int = 3) -> list[BenchResult]:
+    """
+    Benchmark the load of a SIZE bytes npy array followed by the scan of its first SCANNED part,
+     from disk and from clouds, with and without memory mapping. peak_memory_mb holds the peak RSS
+     increase of a fresh process doing it once.
+    """
+    file_path = BENCH_DIRECTORY / 'array.npy'
+    data = np.random.rand(SIZE // 8)
+    disk_save(file_path, data)
+    results = [_bench_mmap(None, file_path, mmap, repeat) for mmap in [False, True]]
+    for cloud in clouds:
+        save_cloud_data(file_path, data, cloud=cloud, location=BENCH_LOCATIONS[cloud])
+        results.extend(_bench_mmap(cloud, file_path, mmap, repeat) for mmap in [False, True])
+    return results
+
+
+def _bench_mmap(cloud: Cloud | None, file_path: Path, mmap: bool, repeat: int) -> BenchResult:
+    """
+    Benchmark the partial scan of file_path array, from disk if no cloud is passed
+    """
+    result = measure(SUITE, file_path.name, cloud or Cloud.AWS, 'mmap' if mmap else 'full',
+                     lambda: _scan(cloud, file_path, mmap), SIZE, repeat)
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        rss = pool.apply(_peak_rss_increase, (cloud, file_path, mmap))
+    return result.model_copy(update={'peak_memory_mb': rss / MEGA,
+                                     'cloud': 'disk' if cloud is None else cloud.value})
+
+
+def _scan(cloud: Cloud | None, file_path: Path, mmap: bool) -> float:
+    """
+    Load file_path array and sum its first SCANNED part
+    """
+    array = disk_load(file_path, mmap=mmap) if cloud is None else load_cloud_data(
+        file_path, cloud=cloud, location=BENCH_LOCATIONS[cloud], mmap=mmap)
+    return float(array[:int(len(array) * SCANNED)].sum())
+
+
+def _peak_rss_increase(cloud: Cloud | None, file_path: Path, mmap: bool) -> int:
+    """
+    Peak RSS increase (in bytes) of the current process during one _scan
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _scan(cloud, file_path, mmap)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024
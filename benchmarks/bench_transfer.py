@@ -0,0 +1,63 @@
+"""
+Benchmark of the migrations to Azure blob storage: many small files versus a few large ones
+"""
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_utils import BENCH_BUCKET
+from benchmarks.bench_utils import BENCH_CONTAINER
+from benchmarks.bench_utils import BenchResult
+from benchmarks.bench_utils import measure
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.s3.s3_helpers import s3_copy_file
+from ecodev_cloud.constants import TXT_EXT
+from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.transfer.disk_to_blob import transfer_disk_to_blob
+from ecodev_cloud.transfer.s3_to_blob import transfer_s3_to_blob
+
+SUITE = 'transfer'
+"""
+(number of files, size of each file) of every benchmarked migration: same total volume
+"""
+LAYOUTS: list[tuple[int, int]] = [(500, 16 * 1024), (2, 4 * 1024 * 1024)]
+
+
+def run(clouds: list[Cloud], layouts: list[tuple[int, int]] | None = None, repeat: int = 3
+        ) -> list[BenchResult]:
+    """
+    Benchmark disk to blob and S3 to blob migrations for all layouts (clouds are not used: the
+     migrations are always towards Azure)
+    """
+    results = []
+    for count, size in layouts or LAYOUTS:
+        with tempfile.TemporaryDirectory(dir=Path.cwd()) as folder:
+            root = Path(folder) / 'transfer' / f'{count}x{size}'
+            root.mkdir(parents=True)
+            # extension of FILE_EXTENSIONS, so that S3 listings see files and not folders
+            for index in range(count):
+                (root / f'{index}{TXT_EXT}').write_bytes(np.random.bytes(size))
+            results.append(measure(SUITE, f'{count}x{size}', Cloud.AZURE, 'disk_to_blob',
+                                   lambda: _migrate(transfer_disk_to_blob, root),
+                                   count * size, repeat))
+            for file_path in disk_rglob(root, include_dirs=False):
+                s3_copy_file(file_path, file_path, location=BENCH_BUCKET)
+            results.append(measure(SUITE, f'{count}x{size}', Cloud.AZURE, 's3_to_blob',
+                                   lambda: _migrate(_s3_to_blob, root), count * size, repeat))
+    return results
+
+
+def _migrate(transfer, root: Path) -> None:
+    """
+    Run a full migration of root (with a fresh index, so that every file is transferred)
+    """
+    with tempfile.TemporaryDirectory() as index_folder:
+        transfer([root], Path(index_folder), container=BENCH_CONTAINER)
+
+
+def _s3_to_blob(folders: list[Path], index_folder: Path, container: str) -> None:
+    """
+    S3 to blob migration from the benchmark bucket
+    """
+    transfer_s3_to_blob(folders, index_folder, bucket=BENCH_BUCKET, container=container)
@@ -0,0 +1,175 @@
+"""
+Module implementing the measuring helpers shared by all benchmarks
+"""
+import contextlib
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from unittest import mock
+
+from pydantic import BaseModel
+from urllib3.connectionpool import HTTPConnectionPool
+
+from ecodev_cloud.cloud.blob.blob_container import container
+from ecodev_cloud.cloud.blob.blob_container import create_container
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.s3.s3_bucket import s3
+from ecodev_cloud.path_utils import forge_key
+
+BENCH_BUCKET = 'benchbucket'
+BENCH_CONTAINER = 'benchblob'
+BENCH_LOCATIONS: dict[Cloud, str] = {
+    Cloud.AWS: BENCH_BUCKET,
+    Cloud.AZURE: BENCH_CONTAINER
+}
+MEGA = 1024 * 1024
+
+
+class BenchResult(BaseModel):
+    """
+    One benchmark measure: latencies (in ms) of the repeated operation and related counters
+    """
+    suite: str
+    case: str
+    cloud: str
+    operation: str
+    size: int
+    repeat: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_mb_s: float
+    requests: float
+    peak_memory_mb: float
+    timestamp: str
+
+
+class RequestCounter:
+    """
+    Thread safe counter of the HTTP requests sent to the cloud object storages
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self) -> None:
+        """
+        Record one request
+        """
+        with self._lock:
+            self.count += 1
+
+
+@contextlib.contextmanager
+def count_requests() -> Iterator[RequestCounter]:
+    """
+    Count all HTTP requests (both boto3 and azure go through urllib3 connection pools)
+    """
+    counter, original = RequestCounter(), HTTPConnectionPool.urlopen
+
+    def counting_urlopen(pool, *args, **kwargs):
+        counter.add()
+        return original(pool, *args, **kwargs)
+
+    with mock.patch.object(HTTPConnectionPool, 'urlopen', counting_urlopen):
+        yield counter
+
+
+def measure(suite: str,
+            case: str,
+            cloud: Cloud,
+            operation: str,
+            func: Callable[[], Any],
+            size: int,
+            repeat: int = 5
+            ) -> BenchResult:
+    """
+    Run func repeat times, and measure its latencies, request count and peak python memory.
+    size is the number of bytes moved by one func call (used to compute the throughput).
+    """
+    latencies = []
+    with count_requests() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return BenchResult(suite=suite, case=case, cloud=cloud.value, operation=operation, size=size,
+                       repeat=repeat, p50_ms=_percentile(latencies, 50),
+                       p95_ms=_percentile(latencies, 95), p99_ms=_percentile(latencies, 99),
+                       mean_ms=statistics.fmean(latencies),
+                       throughput_mb_s=size / MEGA / (statistics.median(latencies) / 1000),
+                       requests=counter.count / repeat, peak_memory_mb=peak_memory(func) / MEGA,
+                       timestamp=datetime.now(timezone.utc).isoformat())
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """
+    Peak python memory allocated (in bytes) during one func call (run apart from the timed runs,
+     tracing allocations being slow)
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def object_size(file_path: Path, cloud: Cloud) -> int:
+    """
+    Size in bytes of the object stored at file_path in the benchmark bucket/container
+    """
+    if cloud == Cloud.AZURE:
+        blob = container(BENCH_CONTAINER).get_blob_client(forge_key(file_path))
+        return blob.get_blob_properties().size
+    return s3().Object(bucket_name=BENCH_BUCKET, key=forge_key(file_path)).content_length
+
+
+def create_locations() -> None:
+    """
+    Create (in an idempotent way) the benchmark bucket and container
+    """
+    with contextlib.suppress(Exception):
+        s3().meta.client.create_bucket(Bucket=BENCH_BUCKET)
+    create_container(BENCH_CONTAINER)
+
+
+def delete_locations() -> None:
+    """
+    Delete the benchmark bucket and container along with all their content
+    """
+    with contextlib.suppress(Exception):
+        s3().Bucket(BENCH_BUCKET).objects.all().delete()
+        s3().meta.client.delete_bucket(Bucket=BENCH_BUCKET)
+    with contextlib.suppress(Exception):
+        container(BENCH_CONTAINER).delete_container()
+
+
+def write_results(results: list[BenchResult], output: Path | None) -> None:
+    """
+    Emit results as json lines, either on stdout or appended to the output file
+    """
+    lines = [json.dumps(result.model_dump()) for result in results]
+    if not output:
+        print('\n'.join(lines))
+        return
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write(''.join(f'{line}\n' for line in lines))
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    """
+    percent-th percentile (nearest rank) of passed values
+    """
+    ranked = sorted(values)
+    return ranked[min(len(ranked) - 1, max(0, round(percent / 100 * len(ranked)) - 1))]
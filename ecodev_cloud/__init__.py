@@ -5,18 +5,36 @@ from ecodev_cloud.cloud.blob.blob_container import CONTAINER
 from ecodev_cloud.cloud.blob.blob_container import container
 from ecodev_cloud.cloud.cloud import CLOUD
 from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud_bandwidth import bandwidth_throughput
+from ecodev_cloud.cloud.cloud_bandwidth import set_bandwidth
+from ecodev_cloud.cloud.cloud_dataset import load_cloud_dataset
+from ecodev_cloud.cloud.cloud_dataset import save_cloud_dataset
 from ecodev_cloud.cloud.cloud_helpers import cloud_copy_file
+from ecodev_cloud.cloud.cloud_helpers import cloud_du
 from ecodev_cloud.cloud.cloud_helpers import cloud_exists
+from ecodev_cloud.cloud.cloud_helpers import cloud_exists_many
 from ecodev_cloud.cloud.cloud_helpers import cloud_is_dir
 from ecodev_cloud.cloud.cloud_helpers import cloud_iterdir
 from ecodev_cloud.cloud.cloud_helpers import cloud_move_file
 from ecodev_cloud.cloud.cloud_helpers import cloud_move_folder
 from ecodev_cloud.cloud.cloud_helpers import cloud_rglob
+from ecodev_cloud.cloud.cloud_helpers import cloud_scan
 from ecodev_cloud.cloud.cloud_helpers import delete_cloud_content
 from ecodev_cloud.cloud.cloud_helpers import download_cloud_object
 from ecodev_cloud.cloud.cloud_helpers import get_cloud_url
+from ecodev_cloud.cloud.cloud_helpers import get_cloud_urls
+from ecodev_cloud.cloud.cloud_inventory import cloud_inventory
+from ecodev_cloud.cloud.cloud_inventory import refresh_inventory
+from ecodev_cloud.cloud.cloud_loaders import cloud_iter_load
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_batch
 from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_pack
+from ecodev_cloud.cloud.cloud_savers import save_cloud_batch
 from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_pack
+from ecodev_cloud.cloud.cloud_tier import flush_tier
+from ecodev_cloud.cloud.cloud_tier import tiered_storage
 from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
 from ecodev_cloud.cloud.s3.s3_bucket import s3
 from ecodev_cloud.disk.disk_helpers import disk_copy
@@ -25,17 +43,34 @@ from ecodev_cloud.disk.disk_helpers import disk_is_dir
 from ecodev_cloud.disk.disk_helpers import disk_iterdir
 from ecodev_cloud.disk.disk_helpers import disk_move
 from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.disk.disk_helpers import disk_scan
 from ecodev_cloud.disk.disk_loader import disk_load
 from ecodev_cloud.disk.disk_saver import disk_save
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfData
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfVariable
 from ecodev_cloud.file_processing.shapely_processing import load_points
 from ecodev_cloud.file_processing.shapely_processing import load_polygon
 from ecodev_cloud.file_processing.shapely_processing import load_polygons
+from ecodev_cloud.file_processing.shapely_processing import VectorLayer
+from ecodev_cloud.file_processing.tif_processing import GeoArray
+from ecodev_cloud.transfer.cloud_transfer import cloud_transfer
 from ecodev_cloud.transfer.disk_to_blob import transfer_disk_to_blob
+from ecodev_cloud.transfer.migration_leases import CloudLeaseStore
+from ecodev_cloud.transfer.migration_leases import DiskLeaseStore
+from ecodev_cloud.transfer.migration_verify import verify_transfer
 from ecodev_cloud.transfer.s3_to_blob import transfer_s3_to_blob
 
 __all__ = ['save_cloud_data', 'container', 'CONTAINER', 's3', 'BUCKET', 'Cloud', 'CLOUD',
            'cloud_move_folder', 'cloud_copy_file', 'cloud_move_file', 'get_cloud_url',
            'cloud_is_dir', 'cloud_rglob', 'cloud_iterdir', 'cloud_exists', 'download_cloud_object',
            'delete_cloud_content', 'load_cloud_data', 'disk_is_dir', 'disk_rglob', 'disk_iterdir',
-           'disk_exists', 'disk_copy', 'disk_move', 'disk_load', 'disk_save', 'load_points',
-           'load_polygon', 'load_polygons', 'transfer_disk_to_blob', 'transfer_s3_to_blob']
+           'disk_scan', 'disk_exists', 'disk_copy', 'disk_move', 'disk_load', 'disk_save',
+           'load_points', 'load_polygon', 'load_polygons', 'transfer_disk_to_blob',
+           'transfer_s3_to_blob', 'tiered_storage', 'flush_tier', 'load_cloud_batch',
+           'save_cloud_batch', 'get_cloud_urls', 'cloud_exists_many',
+           'cloud_iter_load', 'cloud_transfer', 'CloudEntry', 'cloud_scan', 'cloud_du',
+           'GeoArray', 'NetcdfData', 'NetcdfVariable',
+           'VectorLayer', 'DiskLeaseStore', 'CloudLeaseStore', 'cloud_inventory',
+           'refresh_inventory', 'set_bandwidth', 'bandwidth_throughput',
+           'verify_transfer', 'save_cloud_pack', 'load_cloud_pack',
+           'save_cloud_dataset', 'load_cloud_dataset']
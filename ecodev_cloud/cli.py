@@ -0,0 +1,487 @@
+"""
+Module implementing the ecodev-cloud command line tool: parallel bulk operations over S3, Azure
+blob storage and local disk.
+
+Locations are given as s3://bucket/key, az://container/key or as local disk paths, e.g.
+    ecodev-cloud cp ./outputs s3://my-bucket/outputs --jobs 32
+    ecodev-cloud sync s3://my-bucket/outputs az://my-container/outputs --dry-run
+"""
+import argparse
+import shutil
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+
+from ecodev_core import make_dir
+
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_bandwidth import set_bandwidth
+from ecodev_cloud.cloud.cloud_helpers import cloud_copy_file
+from ecodev_cloud.cloud.cloud_helpers import cloud_du
+from ecodev_cloud.cloud.cloud_helpers import cloud_iterdir
+from ecodev_cloud.cloud.cloud_helpers import cloud_scan
+from ecodev_cloud.cloud.cloud_helpers import delete_cloud_content
+from ecodev_cloud.cloud.cloud_helpers import download_cloud_object
+from ecodev_cloud.cloud.cloud_retry import RETRY_CONF
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.disk.disk_helpers import disk_iterdir
+from ecodev_cloud.disk.disk_helpers import disk_scan
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from ecodev_cloud.transfer.cloud_transfer import cloud_transfer
+from ecodev_cloud.transfer.cloud_transfer import relay_object
+from ecodev_cloud.transfer.cloud_transfer import transfer_object
+from ecodev_cloud.transfer.disk_to_blob import transfer_disk_to_blob
+from ecodev_cloud.transfer.migration_helpers import SHARDS
+from ecodev_cloud.transfer.migration_leases import CloudLeaseStore
+from ecodev_cloud.transfer.migration_leases import DiskLeaseStore
+from ecodev_cloud.transfer.migration_verify import verify_transfer
+
+SCHEMES: dict[str, Cloud] = {
+    's3://': Cloud.AWS,
+    'az://': Cloud.AZURE
+}
+PROGRESS_PERIOD = 1.
+MEGA = 1024 * 1024
+
+
+class Location(NamedTuple):
+    """
+    Object or folder location: cloud and bucket/container (both None for local disk) and path
+    """
+    cloud: Cloud | None
+    location: str | None
+    path: Path
+
+    def at(self, path: Path) -> 'Location':
+        """
+        Same cloud and bucket/container, at another path
+        """
+        return self._replace(path=path)
+
+    def __str__(self) -> str:
+        if self.cloud is None:
+            return str(self.path)
+        scheme = next(scheme for scheme, cloud in SCHEMES.items() if cloud == self.cloud)
+        key = self.path.relative_to(ROOT_DIRECTORY).as_posix()
+        return f'{scheme}{self.location}/{"" if key == "." else key}'
+
+
+class Progress:
+    """
+    Thread safe progress of a bulk operation, reported on stderr every PROGRESS_PERIOD seconds
+    """
+
+    def __init__(self, operation: str) -> None:
+        self.operation = operation
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._report_periodically, daemon=True)
+
+    def __enter__(self) -> 'Progress':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.report(final=True)
+
+    def add(self, size: int, error: BaseException | None = None) -> None:
+        """
+        Record one processed file of size bytes (failed if error)
+        """
+        with self._lock:
+            self.files += 1
+            self.bytes += 0 if error else size
+            self.errors += 1 if error else 0
+
+    def report(self, final: bool = False) -> None:
+        """
+        Print the processed files and bytes along with the throughput
+        """
+        elapsed = time.perf_counter() - self._start
+        sys.stderr.write(f'\r{self.operation}: {self.files} files ({self.errors} failed), '
+                         f'{_human(self.bytes)} in {elapsed:.1f}s, '
+                         f'{_human(self.bytes / max(elapsed, 1e-9))}/s' + ('\n' if final else ''))
+        sys.stderr.flush()
+
+    def _report_periodically(self) -> None:
+        """
+        Report until stopped
+        """
+        while not self._stop.wait(PROGRESS_PERIOD):
+            self.report()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Entry point of the ecodev-cloud command line tool. Return the process exit code.
+    """
+    args = _parser().parse_args(argv)
+    if args.bandwidth:
+        set_bandwidth(limit=args.bandwidth * MEGA)
+    return args.command(args) or 0
+
+
+def parse_location(text: str) -> Location:
+    """
+    Location out of a s3://bucket/key, az://container/key or local disk path text
+    """
+    for scheme, cloud in SCHEMES.items():
+        if text.startswith(scheme):
+            location, _, key = text[len(scheme):].partition('/')
+            return Location(cloud, resolve_location(cloud, location or None),
+                            ROOT_DIRECTORY / key.strip('/'))
+    return Location(None, None, Path(text).absolute())
+
+
+def list_files(source: Location) -> Iterator[tuple[Path, int]]:
+    """
+    All files under source (or source itself if it is a file) along with their sizes
+    """
+    if source.cloud is None:
+        if source.path.is_file():
+            yield source.path, source.path.stat().st_size
+        elif source.path.is_dir():
+            yield from ((entry.path, entry.size) for entry in
+                        disk_scan(source.path, include_dirs=False))
+        return
+    for entry in cloud_scan(source.path, cloud=source.cloud, location=source.location):
+        if entry.path.is_relative_to(source.path):
+            yield entry.path, entry.size
+
+
+def copy_object(source: Location, dest: Location) -> None:
+    """
+    Copy the source object (or file) to dest, picking the cheapest path: server side copies
+     within a cloud, uploads and downloads from and to disk, streamed relay otherwise.
+    """
+    if dest.cloud is None:
+        make_dir(dest.path.parent)
+        if source.cloud is None:
+            shutil.copyfile(source.path, dest.path)
+        else:
+            download_cloud_object(source.path, dest.path, source.cloud, source.location)
+        return
+    dest_location = resolve_location(dest.cloud, dest.location)
+    if source.cloud is None:
+        cloud_copy_file(source.path, dest.path, cloud=dest.cloud, location=dest_location)
+        return
+    source_location = resolve_location(source.cloud, source.location)
+    if (source.cloud, source_location) == (dest.cloud, dest_location):
+        cloud_copy_file(source.path, dest.path, dist_origin=True, cloud=dest.cloud,
+                        location=dest_location)
+    elif source.path == dest.path:
+        transfer_object(source.path, source.cloud, source_location, dest.cloud, dest_location)
+    else:
+        relay_object(source.path, source.cloud, source_location, dest.cloud, dest_location,
+                     dest.path)
+
+
+def delete_object(target: Location) -> None:
+    """
+    Delete the target object (or file)
+    """
+    if target.cloud is None:
+        target.path.unlink()
+    else:
+        delete_cloud_content(target.path, target.cloud, target.location)
+
+
+def _ls(args: argparse.Namespace) -> None:
+    """
+    List a folder content (recursively along with sizes if asked to)
+    """
+    source = parse_location(args.source)
+    if args.recursive:
+        for file_path, size in list_files(source):
+            print(f'{size:>14}  {source.at(file_path)}')
+        return
+    children = disk_iterdir(source.path) if source.cloud is None else cloud_iterdir(
+        source.path, source.cloud, source.location)
+    for child in children:
+        print(source.at(child))
+
+
+def _du(args: argparse.Namespace) -> None:
+    """
+    Print the total size of a folder (or of its sub folders down to depth)
+    """
+    source = parse_location(args.source)
+    if source.cloud is None:
+        usage: dict[Path, int] = {}
+        for file_path, size in list_files(source):
+            folder = source.path.joinpath(*file_path.relative_to(source.path).parts[:args.depth])
+            usage[folder] = usage.get(folder, 0) + size
+    else:
+        usage = cloud_du(source.path, args.depth, cloud=source.cloud, location=source.location)
+    for folder, size in sorted(usage.items()):
+        print(f'{_human(size):>10}  {source.at(folder)}')
+
+
+def _cp(args: argparse.Namespace, delete_source: bool = False) -> int:
+    """
+    Copy (or move) a file or a folder content to another location
+    """
+    source, dest = parse_location(args.source), parse_location(args.dest)
+    plan = ((file_path, _dest_path(source, dest, file_path, args.dest), size)
+            for file_path, size in list_files(source))
+    return _run_plan('mv' if delete_source else 'cp', plan, source, dest, args,
+                     delete_source=delete_source)
+
+
+def _sync(args: argparse.Namespace) -> int:
+    """
+    Copy the files of a folder missing (or of a different size) in another folder, and delete the
+     extraneous ones if asked to
+    """
+    source, dest = parse_location(args.source), parse_location(args.dest)
+    existing = {file_path.relative_to(dest.path): size for file_path, size in list_files(dest)}
+    expected = set()
+    plan = []
+    for file_path, size in list_files(source):
+        expected.add(relative := file_path.relative_to(source.path))
+        if existing.get(relative) != size:
+            plan.append((file_path, dest.path / relative, size))
+    code = _run_plan('sync', plan, source, dest, args)
+    if args.delete:
+        extraneous = [(dest.path / relative, size) for relative, size in existing.items()
+                      if relative not in expected]
+        code = max(code, _run_deletes(extraneous, dest, args))
+    return code
+
+
+def _rm(args: argparse.Namespace) -> int:
+    """
+    Delete a file or all the files of a folder
+    """
+    target = parse_location(args.target)
+    return _run_deletes(list_files(target), target, args)
+
+
+def _migrate(args: argparse.Namespace) -> None:
+    """
+    Robust migration (same keys) of prefixes between two locations, resumable thanks to an index
+     folder, or sharded across all the workers running the same command if a lease folder is given
+    """
+    source, dest = parse_location(args.source), parse_location(args.dest)
+    if dest.cloud is None:
+        raise SystemExit('migrate: the destination must be a cloud location')
+    lease_store = _lease_store(args.leases, dest) if args.leases else None
+    if args.dry_run:
+        files, size = _count(list_files(source))
+        print(f'migrate (dry run): {files} files, {_human(size)} from {source} to {dest}')
+        return
+    start = time.perf_counter()
+    if source.cloud is None:
+        if dest.cloud != Cloud.AZURE:
+            raise SystemExit('migrate: disk content can only be migrated to Azure')
+        transfer_disk_to_blob([source.path], args.index_folder,
+                              resolve_location(dest.cloud, dest.location), lease_store=lease_store,
+                              shards=args.shards, max_workers=args.jobs)
+    else:
+        cloud_transfer(source.cloud, resolve_location(source.cloud, source.location), dest.cloud,
+                       resolve_location(dest.cloud, dest.location), source.path,
+                       args.index_folder, lease_store=lease_store, shards=args.shards,
+                       max_workers=args.jobs)
+    sys.stderr.write(f'migrate: done in {time.perf_counter() - start:.1f}s\n')
+
+
+def _verify(args: argparse.Namespace) -> int:
+    """
+    Verify a migration (same keys) out of listings and journaled checksums only. Return the exit
+     code (1 if any object is missing or differs).
+    """
+    source, dest = parse_location(args.source), parse_location(args.dest)
+    if dest.cloud is None:
+        raise SystemExit('verify: the destination must be a cloud location')
+    mismatches = verify_transfer(source.path, dest.cloud, dest.location, source.cloud,
+                                 source.location, args.index_folder)
+    for file_path, reason in sorted(mismatches.items()):
+        print(f'{source.at(file_path)}: {reason}')
+    return 1 if mismatches else 0
+
+
+def _run_plan(operation: str,
+              plan: Iterable[tuple[Path, Path, int]],
+              source: Location,
+              dest: Location,
+              args: argparse.Namespace,
+              delete_source: bool = False
+              ) -> int:
+    """
+    Copy (concurrently, with --jobs workers) all planned (source path, dest path, size) files,
+     deleting sources once copied if asked to. Return the exit code (1 if any copy failed).
+    """
+    if args.dry_run:
+        for file_path, dest_path, size in plan:
+            print(f'{operation} (dry run): {source.at(file_path)} -> {dest.at(dest_path)} '
+                  f'({_human(size)})')
+        return 0
+    sizes = {}
+
+    def transfer(item: tuple[Path, Path]) -> None:
+        copy_object(source.at(item[0]), dest.at(item[1]))
+        if delete_source:
+            delete_object(source.at(item[0]))
+
+    def items() -> Iterator[tuple[Path, Path]]:
+        for file_path, dest_path, size in plan:
+            sizes[file_path] = size
+            yield file_path, dest_path
+
+    return _run(operation, transfer, items(), lambda item: sizes.pop(item[0]), args.jobs)
+
+
+def _run_deletes(targets: Iterable[tuple[Path, int]], location: Location,
+                 args: argparse.Namespace) -> int:
+    """
+    Delete (concurrently, with --jobs workers) all target files. Return the exit code.
+    """
+    if args.dry_run:
+        for file_path, _ in targets:
+            print(f'rm (dry run): {location.at(file_path)}')
+        return 0
+    sizes = {}
+
+    def items() -> Iterator[Path]:
+        for file_path, size in targets:
+            sizes[file_path] = size
+            yield file_path
+
+    return _run('rm', lambda file_path: delete_object(location.at(file_path)), items(),
+                sizes.pop, args.jobs)
+
+
+def _run(operation: str, func: Callable, items: Iterable, size: Callable, jobs: int) -> int:
+    """
+    Apply func to all items concurrently, reporting progress (size gives the bytes of an item)
+    """
+    with Progress(operation) as progress:
+        for item, _, error in run_bulk(func, items, jobs):
+            if error:
+                sys.stderr.write(f'\n{operation} failed for {item}: {error}\n')
+            progress.add(size(item), error)
+    return 1 if progress.errors else 0
+
+
+def _dest_path(source: Location, dest: Location, file_path: Path, dest_text: str) -> Path:
+    """
+    Destination of file_path: same relative path under dest for a folder source, dest itself (or
+     dest folder if ending with a /) for a single file source
+    """
+    if file_path != source.path:
+        return dest.path / file_path.relative_to(source.path)
+    is_folder = dest_text.endswith('/') or (dest.cloud is None and dest.path.is_dir())
+    return dest.path / file_path.name if is_folder else dest.path
+
+
+def _lease_store(leases: str, dest: Location) -> CloudLeaseStore | DiskLeaseStore:
+    """
+    Lease store of a sharded migration: in the destination if leases is a cloud location, on
+     (shared) disk otherwise
+    """
+    lease_location = parse_location(leases)
+    if lease_location.cloud is None:
+        return DiskLeaseStore(lease_location.path)
+    return CloudLeaseStore(lease_location.path, lease_location.cloud, lease_location.location)
+
+
+def _count(files: Iterable[tuple[Path, int]]) -> tuple[int, int]:
+    """
+    Number and total size of files
+    """
+    count, total = 0, 0
+    for _, size in files:
+        count, total = count + 1, total + size
+    return count, total
+
+
+def _human(size: float) -> str:
+    """
+    Human readable size
+    """
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024 or unit == 'TB':
+            return f'{size:.1f}{unit}'
+        size /= 1024
+    return f'{size:.1f}TB'
+
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    Command line parser, one sub command per operation
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--jobs', '-j', type=int, default=RETRY_CONF.bulk_workers,
+                        help='number of concurrent operations')
+    common.add_argument('--dry-run', '-n', action='store_true',
+                        help='print what would be done without doing it')
+    common.add_argument('--bandwidth', type=float, default=None,
+                        help='bandwidth limit of uploads and downloads in MB/s')
+    parser = argparse.ArgumentParser(prog='ecodev-cloud', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(required=True, metavar='command')
+
+    ls = commands.add_parser('ls', parents=[common], help='list a folder')
+    ls.add_argument('source')
+    ls.add_argument('--recursive', '-r', action='store_true', help='list all files with sizes')
+    ls.set_defaults(command=_ls)
+
+    du = commands.add_parser('du', parents=[common], help='size of a folder')
+    du.add_argument('source')
+    du.add_argument('--depth', '-d', type=int, default=0, help='sub folder depth to detail')
+    du.set_defaults(command=_du)
+
+    for name, command, help_text in [('cp', _cp, 'copy a file or a folder'),
+                                     ('mv', partial(_cp, delete_source=True),
+                                      'move a file or a folder')]:
+        copy = commands.add_parser(name, parents=[common], help=help_text)
+        copy.add_argument('source')
+        copy.add_argument('dest')
+        copy.set_defaults(command=command)
+
+    rm = commands.add_parser('rm', parents=[common], help='delete a file or a folder')
+    rm.add_argument('target')
+    rm.set_defaults(command=_rm)
+
+    sync = commands.add_parser('sync', parents=[common], help='make a folder mirror another')
+    sync.add_argument('source')
+    sync.add_argument('dest')
+    sync.add_argument('--delete', action='store_true', help='delete extraneous dest files')
+    sync.set_defaults(command=_sync)
+
+    migrate = commands.add_parser('migrate', parents=[common],
+                                  help='robust (resumable or sharded) migration, same keys')
+    migrate.add_argument('source')
+    migrate.add_argument('dest', help='destination cloud location (its key is ignored)')
+    migrate.add_argument('--index-folder', type=Path, default=Path('.'),
+                         help='where transferred and failed keys are tracked')
+    migrate.add_argument('--leases', default=None,
+                         help='lease folder (disk or cloud location) to shard across workers')
+    migrate.add_argument('--shards', type=int, default=SHARDS)
+    migrate.set_defaults(command=_migrate)
+
+    verify = commands.add_parser('verify', parents=[common],
+                                 help='verify a migration out of listings and checksums only')
+    verify.add_argument('source')
+    verify.add_argument('dest', help='destination cloud location (its key is ignored)')
+    verify.add_argument('--index-folder', type=Path, default=None,
+                        help='index folder of the migration, holding the journaled checksums')
+    verify.set_defaults(command=_verify)
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(main())
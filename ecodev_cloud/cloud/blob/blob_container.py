@@ -16,10 +16,11 @@ class BlobConfiguration(BaseSettings):
     """
     connection_string: str = ''
     container: str = ''
+    sas_user_delegation: bool = False
 
 
 AZURE_SERVICE: BlobServiceClient | None = None
-AZURE_BLOB: ContainerClient | None = None
+AZURE_BLOBS: dict[str, ContainerClient] = {}
 BLOB_CONF = BlobConfiguration()
 CONTAINER = BLOB_CONF.container
 TEST_CONTAINER = 'testblob'
@@ -27,24 +28,22 @@ TEST_CONTAINER = 'testblob'
 
 def container(name: str = CONTAINER) -> ContainerClient:
     """
-    Singleton to retrieve the connection to the azure blob storage container.
+    Singleton (one per container name) to retrieve the connection to an azure blob container.
     """
-    global AZURE_BLOB
-    if not AZURE_BLOB:
-        AZURE_BLOB = _azure_service().get_container_client(name)
-        _create_container(AZURE_BLOB, name)
-    return AZURE_BLOB
+    if name not in AZURE_BLOBS:
+        AZURE_BLOBS[name] = azure_service().get_container_client(name)
+        _create_container(AZURE_BLOBS[name], name)
+    return AZURE_BLOBS[name]
 
 
 def create_container(name: str = CONTAINER):
     """
     Safe container creation (creating the blob storage if not there)
     """
-    global AZURE_BLOB
-    if not AZURE_BLOB:
+    if name not in AZURE_BLOBS:
         container(name)
     else:
-        _create_container(AZURE_BLOB, name)
+        _create_container(AZURE_BLOBS[name], name)
 
 
 def _create_container(blob: ContainerClient, name: str) -> None:
@@ -58,11 +57,14 @@ def _create_container(blob: ContainerClient, name: str) -> None:
         log.info(f'container {name} already exists')
 
 
-def _azure_service() -> BlobServiceClient:
+def azure_service() -> BlobServiceClient:
     """
     Singleton to retrieve the connection to the azure blob storage service.
+    Throttled requests are not retried by the SDK but by cloud_retry.with_retry (connection and
+     read errors still are).
     """
     global AZURE_SERVICE
     if not AZURE_SERVICE:
-        AZURE_SERVICE = BlobServiceClient.from_connection_string(BLOB_CONF.connection_string)
+        AZURE_SERVICE = BlobServiceClient.from_connection_string(BLOB_CONF.connection_string,
+                                                                 retry_status=0)
     return AZURE_SERVICE
@@ -2,34 +2,164 @@
 Module implementing blob helper methods centered around pathlib like behaviours
 """
 import datetime
-from io import BytesIO
+import os
+import time
+from functools import partial
 from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterable
 from typing import Iterator
+from urllib.parse import quote
 
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.paging import ItemPaged
+from azure.storage.blob import BlobBlock
 from azure.storage.blob import BlobSasPermissions
+from azure.storage.blob import ContentSettings
 from azure.storage.blob import generate_blob_sas
+from azure.storage.blob import UserDelegationKey
 
+from ecodev_cloud.cloud.blob.blob_container import azure_service
+from ecodev_cloud.cloud.blob.blob_container import BLOB_CONF
 from ecodev_cloud.cloud.blob.blob_container import CONTAINER
 from ecodev_cloud.cloud.blob.blob_container import container
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud_bandwidth import azure_progress_hook
+from ecodev_cloud.cloud.cloud_bandwidth import Direction
+from ecodev_cloud.cloud.cloud_bandwidth import throttle
+from ecodev_cloud.cloud.cloud_checksum import check_md5
+from ecodev_cloud.cloud.cloud_checksum import CHECKSUM_CONF
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_checksum import Hasher
+from ecodev_cloud.cloud.cloud_checksum import HashingReader
+from ecodev_cloud.cloud.cloud_retry import retried
+from ecodev_cloud.cloud.cloud_retry import retried_pages
+from ecodev_cloud.cloud.cloud_retry import run_all
+from ecodev_cloud.cloud.cloud_retry import with_retry
 from ecodev_cloud.file_processing.basic_file_processing import get_common_ancestor
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.stream_processing import MemoryWriter
+from ecodev_cloud.file_processing.stream_processing import MultipartWriter
+from ecodev_cloud.file_processing.stream_processing import RangedReader
 from ecodev_cloud.path_utils import forge_key
 from ecodev_cloud.path_utils import ROOT_DIRECTORY
 
+COPY_POLLING = 0.5
+SINGLE_PUT_SIZE = 64 * 1024 * 1024
+DELEGATION_HOURS = 24
+DELEGATION_KEY: UserDelegationKey | None = None
 
-def get_blob_object(file_path: Path,  byte: bool = False, location: str = CONTAINER):
+
+@retried
+def get_blob_object(file_path: Path,  byte: bool = False, location: str = CONTAINER
+                    ) -> bytearray | MemoryReader:
+    """
+    Retrieve a blob object from Azure blob storage, downloaded into a single buffer preallocated
+     from the blob size (wrapped in a zero copy stream if byte)
+    """
+    downloader = container(location).get_blob_client(forge_key(file_path)).download_blob(
+        progress_hook=azure_progress_hook(Direction.DOWNLOAD))
+    writer = MemoryWriter(downloader.size)
+    downloader.readinto(writer)
+    data = writer.getvalue()
+    return MemoryReader(data) if byte else data
+
+
+@retried
+def blob_upload(source_path: Path,
+                dest_path: Path,
+                location: str = CONTAINER,
+                metadata: dict[str, str] | None = None,
+                content_encoding: str | None = None
+                ) -> Checksums:
     """
-    Retrieve a blob object from Azure blob storage
+    Upload content of source_path to dest_path on Azure blob storage (along with optional metadata
+     and Content-Encoding). Checksums are computed while the file is streamed, and every request
+     is validated by Azure. Azure stores the Content-MD5 of single shot uploads, it is set after
+     block uploads. Return the checksums.
     """
-    data = container(location).get_blob_client(forge_key(file_path)).download_blob().readall()
-    return BytesIO(data) if byte else data
+    with open(source_path, 'rb') as source:
+        size = os.fstat(source.fileno()).st_size
+        container(location).upload_blob(
+            name=forge_key(dest_path), data=(stream := HashingReader(source)), length=size,
+            overwrite=True, metadata=metadata,
+            content_settings=ContentSettings(content_encoding=content_encoding),
+            progress_hook=azure_progress_hook(Direction.UPLOAD),
+            validate_content=CHECKSUM_CONF.checksum_check)
+    if size > SINGLE_PUT_SIZE:
+        blob_set_md5(dest_path, stream.checksums().md5, location)
+    return stream.checksums()
 
 
-def blob_upload(source_path: Path, dest_path: Path, location: str = CONTAINER):
+@retried
+def blob_set_md5(file_path: Path, md5: str, location: str = CONTAINER) -> None:
     """
-    Upload content of source_path to dest_path on Azure blob storage
+    Store the (hex) MD5 of the blob at file_path content as its Content-MD5, listed along with it.
+    Other content headers are read first and set back (Azure replacing them all).
+    """
+    blob = container(location).get_blob_client(forge_key(file_path))
+    content_settings = blob.get_blob_properties().content_settings
+    content_settings.content_md5 = bytearray.fromhex(md5)
+    blob.set_http_headers(content_settings)
+
+
+def blob_writer(dest_path: Path, location: str = CONTAINER) -> MultipartWriter:
     """
-    with open(source_path, 'rb') as data:
-        container(location).upload_blob(name=forge_key(dest_path), data=data, overwrite=True)
+    Open a write-only stream on dest_path, uploaded block by block and committed on close
+    """
+    blob = container(location).get_blob_client(forge_key(dest_path))
+
+    def stage_block(number: int, data: bytes) -> BlobBlock:
+        block_id = f'{number:08d}'
+        throttle(Direction.UPLOAD, len(data))
+        with_retry(blob.stage_block, block_id=block_id, data=data)
+        return BlobBlock(block_id=block_id)
+
+    # uncommitted blocks are garbage collected by Azure: nothing to clean on abort
+    return MultipartWriter(stage_block, partial(with_retry, blob.commit_block_list), lambda: None)
+
+
+@retried
+def blob_reader(file_path: Path, location: str = CONTAINER) -> RangedReader:
+    """
+    Open a read-only seekable stream on the blob at file_path, only fetching the bytes read
+    """
+    blob = container(location).get_blob_client(forge_key(file_path))
+    return RangedReader(blob.get_blob_properties().size,
+                        partial(get_blob_range, file_path, location=location))
+
+
+def get_blob_range(file_path: Path,
+                   start: int,
+                   end: int,
+                   location: str = CONTAINER,
+                   etag: str | None = None
+                   ) -> bytes:
+    """
+    Retrieve the bytes of a blob object between start and end (both included). If etag is passed,
+     only if the blob was not rewritten since (a ResourceModifiedError is raised otherwise).
+    """
+    return get_blob_tagged_range(file_path, start, end, location, etag)[0]
+
+
+@retried
+def get_blob_tagged_range(file_path: Path,
+                          start: int,
+                          end: int,
+                          location: str = CONTAINER,
+                          etag: str | None = None
+                          ) -> tuple[bytes, str]:
+    """
+    Retrieve the bytes of a blob object between start and end (both included) along with its
+     ETag (see get_blob_range)
+    """
+    throttle(Direction.DOWNLOAD, end - start + 1)
+    blob = container(location).get_blob_client(forge_key(file_path))
+    condition = {'etag': etag, 'match_condition': MatchConditions.IfNotModified} if etag else {}
+    downloader = blob.download_blob(offset=start, length=end - start + 1, **condition)
+    return downloader.readall(), downloader.properties.etag
 
 
 def blob_move_folder(origin: Path,
@@ -39,7 +169,8 @@ def blob_move_folder(origin: Path,
                      location: str = CONTAINER) -> None:
     """
     Move all files in the origin folder (either present locally or already on the blob,
-     depending on dist_origin) to blob storage
+     depending on dist_origin) to blob storage.
+     Files are moved concurrently, with retries and concurrency control on throttling.
 
     Attributes are:
         - origin: folder to move
@@ -48,9 +179,9 @@ def blob_move_folder(origin: Path,
         - delete_file: whether to delete or not the origin folder. If false, amount to cp and not mv
         - location: container name inside the azure storage on which to move
     """
-    for origin_path in blob_rglob(origin):
-        blob_move_file(origin_path, dest / origin_path.relative_to(origin),
-                       dist_origin=dist_origin, delete_file=delete_file, location=location)
+    run_all(lambda origin_path: blob_move_file(
+        origin_path, dest / origin_path.relative_to(origin), dist_origin=dist_origin,
+        delete_file=delete_file, location=location), blob_rglob(origin))
 
 
 def blob_copy_file(origin: Path,
@@ -69,6 +200,22 @@ def blob_copy_file(origin: Path,
     blob_move_file(origin, dest, location=location, dist_origin=dist_origin, delete_file=False)
 
 
+@retried
+def blob_copy_from_url(url: str, dest_path: Path, location: str = CONTAINER) -> None:
+    """
+    Server side copy into dest_path of the object at url (either a blob of the same storage
+     account, or any readable, for instance pre-signed, URL). Wait for the copy to complete.
+    """
+    blob = container(location).get_blob_client(forge_key(dest_path))
+    blob.start_copy_from_url(url)
+    while (copy := blob.get_blob_properties().copy).status == 'pending':
+        time.sleep(COPY_POLLING)
+    if copy.status != 'success':
+        raise RuntimeError(f'copy of {url} to {forge_key(dest_path)} {copy.status}: '
+                           f'{copy.status_description}')
+
+
+@retried
 def blob_move_file(origin: Path,
                    dest: Path,
                    location: str = CONTAINER,
@@ -86,8 +233,7 @@ def blob_move_file(origin: Path,
     """
     if dist_origin:
         blob_client = container(location).get_blob_client(forge_key(origin))
-        new_blob_client = container(location).get_blob_client(forge_key(dest))
-        new_blob_client.start_copy_from_url(blob_client.url)
+        blob_copy_from_url(blob_client.url, dest, location)
         if delete_file:
             blob_client.delete_blob()
     else:
@@ -102,21 +248,32 @@ def get_blob_url(file_path: Path, timeout: int = 3600, location: str = CONTAINER
     Expiration is the time in seconds for the URL to remain valid.
     https://learn.microsoft.com/en-us/azure/storage/blobs/sas-service-create-python
     """
+    return get_blob_urls([file_path], timeout=timeout, location=location)[file_path]
+
+
+def get_blob_urls(file_paths: Iterable[Path],
+                  timeout: int = 3600,
+                  location: str = CONTAINER
+                  ) -> dict[Path, str]:
+    """
+    Generate sas tokens and then URLs to share blob objects, reusing the container client and
+     the signing material (account key or user delegation key) across all file_paths.
+    Expiration is the time in seconds for the URLs to remain valid.
+    """
     start_time = datetime.datetime.now(datetime.timezone.utc)
     expiry_time = start_time + datetime.timedelta(seconds=timeout)
-    data = container(location).get_blob_client(forge_key(file_path))
-    sas_token = generate_blob_sas(
-        account_name=data.account_name,
-        container_name=data.container_name,
-        blob_name=data.blob_name,
-        account_key=data.credential.account_key,
-        permission=BlobSasPermissions(read=True),
-        expiry=expiry_time,
-        start=start_time
-    )
-    url = data._hosts['primary']
-    prefix = 'http' if 'azurite' in url else 'https'
-    return f"{prefix}://{data._hosts['primary']}/{data.container_name}/{data.blob_name}?{sas_token}"
+    client = container(location)
+    signing_key = _signing_key(client.credential, expiry_time)
+    permission = BlobSasPermissions(read=True)
+    urls = {}
+    for file_path in file_paths:
+        sas_token = generate_blob_sas(account_name=client.account_name,
+                                      container_name=client.container_name,
+                                      blob_name=(key := forge_key(file_path)),
+                                      permission=permission, expiry=expiry_time,
+                                      start=start_time, **signing_key)
+        urls[file_path] = f"{client.url}/{quote(key, safe='~/')}?{sas_token}"
+    return urls
 
 
 def blob_rglob(file_path: Path,
@@ -126,22 +283,42 @@ def blob_rglob(file_path: Path,
     Rglob functionality: recursively find all files in the file_path folder having passed pattern
     """
     cleaned_pattern = pattern.replace('*', '') if pattern else None
-    for fp in container(location).list_blob_names(name_starts_with=forge_key(file_path)):
-        if not cleaned_pattern or cleaned_pattern in str(fp):
-            yield ROOT_DIRECTORY / fp
+    listing = partial(container(location).list_blob_names, name_starts_with=forge_key(file_path))
+    for page in _blob_pages(listing):
+        for fp in page:
+            if not cleaned_pattern or cleaned_pattern in str(fp):
+                yield ROOT_DIRECTORY / fp
+
+
+def blob_scan(file_path: Path,
+              pattern: str | None = None,
+              location: str = CONTAINER) -> Iterator[CloudEntry]:
+    """
+    Recursively find all blobs in the file_path folder having passed pattern, along with their
+     size, ETag, last modification date and Content-MD5 (all read from the listing pages)
+    """
+    cleaned_pattern = pattern.replace('*', '') if pattern else None
+    listing = partial(container(location).list_blobs, name_starts_with=forge_key(file_path))
+    for blob in (blob for page in _blob_pages(listing) for blob in page):
+        if not cleaned_pattern or cleaned_pattern in blob.name:
+            md5 = blob.content_settings.content_md5
+            yield CloudEntry(path=ROOT_DIRECTORY / blob.name, size=blob.size,
+                             etag=blob.etag.strip('"'), last_modified=blob.last_modified,
+                             content_md5=bytes(md5).hex() if md5 else None)
 
 
 def blob_iterdir(file_path: Path, location: str = CONTAINER) -> Iterator[Path]:
     """
     list all files and folders directly in the blob file_path folder.
     """
+    listing = partial(container(location).list_blob_names,
+                      name_starts_with=str(forge_key(file_path)))
     files = {file_path / get_common_ancestor(ROOT_DIRECTORY / elt, file_path)
-             for elt in container(location).list_blob_names(
-        name_starts_with=str(forge_key(file_path)))
-        if elt != file_path}
+             for page in _blob_pages(listing) for elt in page if elt != file_path}
     yield from sorted(list(files))
 
 
+@retried
 def blob_exists(file_path: Path, location: str = CONTAINER) -> bool:
     """
     Check if a file_path exists, either locally or on a blob
@@ -149,16 +326,100 @@ def blob_exists(file_path: Path, location: str = CONTAINER) -> bool:
     return container(location).get_blob_client(forge_key(file_path)).exists()
 
 
-def download_blob_object(file_path: Path, local_path: Path, location: str = CONTAINER) -> None:
+def blob_list_names(prefix: str, max_pages: int, location: str = CONTAINER
+                    ) -> tuple[set[str], str | None]:
+    """
+    List the blobs (and sub folder prefixes) directly under prefix, sending at most max_pages
+     listing requests. Return the listed names, along with the last listed name if the listing
+     was cut short (None if it is complete): names before it are exhaustively listed.
+    """
+    names: set[str] = set()
+    listing = partial(container(location).walk_blobs, name_starts_with=prefix, delimiter='/')
+    pages = _blob_pages(listing, with_token=True)
+    for number, (page, token) in enumerate(pages, 1):
+        names.update(page_names := [elt.name for elt in page])
+        if number >= max_pages and token:
+            return names, max(page_names, default='')
+    return names, None
+
+
+@retried
+def blob_metadata(file_path: Path, location: str = CONTAINER) -> dict[str, str] | None:
+    """
+    Metadata of the blob stored at file_path (None if there is no such blob)
+    """
+    try:
+        blob = container(location).get_blob_client(forge_key(file_path))
+        return blob.get_blob_properties().metadata
+    except ResourceNotFoundError:
+        return None
+
+
+@retried
+def blob_etag(file_path: Path, location: str = CONTAINER) -> str:
+    """
+    Entity tag (changing with the content) of the blob stored at file_path
+    """
+    return container(location).get_blob_client(forge_key(file_path)).get_blob_properties().etag
+
+
+@retried
+def download_blob_object(file_path: Path, local_path: Path, location: str = CONTAINER
+                         ) -> Checksums:
     """
     Download on disk at local_path location the content of location at file_path blob location.
+    Checksums are computed while the blob is streamed, and compared with its Content-MD5 (if
+     any). Return them.
     """
-    blob = container(location).get_blob_client(forge_key(file_path))
+    blob, hasher = container(location).get_blob_client(forge_key(file_path)), Hasher()
+    downloader = blob.download_blob(progress_hook=azure_progress_hook(Direction.DOWNLOAD))
     with open(file=local_path, mode='wb') as sample_blob:
-        download_stream = blob.download_blob()
-        sample_blob.write(download_stream.readall())
+        for chunk in downloader.chunks():
+            hasher.update(chunk)
+            sample_blob.write(chunk)
+    if CHECKSUM_CONF.checksum_check:
+        check_md5(hasher.checksums(), downloader.properties.content_settings.content_md5,
+                  forge_key(file_path))
+    return hasher.checksums()
+
+
+def _blob_pages(listing: Callable[[], ItemPaged], with_token: bool = False) -> Iterator[Any]:
+    """
+    Pages (list of items) of a blob listing, each fetched with retries (along with the
+     continuation token of the next page if with_token)
+    """
+    def fetch_page(token: str | None) -> tuple[Any, str | None]:
+        pages = listing().by_page(continuation_token=token)
+        page = list(next(pages, []))
+        return ((page, pages.continuation_token) if with_token else page), pages.continuation_token
+
+    yield from retried_pages(fetch_page)
+
+
+def _signing_key(credential: Any, expiry_time: datetime.datetime) -> dict[str, Any]:
+    """
+    Signing material of SAS tokens: the account key, or (if configured or if there is no account
+     key) a user delegation key fetched once and reused until it expires
+    """
+    global DELEGATION_KEY
+    account_key = getattr(credential, 'account_key', None)
+    if account_key and not BLOB_CONF.sas_user_delegation:
+        return {'account_key': account_key}
+    if not DELEGATION_KEY or _key_expiry(DELEGATION_KEY) < expiry_time:
+        start_time = datetime.datetime.now(datetime.timezone.utc)
+        key_expiry = max(expiry_time, start_time + datetime.timedelta(hours=DELEGATION_HOURS))
+        DELEGATION_KEY = azure_service().get_user_delegation_key(start_time, key_expiry)
+    return {'user_delegation_key': DELEGATION_KEY}
+
+
+def _key_expiry(key: UserDelegationKey) -> datetime.datetime:
+    """
+    Expiry time of a user delegation key
+    """
+    return datetime.datetime.fromisoformat(key.signed_expiry.replace('Z', '+00:00'))
 
 
+@retried
 def delete_blob_content(file_path: Path, location: str = CONTAINER) -> None:
     """
     Delete content from a blob at file_path location
@@ -1,11 +1,17 @@
 """
 Module listing all cloud object storage sources
 """
+from datetime import datetime
 from enum import Enum
 from enum import unique
+from pathlib import Path
+from typing import NamedTuple
 
 from pydantic_settings import BaseSettings
 
+from ecodev_cloud.cloud.blob.blob_container import CONTAINER
+from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
+
 
 @unique
 class Cloud(str, Enum):
@@ -23,5 +29,23 @@ class CloudConfiguration(BaseSettings):
     cloud_provider: Cloud = Cloud.AWS
 
 
+class CloudEntry(NamedTuple):
+    """
+    Cloud object path along with the properties returned by listing pages (no extra request)
+    """
+    path: Path
+    size: int
+    etag: str
+    last_modified: datetime
+    content_md5: str | None = None
+
+
 AUTH = CloudConfiguration()
 CLOUD = AUTH.cloud_provider
+
+
+def resolve_location(cloud: Cloud, location: str | None) -> str:
+    """
+    Resolve the container/bucket actually used for the passed cloud and (optional) location
+    """
+    return location or (CONTAINER if cloud == Cloud.AZURE else BUCKET)
@@ -0,0 +1,245 @@
+"""
+Module implementing the bandwidth limiter shared by all the paths moving bytes between this
+machine and cloud object storage (uploads, downloads, ranged reads and multipart writes).
+
+Limits are token buckets in bytes per second (0 for no limit): a total one, and optional upload
+and download ones. They can be changed at runtime (see set_bandwidth), and the current throughput
+is exposed (see bandwidth_throughput). Server side copies do not go through this machine and are
+not limited.
+"""
+import io
+import threading
+import time
+from collections import deque
+from enum import Enum
+from enum import unique
+from typing import Any
+from typing import Callable
+
+from pydantic_settings import BaseSettings
+
+from ecodev_cloud.file_processing.stream_processing import READ_BUFFER
+
+THROUGHPUT_WINDOW = 5.
+
+
+@unique
+class Direction(str, Enum):
+    """
+    Directions of the bytes moved between this machine and cloud object storage
+    """
+    UPLOAD = 'upload'
+    DOWNLOAD = 'download'
+
+
+class BandwidthConfiguration(BaseSettings):
+    """
+    Bandwidth limits in bytes per second, 0 for no limit (filled thanks to the local .env)
+
+    Attributes are:
+        - bandwidth_limit: limit of uploads and downloads together
+        - bandwidth_upload: limit of uploads
+        - bandwidth_download: limit of downloads
+        - bandwidth_burst: seconds of unused bandwidth that can be spent in a burst
+    """
+    bandwidth_limit: float = 0.
+    bandwidth_upload: float = 0.
+    bandwidth_download: float = 0.
+    bandwidth_burst: float = 1.
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket of rate bytes per second (no limit if 0), holding at most burst
+     seconds worth of tokens. Consumers reserve their bytes, then sleep until they are covered:
+     concurrent consumers are served in turn, and chunks bigger than the bucket are allowed.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = rate * burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        """
+        Take size tokens out of the bucket, waiting for them if need be
+        """
+        with self._lock:
+            if not self.rate:
+                return
+            self._refill()
+            self._tokens -= size
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the bucket rate (0 for no limit), effective for the next consumers
+        """
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self._tokens = min(self._tokens, rate * self.burst)
+
+    def _refill(self) -> None:
+        """
+        Add the tokens accumulated since the last refill (up to burst seconds worth of them)
+        """
+        now = time.monotonic()
+        self._tokens = min(self.rate * self.burst,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class ThroughputMeter:
+    """
+    Thread safe measure of the bytes moved per second over the last THROUGHPUT_WINDOW seconds
+    """
+
+    def __init__(self, window: float = THROUGHPUT_WINDOW) -> None:
+        self.window = window
+        self._moved: deque[tuple[float, int]] = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def record(self, size: int) -> None:
+        """
+        Record size bytes moved now
+        """
+        with self._lock:
+            self._moved.append((time.monotonic(), size))
+            self._total += size
+            self._expire()
+
+    def throughput(self) -> float:
+        """
+        Bytes per second moved over the last window
+        """
+        with self._lock:
+            self._expire()
+            return self._total / self.window
+
+    def _expire(self) -> None:
+        """
+        Forget the bytes moved before the window
+        """
+        horizon = time.monotonic() - self.window
+        while self._moved and self._moved[0][0] < horizon:
+            self._total -= self._moved.popleft()[1]
+
+
+class BandwidthLimiter:
+    """
+    Total and per direction token buckets, along with per direction throughput meters
+    """
+
+    def __init__(self, limit: float, upload: float, download: float, burst: float = 1.) -> None:
+        self._total = TokenBucket(limit, burst)
+        self._buckets = {Direction.UPLOAD: TokenBucket(upload, burst),
+                         Direction.DOWNLOAD: TokenBucket(download, burst)}
+        self._meters = {direction: ThroughputMeter() for direction in Direction}
+
+    def throttle(self, direction: Direction, size: int) -> None:
+        """
+        Wait until size bytes can be moved in direction without exceeding the limits
+        """
+        if size <= 0:
+            return
+        self._buckets[direction].consume(size)
+        self._total.consume(size)
+        self._meters[direction].record(size)
+
+    def set_limits(self,
+                   limit: float | None = None,
+                   upload: float | None = None,
+                   download: float | None = None
+                   ) -> None:
+        """
+        Change the passed limits (bytes per second, 0 for no limit), keep the others
+        """
+        for bucket, rate in [(self._total, limit), (self._buckets[Direction.UPLOAD], upload),
+                             (self._buckets[Direction.DOWNLOAD], download)]:
+            if rate is not None:
+                bucket.set_rate(rate)
+
+    def throughput(self) -> dict[Direction, float]:
+        """
+        Current bytes per second moved in each direction
+        """
+        return {direction: meter.throughput() for direction, meter in self._meters.items()}
+
+
+class ThrottledReader(io.RawIOBase):
+    """
+    Read-only stream throttling the downloads of the wrapped stream, read by READ_BUFFER chunks
+    """
+
+    def __init__(self, stream: Any) -> None:
+        super().__init__()
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with memoryview(buffer) as view:
+            chunk = self._stream.read(min(len(view), READ_BUFFER))
+            view[:len(chunk)] = chunk
+        throttle(Direction.DOWNLOAD, len(chunk))
+        return len(chunk)
+
+
+BANDWIDTH_CONF = BandwidthConfiguration()
+BANDWIDTH = BandwidthLimiter(BANDWIDTH_CONF.bandwidth_limit, BANDWIDTH_CONF.bandwidth_upload,
+                             BANDWIDTH_CONF.bandwidth_download, BANDWIDTH_CONF.bandwidth_burst)
+
+
+def throttle(direction: Direction, size: int) -> None:
+    """
+    Wait until size bytes can be moved in direction without exceeding the bandwidth limits
+    """
+    BANDWIDTH.throttle(direction, size)
+
+
+def set_bandwidth(limit: float | None = None,
+                  upload: float | None = None,
+                  download: float | None = None
+                  ) -> None:
+    """
+    Change at runtime the bandwidth limits in bytes per second (0 for no limit, None to keep the
+     current one) of uploads and downloads together, of uploads and of downloads.
+    """
+    BANDWIDTH.set_limits(limit, upload, download)
+
+
+def bandwidth_throughput() -> dict[Direction, float]:
+    """
+    Current bytes per second uploaded and downloaded, over the last THROUGHPUT_WINDOW seconds
+    """
+    return BANDWIDTH.throughput()
+
+
+def boto_callback(direction: Direction) -> Callable[[int], None]:
+    """
+    boto3 transfer Callback (called with the bytes moved since the previous call) throttling the
+     transfer in direction
+    """
+    return lambda size: throttle(direction, size)
+
+
+def azure_progress_hook(direction: Direction) -> Callable[[int, int | None], None]:
+    """
+    Azure progress_hook (called with the bytes moved so far, and the total) throttling the
+     transfer in direction
+    """
+    lock, moved = threading.Lock(), [0]
+
+    def progress_hook(current: int, _: int | None) -> None:
+        with lock:
+            size, moved[0] = current - moved[0], max(current, moved[0])
+        throttle(direction, size)
+
+    return progress_hook
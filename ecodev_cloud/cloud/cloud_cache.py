@@ -0,0 +1,109 @@
+"""
+Module implementing a host wide cache of cloud objects downloaded on local disk.
+
+Cached files are named after the entity tag of the object they hold: a file is never modified
+once written (new contents get new files), so that it can be safely memory mapped and shared by
+all the processes of a host. Older versions of an object are deleted once a new one is cached,
+and the least recently used files are evicted when the cache exceeds its size cap (deleting a
+memory mapped file leaves the mapping readable).
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from ecodev_core import logger_get
+from ecodev_core import make_dir
+from pydantic_settings import BaseSettings
+
+from ecodev_cloud.cloud.blob.blob_helpers import blob_etag
+from ecodev_cloud.cloud.blob.blob_helpers import download_blob_object
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.s3.s3_helpers import download_s3_object
+from ecodev_cloud.cloud.s3.s3_helpers import s3_etag
+from ecodev_cloud.path_utils import forge_key
+
+
+class CacheConfiguration(BaseSettings):
+    """
+    Local cache configuration (filled thanks to the local .env). Defaults to a temporary folder.
+
+    Attributes are:
+        - cache_folder: folder holding the cached cloud objects
+        - cache_max_bytes: size above which least recently used cached files are evicted
+    """
+    cache_folder: str = ''
+    cache_max_bytes: int = 20 * 1024 ** 3
+
+
+CACHE_CONF = CacheConfiguration()
+PART_SUFFIX = '.part'
+log = logger_get(__name__)
+
+
+def cache_folder() -> Path:
+    """
+    Folder holding the cached cloud objects of the host
+    """
+    return Path(CACHE_CONF.cache_folder or Path(tempfile.gettempdir()) / 'ecodev_cloud_cache')
+
+
+def cached_download(file_path: Path, cloud: Cloud, location: str) -> Path:
+    """
+    Return the local path of the up to date copy of the file_path cloud object, downloading it
+     if no process of the host did it yet. Downloads are atomic: a cached file is either absent
+     or complete. Older copies of the object are then deleted, and the cache trimmed to its cap.
+    """
+    etag = with_retry(blob_etag if cloud == Cloud.AZURE else s3_etag, file_path, location=location)
+    local_path = (cache_folder() / cloud.value / location / forge_key(file_path) /
+                  (etag.strip('"') + file_path.suffix))
+    try:
+        os.utime(local_path)
+        return local_path
+    except FileNotFoundError:
+        make_dir(local_path.parent)
+    download = download_blob_object if cloud == Cloud.AZURE else download_s3_object
+    fd, tmp_path = tempfile.mkstemp(dir=local_path.parent, suffix=PART_SUFFIX)
+    os.close(fd)
+    try:
+        with_retry(download, file_path, Path(tmp_path), location=location)
+        os.replace(tmp_path, local_path)
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+    for older in local_path.parent.iterdir():
+        if older != local_path and older.suffix != PART_SUFFIX and older.is_file():
+            older.unlink(missing_ok=True)
+    evict(CACHE_CONF.cache_max_bytes, keep=local_path)
+    return local_path
+
+
+def evict(max_bytes: int, keep: Path | None = None) -> None:
+    """
+    Delete the least recently used cached files (by modification time, refreshed on each cache
+     hit) until the cache holds at most max_bytes. The keep file is never deleted.
+    """
+    files = []
+    for root, _, names in os.walk(cache_folder()):
+        for name in names:
+            if not name.endswith(PART_SUFFIX):
+                try:
+                    stat = os.stat(name_path := os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, Path(name_path)))
+    total = sum(size for _, size, _ in files)
+    for _, size, file_path in sorted(files, key=lambda elt: elt[0]):
+        if total <= max_bytes:
+            return
+        if file_path != keep:
+            file_path.unlink(missing_ok=True)
+            total -= size
+            log.info(f'evicted {file_path} from the cache')
+
+
+def clear_cache() -> None:
+    """
+    Delete all cached cloud objects (already memory mapped arrays remain readable)
+    """
+    shutil.rmtree(cache_folder(), ignore_errors=True)
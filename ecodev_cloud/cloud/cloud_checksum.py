@@ -0,0 +1,241 @@
+"""
+Module implementing the integrity checksums computed while bytes stream through uploads,
+downloads and transfers (no extra read of the data), and their comparison with the values
+reported by cloud providers.
+
+Checksums are the MD5 of the content, its CRC32C (if google-crc32c is installed) and the ETag S3
+gives to it (the MD5 of the part MD5s for multipart uploads, which depends on the part size: it is
+only compared with the stored one when the stored object part size is known and the same).
+"""
+import base64
+import hashlib
+import io
+from typing import Any
+from typing import NamedTuple
+
+from botocore.compat import HAS_CRT
+from pydantic_settings import BaseSettings
+
+from ecodev_cloud.file_processing.stream_processing import PART_SIZE
+
+try:
+    import google_crc32c
+except ImportError:  # CRC32C checksums are only computed if google-crc32c is installed
+    google_crc32c = None
+
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+CRC32C_ALGORITHM = 'CRC32C'
+
+
+class ChecksumConfiguration(BaseSettings):
+    """
+    Integrity checks configuration (filled thanks to the local .env)
+
+    Attributes are:
+        - checksum_check: whether checksums are compared with provider values after transfers
+        - checksum_s3_etag: whether S3 ETags are MD5 based (False for SSE-KMS buckets)
+        - checksum_upload_head: whether S3 uploads are compared with the stored object through
+         an extra head_object request (every upload request being validated by S3 anyway)
+    """
+    checksum_check: bool = True
+    checksum_s3_etag: bool = True
+    checksum_upload_head: bool = False
+
+
+class Checksums(NamedTuple):
+    """
+    Size and checksums (hex) of an object content, along with the part size a multipart S3 ETag
+     was computed with
+    """
+    size: int
+    md5: str
+    crc32c: str | None = None
+    s3_etag: str | None = None
+    s3_part_size: int | None = None
+
+
+class ChecksumError(IOError):
+    """
+    Raised when transferred bytes do not match the checksums reported by the provider
+    """
+
+
+class Hasher:
+    """
+    Incremental computation of Checksums, out of consecutive chunks of the content
+    """
+
+    def __init__(self, part_size: int = PART_SIZE) -> None:
+        self.part_size = part_size
+        self._size = 0
+        self._md5 = hashlib.md5()
+        self._crc32c = google_crc32c.Checksum() if google_crc32c else None
+        self._part = hashlib.md5()
+        self._part_filled = 0
+        self._part_digests: list[bytes] = []
+
+    def update(self, data: Any) -> None:
+        """
+        Add the next chunk of the content
+        """
+        view = memoryview(data).cast('B')
+        self._size += len(view)
+        self._md5.update(view)
+        if self._crc32c:  # the google-crc32c C extension only takes bytes
+            self._crc32c.update(bytes(view))
+        while len(view):
+            taken = min(len(view), self.part_size - self._part_filled)
+            self._part.update(view[:taken])
+            self._part_filled += taken
+            view = view[taken:]
+            if self._part_filled == self.part_size:
+                self._part_digests.append(self._part.digest())
+                self._part, self._part_filled = hashlib.md5(), 0
+
+    def checksums(self) -> Checksums:
+        """
+        Checksums of the content added so far
+        """
+        return Checksums(size=self._size, md5=self._md5.hexdigest(),
+                         crc32c=self._crc32c.digest().hex() if self._crc32c else None,
+                         s3_etag=self._s3_etag(),
+                         s3_part_size=self.part_size if self._size >= S3_MULTIPART_THRESHOLD
+                         else None)
+
+    def _s3_etag(self) -> str:
+        """
+        ETag of the content uploaded to S3 by boto3 (single put under the multipart threshold)
+        """
+        if self._size < S3_MULTIPART_THRESHOLD:
+            return self._md5.hexdigest()
+        digests = self._part_digests + ([self._part.digest()] if self._part_filled else [])
+        return f'{hashlib.md5(b"".join(digests)).hexdigest()}-{len(digests)}'
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Read-only, non seekable stream computing the checksums of what is read from the wrapped
+     stream (being non seekable, it is read once, sequentially, by upload clients)
+    """
+
+    def __init__(self, stream: Any, part_size: int = PART_SIZE) -> None:
+        super().__init__()
+        self._stream = stream
+        self._hasher = Hasher(part_size)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        with memoryview(buffer) as view:
+            chunk = self._stream.read(len(view))
+            view[:len(chunk)] = chunk
+            self._hasher.update(view[:len(chunk)])
+        return len(chunk)
+
+    def checksums(self) -> Checksums:
+        """
+        Checksums of the bytes read so far
+        """
+        return self._hasher.checksums()
+
+
+class HashingWriter(io.RawIOBase):
+    """
+    Write-only, non seekable stream computing the checksums of what is written to the wrapped
+     stream (being non seekable, it is written once, sequentially, by download clients)
+    """
+
+    def __init__(self, stream: Any, part_size: int = PART_SIZE) -> None:
+        super().__init__()
+        self._stream = stream
+        self._hasher = Hasher(part_size)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._hasher.update(data)
+        return self._stream.write(data)
+
+    def checksums(self) -> Checksums:
+        """
+        Checksums of the bytes written so far
+        """
+        return self._hasher.checksums()
+
+
+def crc32c_algorithm() -> str | None:
+    """
+    S3 additional checksum algorithm to request on uploads (None if CRC32C cannot be computed,
+     botocore needing awscrt to send it)
+    """
+    return CRC32C_ALGORITHM if google_crc32c and HAS_CRT else None
+
+
+def check_s3_response(checksums: Checksums,
+                      response: dict[str, Any],
+                      key: str,
+                      part_size: int | None = None
+                      ) -> None:
+    """
+    Compare checksums with those of a S3 head_object / get_object response. Multipart ETags are
+     only compared if part_size (the size of the first part of the stored object) is known and is
+     the one they were computed with, CRC32C of multipart objects only if full object ones.
+     Raise a ChecksumError on mismatch.
+    """
+    if response['ContentLength'] != checksums.size:
+        raise ChecksumError(f'{key}: {checksums.size} bytes moved, {response["ContentLength"]} '
+                            f'stored')
+    etag = response['ETag'].strip('"')
+    expected = checksums.s3_etag if _is_multipart(etag) else checksums.md5
+    comparable = CHECKSUM_CONF.checksum_s3_etag and response.get('ServerSideEncryption') != \
+        'aws:kms' and etag.partition('-')[2] == (expected or '').partition('-')[2] and (
+            not _is_multipart(etag) or part_size is not None and
+            part_size == checksums.s3_part_size)
+    if comparable and etag != expected:
+        raise ChecksumError(f'{key}: ETag {etag} stored, {expected} expected')
+    if (crc := response.get('ChecksumCRC32C')) and _is_full_object(crc, etag, response) and \
+            checksums.crc32c and base64.b64decode(crc).hex() != checksums.crc32c:
+        raise ChecksumError(f'{key}: CRC32C {base64.b64decode(crc).hex()} stored, '
+                            f'{checksums.crc32c} expected')
+
+
+def check_md5(checksums: Checksums, stored_md5: bytes | bytearray | None, key: str) -> None:
+    """
+    Compare checksums with the Content-MD5 stored by Azure (if any). Raise a ChecksumError on
+     mismatch.
+    """
+    if stored_md5 and bytes(stored_md5).hex() != checksums.md5:
+        raise ChecksumError(f'{key}: MD5 {bytes(stored_md5).hex()} stored, {checksums.md5} '
+                            f'expected')
+
+
+def etag_md5(etag: str) -> str | None:
+    """
+    MD5 of an object content out of its S3 ETag (None if the ETag is not a plain MD5)
+    """
+    etag = etag.strip('"')
+    if not CHECKSUM_CONF.checksum_s3_etag or _is_multipart(etag) or len(etag) != 32:
+        return None
+    return etag
+
+
+def _is_full_object(crc: str, etag: str, response: dict[str, Any]) -> bool:
+    """
+    Check if a S3 CRC32C is the checksum of the whole object content, not the composite checksum
+     of its parts (ChecksumType is not reported by all S3 compatible stores)
+    """
+    if _is_multipart(crc):
+        return False
+    return not _is_multipart(etag) or response.get('ChecksumType') == 'FULL_OBJECT'
+
+
+def _is_multipart(checksum: str) -> bool:
+    """
+    Check if a S3 checksum is the composite checksum of a multipart upload
+    """
+    return '-' in checksum
+
+
+CHECKSUM_CONF = ChecksumConfiguration()
@@ -0,0 +1,192 @@
+"""
+Module implementing partitioned DataFrame datasets: a DataFrame is split by the values of one or
+more columns into Hive style folders (e.g. dataset/year=2024/month=3/part.csv), so that loads only
+list and read the partitions matching their filters.
+
+The partition columns, the columns order and their dtypes are stored in the DATASET_META json at
+the dataset root, partition values being typed back out of their folder names.
+"""
+from functools import partial
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from urllib.parse import quote
+from urllib.parse import unquote
+
+import pandas as pd
+from ecodev_core import logger_get
+
+from ecodev_cloud.cloud.cloud import CLOUD
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_helpers import cloud_exists
+from ecodev_cloud.cloud.cloud_helpers import cloud_iterdir
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_batch
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_savers import save_cloud_batch
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.constants import CSV_EXT
+
+log = logger_get(__name__)
+DATASET_META = '_dataset.json'
+PART_NAME = f'part{CSV_EXT}'
+HIVE_NULL = '__HIVE_DEFAULT_PARTITION__'
+FILTER = Any | Iterable[Any] | Callable[[Any], bool]
+
+
+def save_cloud_dataset(folder: Path,
+                       data: pd.DataFrame,
+                       partitions: list[str],
+                       cloud: Cloud = CLOUD,
+                       location: str | None = None,
+                       max_workers: int | None = None,
+                       compression: str | None = None
+                       ) -> list[Path]:
+    """
+    Split data by the values of the partitions columns into Hive style folders of the cloud
+     folder dataset, and concurrently upload all the partitions. Return the written partitions.
+    Failed uploads are raised (once all uploads are done), the DATASET_META being then not written.
+
+    Partitions of data replace the stored ones, other stored partitions are kept: a dataset can
+     be appended to partition by partition (with the same partitions columns).
+
+    Attributes are:
+        - folder: root folder of the dataset
+        - data: DataFrame to store
+        - partitions: columns to partition data by, in folder nesting order
+        - cloud, location: where to store the dataset
+        - max_workers: maximum number of concurrent uploads
+        - compression: wire compression (gzip or zstd) of the partition files
+    """
+    location = resolve_location(cloud, location)
+    if missing := [column for column in partitions if column not in data.columns]:
+        raise AttributeError(f'partition columns {missing} are not in the DataFrame')
+    meta = {'partitions': partitions, 'columns': [str(column) for column in data.columns],
+            'dtypes': {column: str(data[column].dtype) for column in partitions}}
+    if (stored := _dataset_meta(folder, cloud, location)) and \
+            stored['partitions'] != partitions:
+        raise AttributeError(f'{folder} is partitioned by {stored["partitions"]}, not {partitions}')
+    parts = {}
+    for values, part in data.groupby(partitions, dropna=False, sort=False):
+        values = values if isinstance(values, tuple) else (values,)
+        parts[_part_path(folder, partitions, values)] = part.drop(columns=partitions)
+    save_cloud_batch(parts, cloud, location, max_workers, compression=compression)
+    save_cloud_data(folder / DATASET_META, meta, cloud, location, strict=True)
+    log.info(f'{len(parts)} partitions of {folder} saved')
+    return list(parts)
+
+
+def load_cloud_dataset(folder: Path,
+                       filters: dict[str, FILTER] | None = None,
+                       cloud: Cloud = CLOUD,
+                       location: str | None = None,
+                       max_workers: int | None = None
+                       ) -> pd.DataFrame:
+    """
+    Load the partitions of the cloud folder dataset matching filters, and concatenate them.
+    Only the folders of matching partitions are listed, and their files are loaded concurrently.
+    Failed loads are raised (once all loads are done): no partition is silently left out.
+
+    Attributes are:
+        - folder: root folder of the dataset
+        - filters: per partition column, either the value to keep, the values to keep, or a
+         predicate on values (all partitions are loaded if None)
+        - cloud, location: where to load the dataset from
+        - max_workers: maximum number of concurrent listings and loads
+    """
+    location = resolve_location(cloud, location)
+    if not (meta := _dataset_meta(folder, cloud, location)):
+        raise FileNotFoundError(f'no partitioned dataset at {folder}')
+    if unknown := set(filters or {}) - set(meta['partitions']):
+        raise AttributeError(f'{sorted(unknown)} are not partition columns of {folder}')
+    parts: dict[Path, dict[str, Any]] = {folder: {}}
+    for column in meta['partitions']:
+        parts = _list_partitions(parts, column, meta['dtypes'][column], (filters or {}).get(column),
+                                 cloud, location, max_workers)
+    loaded = load_cloud_batch([part / PART_NAME for part in parts], cloud, location, max_workers)
+    frames = [loaded[part / PART_NAME].assign(**values) for part, values in parts.items()]
+    log.info(f'{len(frames)} partitions of {folder} loaded')
+    if not frames:
+        return pd.DataFrame(columns=meta['columns'])
+    return pd.concat(frames, ignore_index=True)[meta['columns']]
+
+
+def _list_partitions(parts: dict[Path, dict[str, Any]],
+                     column: str,
+                     dtype: str,
+                     wanted: FILTER | None,
+                     cloud: Cloud,
+                     location: str,
+                     max_workers: int | None
+                     ) -> dict[Path, dict[str, Any]]:
+    """
+    Concurrently list the column partitions nested in parts folders, keeping the wanted ones.
+    Return the partition values per kept folder.
+    """
+    listing = partial(_list_folder, cloud=cloud, location=location)
+    nested = {}
+    for part, folders, error in run_bulk(listing, parts, max_workers):
+        if error:
+            raise error
+        for sub_folder in folders:
+            key, _, raw = sub_folder.name.partition('=')
+            if key == column and _matches(value := _typed(unquote(raw), dtype), wanted):
+                nested[sub_folder] = {**parts[part], column: value}
+    return nested
+
+
+def _list_folder(folder: Path, cloud: Cloud, location: str) -> list[Path]:
+    """
+    List the content of the cloud folder
+    """
+    return list(cloud_iterdir(folder, cloud, location))
+
+
+def _dataset_meta(folder: Path, cloud: Cloud, location: str) -> dict[str, Any] | None:
+    """
+    Stored partitions, columns and dtypes of the dataset at folder, None if there is none
+    """
+    if not cloud_exists(folder / DATASET_META, cloud, location):
+        return None
+    return load_cloud_data(folder / DATASET_META, cloud, location, strict=True)
+
+
+def _part_path(folder: Path, partitions: list[str], values: tuple) -> Path:
+    """
+    Path of the file storing the partition of the passed values
+    """
+    return folder.joinpath(*[f'{column}={_encoded(value)}'
+                             for column, value in zip(partitions, values)]) / PART_NAME
+
+
+def _encoded(value: Any) -> str:
+    """
+    Folder name of a partition value (special characters percent encoded)
+    """
+    return HIVE_NULL if pd.isna(value) else quote(str(value), safe='')
+
+
+def _typed(raw: str, dtype: str) -> Any:
+    """
+    Partition value out of its folder name, cast to the dtype of its column
+    """
+    if raw == HIVE_NULL:
+        return None
+    if dtype == 'bool':
+        return raw == 'True'
+    return pd.Series([raw]).astype(dtype).iloc[0]
+
+
+def _matches(value: Any, wanted: FILTER | None) -> bool:
+    """
+    Check if a partition value matches the filter of its column
+    """
+    if wanted is None:
+        return True
+    if callable(wanted):
+        return wanted(value)
+    if isinstance(wanted, Iterable) and not isinstance(wanted, (str, bytes)):
+        return value in wanted
+    return value == wanted
@@ -0,0 +1,137 @@
+"""
+Module implementing bulk loads decoded in a process pool.
+
+Object bytes are fetched by I/O threads and handed over to decoding processes through shared
+memory (no pickling of the payloads), where they are decoded in place. At most DECODING_BACKLOG
+payloads per decoding process are held in shared memory at once, I/O threads waiting for decoded
+ones to be released before fetching more. Decoded data comes back in a transferable form (see
+TRANSFERABLE_DECODERS).
+"""
+import os
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any
+from typing import Iterable
+
+from ecodev_core import logger_get
+
+from ecodev_cloud.cloud.blob.blob_helpers import get_blob_object
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.cloud_tier import tier
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_object
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.transferable_processing import TRANSFERABLE_DECODERS
+from ecodev_cloud.path_utils import forge_store_path
+
+log = logger_get(__name__)
+DECODING_BACKLOG = 2
+
+
+def decode_cloud_batch(file_paths: Iterable[Path],
+                       processes: int | None,
+                       cloud: Cloud,
+                       location: str | None = None,
+                       max_workers: int | None = None
+                       ) -> dict[Path, Any]:
+    """
+    Concurrently fetch all file_paths objects (max_workers I/O threads), and decode them in a
+     pool of processes (one per core if processes is None). Failures are logged, and the first one
+     raised once all objects are done.
+    """
+    location = resolve_location(cloud, location)
+    file_paths = list(file_paths)
+    for file_path in file_paths:
+        if file_path.suffix not in TRANSFERABLE_DECODERS:
+            raise AttributeError(f'{file_path.suffix} extension of {file_path.name=} cannot be '
+                                 f'decoded in a process pool')
+    decoded: dict[Path, Future] = {}
+    errors = []
+    in_flight = threading.BoundedSemaphore(DECODING_BACKLOG * (processes or os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        fetch = partial(_fetch_shared, cloud=cloud, location=location, in_flight=in_flight)
+        for file_path, payload, error in run_bulk(fetch, file_paths, max_workers):
+            if error:
+                log.critical(f'loading {file_path} failed: {error} happened')
+                errors.append(error)
+                continue
+            decoded[file_path] = pool.submit(_decode_shared, payload.name, payload.size,
+                                             file_path.suffix)
+            decoded[file_path].add_done_callback(partial(_release, payload, in_flight))
+    results = {}
+    for file_path in file_paths:
+        if (future := decoded.get(file_path)) is None:
+            continue
+        if decoding_error := future.exception():
+            log.critical(f'decoding {file_path} failed: {decoding_error} happened')
+            errors.append(decoding_error)
+        else:
+            results[file_path] = future.result()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class SharedPayload:
+    """
+    Object bytes copied in a shared memory block (blocks cannot be empty: size is kept apart)
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self.size = len(data)
+        self.memory = SharedMemory(create=True, size=max(1, self.size))
+        self.memory.buf[:self.size] = data
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the shared memory block, to attach to it from another process
+        """
+        return self.memory.name
+
+
+def _fetch_shared(file_path: Path, cloud: Cloud, location: str,
+                  in_flight: threading.BoundedSemaphore) -> SharedPayload:
+    """
+    Fetch the file_path object bytes (out of the local tier if it holds them) into shared memory,
+     once in_flight allows another payload to be held there
+    """
+    if (local_tier := tier()) and local_tier.holds(cloud, location, forge_store_path(file_path)):
+        getter = local_tier.getter(cloud, location)
+    else:
+        getter = partial(get_blob_object if cloud == Cloud.AZURE else get_s3_object,
+                         location=location)
+    in_flight.acquire()
+    try:
+        return SharedPayload(with_retry(getter, forge_store_path(file_path), False))
+    except Exception:
+        in_flight.release()
+        raise
+
+
+def _decode_shared(name: str, size: int, suffix: str) -> Any:
+    """
+    Decode (in a pool process) the object bytes held by the name shared memory block, in place
+    """
+    memory = SharedMemory(name=name)
+    stream = MemoryReader(memory.buf[:size])
+    try:
+        return TRANSFERABLE_DECODERS[suffix](stream)
+    finally:
+        stream.getbuffer().release()  # decoders (or tracebacks) may still hold the stream
+        memory.close()
+
+
+def _release(payload: SharedPayload, in_flight: threading.BoundedSemaphore, _: Future) -> None:
+    """
+    Free the shared memory block of payload once decoded, letting another payload be fetched
+    """
+    payload.memory.close()
+    payload.memory.unlink()
+    in_flight.release()
@@ -0,0 +1,134 @@
+"""
+Module implementing content hash based upload deduplication.
+
+Deduplicated uploads tag objects with the sha256 of their content (hash_metadata metadata). An
+upload is skipped if the stored object already holds the same content, and replaced by a server
+side copy if an object with the same content was already stored elsewhere in the same location.
+
+The registry of stored contents (HASH_REGISTRY) is per process: contents uploaded by other
+processes or nodes are never copied from, and it only remembers the HASH_REGISTRY_SIZE last
+uploaded contents (an upload of older contents not being replaced by a server side copy).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from ecodev_core import logger_get
+
+from ecodev_cloud.cloud.blob.blob_helpers import blob_copy_file
+from ecodev_cloud.cloud.blob.blob_helpers import blob_metadata
+from ecodev_cloud.cloud.blob.blob_helpers import blob_upload
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.s3.s3_helpers import s3_copy_file
+from ecodev_cloud.cloud.s3.s3_helpers import s3_metadata
+from ecodev_cloud.cloud.s3.s3_helpers import s3_upload
+from ecodev_cloud.path_utils import forge_key
+
+log = logger_get(__name__)
+AZURE_HASH_METADATA = 'content_sha256'
+S3_HASH_METADATA = 'content-sha256'
+HASH_CHUNK = 1024 * 1024
+HASH_REGISTRY_SIZE = 100_000
+HASH_KEY = tuple[Cloud, str, str]
+
+
+class HashRegistry:
+    """
+    Process local LRU registry of the last key known to hold a given content, per cloud location
+    """
+
+    def __init__(self, max_size: int = HASH_REGISTRY_SIZE) -> None:
+        self.max_size = max_size
+        self._keys: OrderedDict[HASH_KEY, Path] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cloud: Cloud, location: str, digest: str) -> Path | None:
+        """
+        Path of an object known to hold the digest content, if any
+        """
+        with self._lock:
+            if (file_path := self._keys.get((cloud, location, digest))) is not None:
+                self._keys.move_to_end((cloud, location, digest))
+            return file_path
+
+    def put(self, cloud: Cloud, location: str, digest: str, file_path: Path) -> None:
+        """
+        Record that the object stored at file_path holds the digest content
+        """
+        with self._lock:
+            self._keys[(cloud, location, digest)] = file_path
+            self._keys.move_to_end((cloud, location, digest))
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+
+HASH_REGISTRY = HashRegistry()
+
+
+def hash_metadata(cloud: Cloud) -> str:
+    """
+    Metadata key of the content hash on cloud (Azure metadata keys must be C# identifiers, and
+     S3 user metadata keys with underscores are dropped by some proxies, e.g. nginx, and by moto)
+    """
+    return AZURE_HASH_METADATA if cloud == Cloud.AZURE else S3_HASH_METADATA
+
+
+def file_sha256(file_path: Path) -> str:
+    """
+    Hex sha256 of the file_path content, read chunk by chunk
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stored_sha256(file_path: Path, cloud: Cloud, location: str) -> str | None:
+    """
+    Content hash tagged on the object stored at file_path (None if absent or not tagged)
+    """
+    metadata = (blob_metadata if cloud == Cloud.AZURE else s3_metadata)(file_path, location)
+    return (metadata or {}).get(hash_metadata(cloud))
+
+
+def dedup_upload(source_path: Path,
+                 dest_path: Path,
+                 cloud: Cloud,
+                 location: str,
+                 content_encoding: str | None = None
+                 ) -> Checksums | None:
+    """
+    Upload content of source_path to dest_path, unless already stored there. If the same content
+     is already stored at another key of the location, do a server side copy instead.
+    Return the checksums of uploaded content (None if not uploaded).
+    """
+    digest = file_sha256(source_path)
+    if stored_sha256(dest_path, cloud, location) == digest:
+        log.info(f'{forge_key(dest_path)} is up to date: upload skipped')
+        return None
+    checksums = None
+    if (known := HASH_REGISTRY.get(cloud, location, digest)) and known != dest_path and \
+            stored_sha256(known, cloud, location) == digest:
+        copier = blob_copy_file if cloud == Cloud.AZURE else s3_copy_file
+        copier(known, dest_path, location=location, dist_origin=True)
+    else:
+        uploader = blob_upload if cloud == Cloud.AZURE else s3_upload
+        checksums = uploader(source_path, dest_path, location=location,
+                             metadata={hash_metadata(cloud): digest},
+                             content_encoding=content_encoding)
+    HASH_REGISTRY.put(cloud, location, digest, dest_path)
+    return checksums
+
+
+def dedup_uploader(cloud: Cloud, location: str, content_encoding: str | None = None
+                   ) -> Callable[[Path, Path], Checksums | None]:
+    """
+    Uploader with the same signature as blob_upload / s3_upload, deduplicating uploads
+    """
+    return partial(dedup_upload, cloud=cloud, location=location,
+                   content_encoding=content_encoding)
@@ -1,32 +1,55 @@
 """
 Module implementing cloud helper methods centered around pathlib like behaviours
 """
+import time
+from functools import partial
 from pathlib import Path
+from typing import Iterable
 from typing import Iterator
+from typing import Mapping
 
 from ecodev_cloud.cloud.blob.blob_helpers import blob_copy_file
 from ecodev_cloud.cloud.blob.blob_helpers import blob_exists
 from ecodev_cloud.cloud.blob.blob_helpers import blob_iterdir
+from ecodev_cloud.cloud.blob.blob_helpers import blob_list_names
 from ecodev_cloud.cloud.blob.blob_helpers import blob_move_file
 from ecodev_cloud.cloud.blob.blob_helpers import blob_move_folder
 from ecodev_cloud.cloud.blob.blob_helpers import blob_rglob
+from ecodev_cloud.cloud.blob.blob_helpers import blob_scan
 from ecodev_cloud.cloud.blob.blob_helpers import CONTAINER
 from ecodev_cloud.cloud.blob.blob_helpers import delete_blob_content
 from ecodev_cloud.cloud.blob.blob_helpers import download_blob_object
 from ecodev_cloud.cloud.blob.blob_helpers import get_blob_url
+from ecodev_cloud.cloud.blob.blob_helpers import get_blob_urls
 from ecodev_cloud.cloud.cloud import CLOUD
 from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_inventory import answering_inventory
+from ecodev_cloud.cloud.cloud_inventory import inventory
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.cloud_tier import tier
 from ecodev_cloud.cloud.s3.s3_helpers import BUCKET
 from ecodev_cloud.cloud.s3.s3_helpers import delete_s3_content
 from ecodev_cloud.cloud.s3.s3_helpers import download_s3_object
 from ecodev_cloud.cloud.s3.s3_helpers import get_s3_url
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_urls
 from ecodev_cloud.cloud.s3.s3_helpers import s3_copy_file
 from ecodev_cloud.cloud.s3.s3_helpers import s3_exists
 from ecodev_cloud.cloud.s3.s3_helpers import s3_iterdir
+from ecodev_cloud.cloud.s3.s3_helpers import s3_list_names
 from ecodev_cloud.cloud.s3.s3_helpers import s3_move_file
 from ecodev_cloud.cloud.s3.s3_helpers import s3_move_folder
 from ecodev_cloud.cloud.s3.s3_helpers import s3_rglob
+from ecodev_cloud.cloud.s3.s3_helpers import s3_scan
+from ecodev_cloud.cloud.url_cache import URL_CACHE
+from ecodev_cloud.cloud.url_cache import URL_KEY
 from ecodev_cloud.constants import FILE_EXTENSIONS
+from ecodev_cloud.disk.disk_helpers import disk_scan
+from ecodev_cloud.path_utils import forge_key
+
+URL_MARGIN = 300
 
 
 def cloud_move_folder(origin: Path,
@@ -46,9 +69,14 @@ def cloud_move_folder(origin: Path,
         - delete_file: whether to delete or not the origin folder. If false, amount to cp and not mv
         - cloud: cloud provider to use for the move
     """
+    _sync_tier(cloud, None, origin if dist_origin else None, dest,
+               forget_origin=dist_origin and delete_file)
+    uploaded = None if dist_origin else _local_sizes(origin, dest)
     if cloud == Cloud.AZURE:
-        return blob_move_folder(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
-    return s3_move_folder(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+        blob_move_folder(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+    else:
+        s3_move_folder(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+    _sync_inventory(cloud, None, origin, dest, uploaded, forget_origin=dist_origin and delete_file)
 
 
 def cloud_copy_file(origin: Path,
@@ -67,9 +95,13 @@ def cloud_copy_file(origin: Path,
         - location: container/buket name inside the azure/s3 storage on which to move
         - cloud: cloud provider to use for the move
     """
+    _sync_tier(cloud, location, origin if dist_origin else None, dest)
+    uploaded = None if dist_origin else _local_sizes(origin, dest)
     if cloud == Cloud.AZURE:
-        return blob_copy_file(origin, dest, dist_origin=dist_origin, location=location or CONTAINER)
-    return s3_copy_file(origin, dest, dist_origin=dist_origin, location=location or BUCKET)
+        blob_copy_file(origin, dest, dist_origin=dist_origin, location=location or CONTAINER)
+    else:
+        s3_copy_file(origin, dest, dist_origin=dist_origin, location=location or BUCKET)
+    _sync_inventory(cloud, location, origin, dest, uploaded)
 
 
 def cloud_move_file(origin: Path,
@@ -88,9 +120,14 @@ def cloud_move_file(origin: Path,
         - delete_file: whether to delete or not the origin file. If false, amount to cp and not mv
         - cloud: cloud provider to use for the move
     """
+    _sync_tier(cloud, None, origin if dist_origin else None, dest,
+               forget_origin=dist_origin and delete_file)
+    uploaded = None if dist_origin else _local_sizes(origin, dest)
     if cloud == Cloud.AZURE:
-        return blob_move_file(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
-    return s3_move_file(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+        blob_move_file(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+    else:
+        s3_move_file(origin, dest, dist_origin=dist_origin, delete_file=delete_file)
+    _sync_inventory(cloud, None, origin, dest, uploaded, forget_origin=dist_origin and delete_file)
 
 
 def get_cloud_url(file_path: Path, timeout: int = 3600, cloud: Cloud = CLOUD) -> str | None:
@@ -98,11 +135,44 @@ def get_cloud_url(file_path: Path, timeout: int = 3600, cloud: Cloud = CLOUD) ->
     Generate a cloud_url.
     Expiration is the time in seconds for the URL to remain valid.
     """
+    _sync_tier(cloud, None, file_path)
     if cloud == Cloud.AZURE:
         return get_blob_url(file_path, timeout=timeout)
     return get_s3_url(file_path, timeout=timeout)
 
 
+def get_cloud_urls(file_paths: Iterable[Path],
+                   timeout: int = 3600,
+                   cloud: Cloud = CLOUD,
+                   location: str | None = None,
+                   cache: bool = False,
+                   margin: int = URL_MARGIN
+                   ) -> dict[Path, str | None]:
+    """
+    Generate cloud_urls for all file_paths, reusing clients and signing material across keys.
+    Expiration is the time in seconds for the URLs to remain valid.
+    If cache, a previously generated URL is returned if it stays valid for timeout seconds, give
+     or take margin seconds (at most half the timeout).
+    """
+    location, file_paths = resolve_location(cloud, location), list(file_paths)
+    for file_path in file_paths:
+        _sync_tier(cloud, location, file_path)
+    now = time.time()
+    valid_until = now + timeout - min(margin, timeout // 2)
+    cached = {fp: URL_CACHE.get(_url_key(cloud, location, fp), valid_until)
+              for fp in file_paths} if cache else {}
+    missing = [fp for fp in file_paths if not cached.get(fp)]
+    fresh: Mapping[Path, str | None]
+    if cloud == Cloud.AZURE:
+        fresh = get_blob_urls(missing, timeout=timeout, location=location)
+    else:
+        fresh = get_s3_urls(missing, timeout=timeout, location=location)
+    for file_path, url in fresh.items():
+        if cache and url:
+            URL_CACHE.put(_url_key(cloud, location, file_path), url, now + timeout)
+    return {fp: cached.get(fp) or fresh.get(fp) for fp in file_paths}
+
+
 def cloud_is_dir(file_path: Path) -> bool:
     """
     Check if a cloud file_path is a folder or not
@@ -112,47 +182,249 @@ def cloud_is_dir(file_path: Path) -> bool:
 
 def cloud_rglob(file_path: Path,
                 pattern: str | None = None,
-                cloud: Cloud = CLOUD
+                cloud: Cloud = CLOUD,
+                location: str | None = None
                 ) -> Iterator[Path]:
     """
     Rglob functionality: recursively find all files in the file_path folder having passed pattern
     """
+    location = resolve_location(cloud, location)
+    _sync_tier(cloud, location, file_path)
+    if local_inventory := answering_inventory(cloud, location):
+        return local_inventory.rglob(cloud, location, file_path, pattern)
     if cloud == Cloud.AZURE:
-        return blob_rglob(file_path, pattern=pattern)
-    return s3_rglob(file_path, pattern=pattern)
+        return blob_rglob(file_path, pattern=pattern, location=location)
+    return s3_rglob(file_path, pattern=pattern, location=location)
 
 
-def cloud_iterdir(file_path: Path, cloud: Cloud = CLOUD) -> Iterator[Path]:
+def cloud_scan(file_path: Path,
+               pattern: str | None = None,
+               cloud: Cloud = CLOUD,
+               location: str | None = None
+               ) -> Iterator[CloudEntry]:
+    """
+    Rglob functionality yielding lightweight entries: path along with size, ETag (Content-MD5 on
+     Azure as well) and last modification date, straight out of the listing pages
+    """
+    location = resolve_location(cloud, location)
+    _sync_tier(cloud, location, file_path)
+    if local_inventory := answering_inventory(cloud, location):
+        return local_inventory.scan(cloud, location, file_path, pattern)
+    if cloud == Cloud.AZURE:
+        return blob_scan(file_path, pattern=pattern, location=location)
+    return s3_scan(file_path, pattern=pattern, location=location)
+
+
+def cloud_du(file_path: Path,
+             depth: int = 0,
+             pattern: str | None = None,
+             cloud: Cloud = CLOUD,
+             location: str | None = None
+             ) -> dict[Path, int]:
+    """
+    Disk usage functionality: total size in bytes of all objects in the file_path folder, out of
+     a single listing (no request per object).
+
+    Attributes are:
+        - file_path: folder to measure
+        - depth: 0 to only return the file_path total, n to return the total of each folder (or
+         object) n levels below file_path
+        - pattern: only account for objects having passed pattern
+        - cloud: cloud provider to list
+        - location: bucket/container to list (default one if None)
+    """
+    usage: dict[Path, int] = {file_path: 0} if not depth else {}
+    for entry in cloud_scan(file_path, pattern=pattern, cloud=cloud, location=location):
+        if not entry.path.is_relative_to(file_path):  # sibling key sharing the file_path prefix
+            continue
+        relative = entry.path.relative_to(file_path).parts[:depth]
+        folder = file_path.joinpath(*relative)
+        usage[folder] = usage.get(folder, 0) + entry.size
+    return usage
+
+
+def cloud_iterdir(file_path: Path, cloud: Cloud = CLOUD, location: str | None = None
+                  ) -> Iterator[Path]:
     """
     list all files and folders directly in the cloud file_path folder.
     """
+    location = resolve_location(cloud, location)
+    _sync_tier(cloud, location, file_path)
+    if local_inventory := answering_inventory(cloud, location):
+        return local_inventory.iterdir(cloud, location, file_path)
     if cloud == Cloud.AZURE:
-        return blob_iterdir(file_path)
-    return s3_iterdir(file_path)
+        return blob_iterdir(file_path, location=location)
+    return s3_iterdir(file_path, location=location)
 
 
-def cloud_exists(file_path: Path, cloud: Cloud = CLOUD) -> bool:
+def cloud_exists(file_path: Path, cloud: Cloud = CLOUD, location: str | None = None) -> bool:
     """
     Check if a file_path exists, either locally or on a cloud
     """
+    location = resolve_location(cloud, location)
+    if (local_tier := tier()) and local_tier.holds(cloud, location, file_path):
+        return True
+    if local_inventory := answering_inventory(cloud, location):
+        return local_inventory.exists(cloud, location, file_path)
     if cloud == Cloud.AZURE:
-        return blob_exists(file_path)
-    return s3_exists(file_path)
+        return blob_exists(file_path, location=location)
+    return s3_exists(file_path, location=location)
+
+
+def cloud_exists_many(file_paths: Iterable[Path],
+                      cloud: Cloud = CLOUD,
+                      location: str | None = None,
+                      max_workers: int | None = None
+                      ) -> dict[Path, bool]:
+    """
+    Check if all file_paths exist on a cloud. Paths sharing a folder are answered out of a single
+     paginated listing of that folder, as long as it takes fewer requests than individual checks.
+     Remaining (scattered or not yet listed) paths are checked concurrently one by one.
+    """
+    location, file_paths = resolve_location(cloud, location), list(file_paths)
+    local_tier = tier()
+    found = {fp: True for fp in file_paths if local_tier and local_tier.holds(cloud, location, fp)}
+    if local_inventory := answering_inventory(cloud, location):
+        return {fp: found.get(fp) or local_inventory.exists(cloud, location, fp)
+                for fp in file_paths}
+    folders: dict[str, list[Path]] = {}
+    for file_path in file_paths:
+        if file_path not in found:
+            folders.setdefault(_folder_prefix(file_path), []).append(file_path)
+    to_check = []
+    for prefix, folder_paths in folders.items():
+        if len(folder_paths) < 2:
+            to_check.extend(folder_paths)
+            continue
+        listed = _list_names(prefix, len(folder_paths) // 2, cloud, location)
+        for file_path in folder_paths:
+            if (answer := _listing_answer(forge_key(file_path), *listed)) is None:
+                to_check.append(file_path)
+            else:
+                found[file_path] = answer
+    checker = partial(blob_exists if cloud == Cloud.AZURE else s3_exists, location=location)
+    for file_path, exists, error in run_bulk(checker, to_check, max_workers):
+        if error:
+            raise error
+        found[file_path] = exists
+    return {fp: found[fp] for fp in file_paths}
 
 
-def download_cloud_object(file_path: Path, local_path: Path, cloud: Cloud = CLOUD) -> None:
+def download_cloud_object(file_path: Path,
+                          local_path: Path,
+                          cloud: Cloud = CLOUD,
+                          location: str | None = None
+                          ) -> None:
     """
     Download on disk at local_path location the content of location at file_path cloud location.
     """
+    location = resolve_location(cloud, location)
+    _sync_tier(cloud, location, file_path)
     if cloud == Cloud.AZURE:
-        return download_blob_object(file_path, local_path)
-    return download_s3_object(file_path, local_path)
+        return download_blob_object(file_path, local_path, location=location)
+    return download_s3_object(file_path, local_path, location=location)
 
 
-def delete_cloud_content(file_path: Path,  cloud: Cloud = CLOUD) -> None:
+def delete_cloud_content(file_path: Path, cloud: Cloud = CLOUD, location: str | None = None
+                         ) -> None:
     """
     Delete content from a cloud at file_path location
     """
+    location = resolve_location(cloud, location)
+    _sync_tier(cloud, location, forgotten=file_path)
     if cloud == Cloud.AZURE:
-        return delete_blob_content(file_path)
-    return delete_s3_content(file_path)
+        delete_blob_content(file_path, location=location)
+    else:
+        delete_s3_content(file_path, location=location)
+    _sync_inventory(cloud, location, forgotten=file_path)
+
+
+def _sync_tier(cloud: Cloud,
+               location: str | None,
+               origin: Path | None = None,
+               forgotten: Path | None = None,
+               forget_origin: bool = False
+               ) -> None:
+    """
+    Make the active local tier (if any) consistent before a cloud operation: wait for pending
+     uploads under origin, and stop serving locally what is under forgotten (and origin if asked).
+    """
+    if not (local_tier := tier()):
+        return
+    location = resolve_location(cloud, location)
+    if origin:
+        local_tier.settle(cloud, location, origin)
+    for file_path in [forgotten, origin if forget_origin else None]:
+        if file_path:
+            local_tier.forget(cloud, location, file_path)
+
+
+def _sync_inventory(cloud: Cloud,
+                    location: str | None,
+                    origin: Path | None = None,
+                    dest: Path | None = None,
+                    uploaded: dict[Path, int] | None = None,
+                    forgotten: Path | None = None,
+                    forget_origin: bool = False
+                    ) -> None:
+    """
+    Keep the active local inventory (if any) up to date after a cloud operation: record the
+     uploaded objects (path -> size) or the server side copy of origin to dest, and the deletion of
+     forgotten (and origin if asked).
+    """
+    if not (local_inventory := inventory()):
+        return
+    location = resolve_location(cloud, location)
+    for file_path, size in (uploaded or {}).items():
+        local_inventory.saved(cloud, location, file_path, size)
+    if origin and dest and uploaded is None:
+        local_inventory.copied(cloud, location, origin, dest)
+    for forgotten_path in [forgotten, origin if forget_origin else None]:
+        if forgotten_path:
+            local_inventory.forget(cloud, location, forgotten_path)
+
+
+def _local_sizes(origin: Path, dest: Path) -> dict[Path, int]:
+    """
+    Cloud paths (and sizes) of the local origin file or folder once uploaded to dest. Only
+     computed if an inventory is to be kept up to date.
+    """
+    if not inventory():
+        return {}
+    if origin.is_file():
+        return {dest: origin.stat().st_size}
+    return {dest / entry.path.relative_to(origin): entry.size
+            for entry in disk_scan(origin, include_dirs=False)}
+
+
+def _url_key(cloud: Cloud, location: str, file_path: Path) -> URL_KEY:
+    """
+    Key of file_path in the URL cache
+    """
+    return cloud.value, location, forge_key(file_path)
+
+
+def _folder_prefix(file_path: Path) -> str:
+    """
+    Listing prefix of the folder containing file_path
+    """
+    return '' if (folder := forge_key(file_path.parent)) == '.' else f'{folder}/'
+
+
+def _list_names(prefix: str, max_pages: int, cloud: Cloud, location: str
+                ) -> tuple[set[str], str | None]:
+    """
+    List names directly under prefix with at most max_pages requests (see s3_list_names)
+    """
+    lister = blob_list_names if cloud == Cloud.AZURE else s3_list_names
+    return with_retry(lister, prefix, max_pages, location=location)
+
+
+def _listing_answer(key: str, names: set[str], last_name: str | None) -> bool | None:
+    """
+    Whether key exists according to a (possibly partial) listing. None if the listing stopped
+     before reaching key.
+    """
+    if key in names:
+        return True
+    return None if last_name is not None and key > last_name else False
@@ -0,0 +1,415 @@
+"""
+Module implementing an optional local inventory of cloud locations (buckets or containers).
+
+An inventory is a compact sqlite index, sorted by key, of the size, ETag and modification date of
+all objects of a location. It is built out of parallel listings of the location top level
+prefixes, and refreshed incrementally by only listing again the prefixes with recent activity.
+Saves, moves and deletes made through this package keep it up to date. In answering mode (opt-in)
+rglob, scan, iterdir and exists calls are answered out of the inventory instead of the provider.
+"""
+import atexit
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextlib import ExitStack
+from datetime import datetime
+from datetime import timezone
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+
+from ecodev_core import logger_get
+from ecodev_core import make_dir
+from pydantic_settings import BaseSettings
+
+from ecodev_cloud.cloud.blob.blob_helpers import blob_list_names
+from ecodev_cloud.cloud.blob.blob_helpers import blob_scan
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.s3.s3_helpers import s3_list_names
+from ecodev_cloud.cloud.s3.s3_helpers import s3_scan
+from ecodev_cloud.file_processing.basic_file_processing import get_common_ancestor
+from ecodev_cloud.path_utils import forge_key
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+
+log = logger_get(__name__)
+INVENTORY_KEY = tuple[Cloud, str]
+KEY_END = '\U0010ffff'
+PAGE_SIZE = 10_000
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY, size INTEGER, etag TEXT, mtime REAL, md5 TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS partitions (
+    prefix TEXT PRIMARY KEY, listed REAL, touched REAL DEFAULT 0, latest REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS listings (
+    prefix TEXT, key TEXT, size INTEGER, etag TEXT, mtime REAL, md5 TEXT, PRIMARY KEY (prefix, key)
+) WITHOUT ROWID;
+"""
+
+
+class InventoryConfiguration(BaseSettings):
+    """
+    Local inventory configuration (filled thanks to the local .env). No inventory if
+     inventory_folder is empty.
+
+    Attributes are:
+        - inventory_folder: where inventories are stored, one sqlite file per location
+        - inventory_answers: whether listing helpers are answered out of the inventory (opt-in)
+        - inventory_depth: folder depth of the prefixes listed in parallel
+        - inventory_active: prefixes holding objects modified less than this many seconds ago
+         are listed again on each refresh
+        - inventory_max_age: prefixes are listed again at least every inventory_max_age seconds
+    """
+    inventory_folder: str = ''
+    inventory_answers: bool = False
+    inventory_depth: int = 1
+    inventory_active: float = 3600.
+    inventory_max_age: float = 86400.
+
+
+class Inventory:
+    """
+    Local inventories of cloud locations, one sqlite index per location stored in folder.
+    Locations are only tracked once built by a first refresh.
+    """
+
+    def __init__(self, folder: Path, answers: bool = False) -> None:
+        self.folder = folder
+        self.answers = answers
+        make_dir(folder)
+        self._connections: dict[INVENTORY_KEY, sqlite3.Connection] = {}
+        self._lock = threading.RLock()
+
+    def refresh(self,
+                cloud: Cloud,
+                location: str,
+                full: bool = False,
+                max_workers: int | None = None
+                ) -> int:
+        """
+        Build (or incrementally refresh) the location inventory. Prefixes are listed in parallel,
+         only if new, written to through this package, holding recently modified objects, or not
+         listed for inventory_max_age seconds (all of them if full). Return the number of listed
+         prefixes.
+        """
+        started = time.time()
+        prefixes = _prefixes(cloud, location, INVENTORY_CONF.inventory_depth, max_workers)
+        with self._lock:
+            known = {row[0]: row[1:] for row in self._db(cloud, location).execute(
+                'SELECT prefix, listed, touched, latest FROM partitions')}
+        stale = [prefix for prefix in prefixes
+                 if full or _is_stale(known.get(prefix), started)]
+        lister = partial(self._relist, cloud=cloud, location=location, listed=started)
+        for _, _, error in run_bulk(lister, stale, max_workers):
+            if error:
+                raise error
+        with self._lock, (db := self._db(cloud, location)):
+            db.executemany('DELETE FROM partitions WHERE prefix = ?',
+                           [(prefix,) for prefix in set(known) - set(prefixes)])
+            for low, high in _gaps(prefixes):
+                db.execute('DELETE FROM objects WHERE key > ? AND key < ? AND mtime < ?',
+                           (low, high, started))
+            db.execute('PRAGMA user_version = 1')
+        log.info(f'inventory of {cloud.value} {location}: {len(stale)}/{len(prefixes)} prefixes '
+                 f'listed in {time.time() - started:.1f}s')
+        return len(stale)
+
+    def holds(self, cloud: Cloud, location: str) -> bool:
+        """
+        Check if the location inventory is built
+        """
+        with self._lock:
+            if (cloud, location) not in self._connections and not self._path(
+                    cloud, location).exists():
+                return False
+            return self._db(cloud, location).execute('PRAGMA user_version').fetchone()[0] == 1
+
+    def scan(self, cloud: Cloud, location: str, file_path: Path, pattern: str | None = None
+             ) -> Iterator[CloudEntry]:
+        """
+        Same as cloud_scan (keys starting with the file_path key, having pattern), sorted by key
+        """
+        cleaned_pattern = pattern.replace('*', '') if pattern else None
+        prefix = '' if (key := forge_key(file_path)) == '.' else key
+        for key, size, etag, mtime, md5 in self._keys(cloud, location, prefix):
+            if not cleaned_pattern or cleaned_pattern in key:
+                yield CloudEntry(path=ROOT_DIRECTORY / key, size=size, etag=etag,
+                                 last_modified=datetime.fromtimestamp(mtime, timezone.utc),
+                                 content_md5=md5)
+
+    def rglob(self, cloud: Cloud, location: str, file_path: Path, pattern: str | None = None
+              ) -> Iterator[Path]:
+        """
+        Same as cloud_rglob, sorted by key
+        """
+        yield from (entry.path for entry in self.scan(cloud, location, file_path, pattern))
+
+    def iterdir(self, cloud: Cloud, location: str, file_path: Path) -> Iterator[Path]:
+        """
+        Same as cloud_iterdir: all files and folders directly in the file_path folder
+        """
+        prefix = '' if (folder := forge_key(file_path)) == '.' else f'{folder}/'
+        children = {file_path / get_common_ancestor(ROOT_DIRECTORY / row[0], file_path)
+                    for row in self._keys(cloud, location, prefix)}
+        yield from sorted(children)
+
+    def exists(self, cloud: Cloud, location: str, file_path: Path) -> bool:
+        """
+        Check if an object is stored at file_path
+        """
+        with self._lock:
+            row = self._db(cloud, location).execute('SELECT 1 FROM objects WHERE key = ?',
+                                                    (forge_key(file_path),)).fetchone()
+        return row is not None
+
+    def saved(self, cloud: Cloud, location: str, file_path: Path, size: int) -> None:
+        """
+        Record an object of size bytes written at file_path (of unknown ETag until the next
+         refresh). No-op if the location is not inventoried.
+        """
+        if not self.holds(cloud, location):
+            return
+        key = forge_key(file_path)
+        with self._lock, (db := self._db(cloud, location)):
+            db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, NULL, ?, NULL)',
+                       (key, size, time.time()))
+            _touch(db, key)
+
+    def copied(self, cloud: Cloud, location: str, origin: Path, dest: Path) -> None:
+        """
+        Record the server side copy of the origin object (or folder) to dest
+        """
+        if not self.holds(cloud, location):
+            return
+        origin_key, dest_key = forge_key(origin), forge_key(dest)
+        with self._lock, (db := self._db(cloud, location)):
+            for key in [origin_key, f'{origin_key}/']:
+                rows = db.execute(*_range_query('SELECT key, size, md5 FROM objects', key))
+                db.executemany('INSERT OR REPLACE INTO objects VALUES (?, ?, NULL, ?, ?)', [
+                    (dest_key + row[0][len(origin_key):], row[1], time.time(), row[2])
+                    for row in rows.fetchall()])
+            _touch(db, dest_key)
+
+    def forget(self, cloud: Cloud, location: str, file_path: Path) -> None:
+        """
+        Record the deletion of the file_path object (or of all objects in the file_path folder)
+        """
+        if not self.holds(cloud, location):
+            return
+        key = forge_key(file_path)
+        with self._lock, (db := self._db(cloud, location)):
+            db.execute('DELETE FROM objects WHERE key = ?', (key,))
+            db.execute(*_range_query('DELETE FROM objects', f'{key}/'))
+            _touch(db, key)
+
+    def close(self) -> None:
+        """
+        Close all inventory connections
+        """
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
+
+    def _keys(self, cloud: Cloud, location: str, prefix: str) -> Iterator[tuple]:
+        """
+        All rows whose key starts with prefix, fetched by pages (no cursor is held in between)
+        """
+        last = None
+        while True:
+            with self._lock:
+                rows = self._db(cloud, location).execute(
+                    'SELECT key, size, etag, mtime, md5 FROM objects WHERE key >= ? AND key < ? '
+                    'AND key > ? ORDER BY key LIMIT ?',
+                    (prefix, prefix + KEY_END, last or '', PAGE_SIZE)).fetchall()
+            yield from rows
+            if len(rows) < PAGE_SIZE:
+                return
+            last = rows[-1][0]
+
+    def _relist(self, prefix: str, cloud: Cloud, location: str, listed: float) -> None:
+        """
+        Replace all the objects of prefix by freshly listed ones. Listing pages are staged in the
+         listings table as they come (never holding the whole prefix in memory), and swapped in
+         once the listing is complete.
+        """
+        with self._lock, (db := self._db(cloud, location)):
+            db.execute('DELETE FROM listings WHERE prefix = ?', (prefix,))
+        entries, latest = _list_prefix(prefix, cloud, location), 0.
+        while page := list(islice(entries, PAGE_SIZE)):
+            rows = [(prefix, forge_key(entry.path), entry.size, entry.etag,
+                     entry.last_modified.timestamp(), entry.content_md5) for entry in page]
+            latest = max(latest, *(row[4] for row in rows))
+            with self._lock, (db := self._db(cloud, location)):
+                db.executemany('INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)', rows)
+        with self._lock, (db := self._db(cloud, location)):
+            db.execute(*_range_query('DELETE FROM objects', prefix))
+            db.execute('INSERT OR REPLACE INTO objects SELECT key, size, etag, mtime, md5 '
+                       'FROM listings WHERE prefix = ?', (prefix,))
+            db.execute('DELETE FROM listings WHERE prefix = ?', (prefix,))
+            db.execute('INSERT INTO partitions (prefix, listed, latest) VALUES (?, ?, ?) '
+                       'ON CONFLICT(prefix) DO UPDATE SET listed = excluded.listed, '
+                       'latest = excluded.latest', (prefix, listed, latest))
+
+    def _db(self, cloud: Cloud, location: str) -> sqlite3.Connection:
+        """
+        Connection (shared between threads, under lock) to the location inventory
+        """
+        if not (connection := self._connections.get((cloud, location))):
+            make_dir((path := self._path(cloud, location)).parent)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            self._connections[(cloud, location)] = connection
+        return connection
+
+    def _path(self, cloud: Cloud, location: str) -> Path:
+        """
+        sqlite file of the location inventory
+        """
+        return self.folder / cloud.value / f'{location}.sqlite'
+
+
+INVENTORY_CONF = InventoryConfiguration()
+INVENTORY: Inventory | None = None
+
+
+def inventory() -> Inventory | None:
+    """
+    Singleton to retrieve the active local inventory, if any.
+    """
+    global INVENTORY
+    if not INVENTORY and INVENTORY_CONF.inventory_folder:
+        INVENTORY = Inventory(Path(INVENTORY_CONF.inventory_folder),
+                              INVENTORY_CONF.inventory_answers)
+        atexit.register(INVENTORY.close)
+    return INVENTORY
+
+
+def answering_inventory(cloud: Cloud, location: str) -> Inventory | None:
+    """
+    Active local inventory, if it is in answering mode and holds location
+    """
+    if (local_inventory := inventory()) and local_inventory.answers and local_inventory.holds(
+            cloud, location):
+        return local_inventory
+    return None
+
+
+@contextmanager
+def cloud_inventory(folder: Path | None = None, answers: bool = True) -> Iterator[Inventory]:
+    """
+    Activate a local inventory (in folder, or in a temporary folder) for the duration of the
+     context, answering listing helpers if answers.
+    """
+    global INVENTORY
+    previous = INVENTORY
+    with ExitStack() as stack:
+        inventory_folder = folder or Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        INVENTORY = Inventory(inventory_folder, answers)
+        try:
+            yield INVENTORY
+        finally:
+            try:
+                INVENTORY.close()
+            finally:
+                INVENTORY = previous
+
+
+def refresh_inventory(cloud: Cloud,
+                      location: str,
+                      full: bool = False,
+                      max_workers: int | None = None
+                      ) -> int:
+    """
+    Build (or incrementally refresh) the active local inventory of location (see
+     Inventory.refresh). Return the number of listed prefixes.
+    """
+    if not (local_inventory := inventory()):
+        raise RuntimeError('no active inventory: set INVENTORY_FOLDER or use cloud_inventory')
+    return local_inventory.refresh(cloud, location, full, max_workers)
+
+
+def _prefixes(cloud: Cloud, location: str, depth: int, max_workers: int | None) -> list[str]:
+    """
+    Prefixes (folder names ending with a / and object keys) depth levels below the location
+     root, out of delimited listings
+    """
+    lister = partial(blob_list_names if cloud == Cloud.AZURE else s3_list_names,
+                     max_pages=sys.maxsize, location=location)
+    prefixes: list[str] = []
+    folders = ['']
+    for _ in range(depth):
+        names: list[str] = []
+        for _, (listed, _), error in run_bulk(lister, folders, max_workers):
+            if error:
+                raise error
+            names.extend(listed)
+        prefixes.extend(name for name in names if not name.endswith('/'))
+        folders = [name for name in names if name.endswith('/')]
+    return sorted(prefixes + folders)
+
+
+def _list_prefix(prefix: str, cloud: Cloud, location: str) -> Iterator[CloudEntry]:
+    """
+    All objects of prefix (the object itself, or all objects in the folder if prefix ends with /)
+    """
+    scanner = blob_scan if cloud == Cloud.AZURE else s3_scan
+    return (entry for entry in scanner(ROOT_DIRECTORY / prefix, location=location)
+            if _in_prefix(forge_key(entry.path), prefix))
+
+
+def _in_prefix(key: str, prefix: str) -> bool:
+    """
+    Check if key belongs to prefix (a folder name ending with a /, or an object key)
+    """
+    return key.startswith(prefix) if prefix.endswith('/') else key == prefix
+
+
+def _is_stale(partition: tuple[float, float, float] | None, now: float) -> bool:
+    """
+    Check if a prefix (listed, touched, latest modification) is to be listed again
+    """
+    if partition is None:
+        return True
+    listed, touched, latest = partition
+    return touched > listed or now - latest < INVENTORY_CONF.inventory_active or \
+        now - listed > INVENTORY_CONF.inventory_max_age
+
+
+def _gaps(prefixes: list[str]) -> Iterator[tuple[str, str]]:
+    """
+    Key ranges (bounds excluded) between the sorted prefixes: keys in there belong to no prefix
+    """
+    low = ''
+    for prefix in prefixes:
+        yield low, prefix
+        low = prefix + KEY_END if prefix.endswith('/') else prefix
+    yield low, KEY_END * 2
+
+
+def _range_query(statement: str, prefix: str) -> tuple[str, tuple[str, ...]]:
+    """
+    statement restricted to the objects of prefix (see _in_prefix)
+    """
+    if prefix.endswith('/'):
+        return f'{statement} WHERE key >= ? AND key < ?', (prefix, prefix + KEY_END)
+    return f'{statement} WHERE key = ?', (prefix,)
+
+
+def _touch(db: sqlite3.Connection, key: str) -> None:
+    """
+    Mark the prefixes holding key as written to (they are listed again on the next refresh)
+    """
+    parts = key.split('/')
+    candidates = [key] + ['/'.join(parts[:index]) + '/' for index in range(1, len(parts))]
+    db.execute(f'UPDATE partitions SET touched = ? WHERE prefix IN '
+               f'({", ".join("?" * len(candidates))})', (time.time(), *candidates))
@@ -1,20 +1,40 @@
 """
 Module implementing cloud loading methods
 """
+import sys
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from typing import Any
 from typing import Callable
+from typing import Iterable
+from typing import Iterator
 
 import pandas as pd
 from ecodev_core import logger_get
 
 from ecodev_cloud.cloud.blob.blob_container import CONTAINER
+from ecodev_cloud.cloud.blob.blob_helpers import blob_reader
 from ecodev_cloud.cloud.blob.blob_helpers import get_blob_object
 from ecodev_cloud.cloud.cloud import CLOUD
 from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_cache import cached_download
+from ecodev_cloud.cloud.cloud_decoding import decode_cloud_batch
+from ecodev_cloud.cloud.cloud_helpers import cloud_rglob
+from ecodev_cloud.cloud.cloud_pack import cache_index
+from ecodev_cloud.cloud.cloud_pack import member_accessors
+from ecodev_cloud.cloud.cloud_pack import member_views
+from ecodev_cloud.cloud.cloud_pack import read_index
+from ecodev_cloud.cloud.cloud_pack import split_member
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.cloud_tier import tier
 from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
 from ecodev_cloud.cloud.s3.s3_helpers import get_s3_object
+from ecodev_cloud.cloud.s3.s3_helpers import s3_reader
 from ecodev_cloud.constants import CSV_EXT
 from ecodev_cloud.constants import GPKG_EXT
 from ecodev_cloud.constants import JSON_EXT
@@ -29,71 +49,270 @@ from ecodev_cloud.constants import UTF8_STR
 from ecodev_cloud.constants import XLSX_EXT
 from ecodev_cloud.constants import ZIP_EXT
 from ecodev_cloud.disk.disk_loader import DATA_TYPE
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.disk.disk_loader import DISK_MMAP_LOADERS
 from ecodev_cloud.file_processing.basic_file_processing import get_in_memory_json_data
+from ecodev_cloud.file_processing.basic_file_processing import load_zipped_folder
+from ecodev_cloud.file_processing.compression_processing import COMPRESSIBLE_EXTENSIONS
+from ecodev_cloud.file_processing.compression_processing import decompressed
 from ecodev_cloud.file_processing.netcdf_processing import read_data_netcdf
 from ecodev_cloud.file_processing.numpy_processing import get_npz_data
-from ecodev_cloud.file_processing.numpy_processing import get_numpy_data
+from ecodev_cloud.file_processing.numpy_processing import get_numpy_view
 from ecodev_cloud.file_processing.shapely_processing import load_memory_gpkg
 from ecodev_cloud.file_processing.shapely_processing import load_zipped_shp
-from ecodev_cloud.file_processing.tif_processing import get_in_memory_tile
+from ecodev_cloud.file_processing.stream_processing import buffered
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.tif_processing import stream_in_memory_tile
+from ecodev_cloud.path_utils import forge_store_path
 
 log = logger_get(__name__)
+PREFETCH = 4
+PREFETCH_BYTES = 512 * 1024 * 1024
 
 CLOUD_LOADERS: dict[str, Callable[[Any], DATA_TYPE]] = {
     NPZ_EXT: get_npz_data,
-    NPY_EXT: get_numpy_data,
+    NPY_EXT: get_numpy_view,
     NETCDF_EXT: read_data_netcdf,
     JSON_EXT: get_in_memory_json_data,
     SHP_EXT: load_zipped_shp,
     GPKG_EXT: load_memory_gpkg,
-    TIF_EXT: get_in_memory_tile,
     CSV_EXT: pd.read_csv,
     TXT_EXT: lambda x: x.decode(UTF8_STR),
     LATEX_EXT: lambda x: x.decode(UTF8_STR),
     XLSX_EXT: pd.ExcelFile
 }
 
+"""
+Loaders working on a seekable stream: only the parts of the object actually read are fetched,
+ and the whole object is never held in a python buffer
+"""
+CLOUD_STREAM_LOADERS: dict[str, Callable[[Any], DATA_TYPE]] = {
+    ZIP_EXT: load_zipped_folder,
+    TIF_EXT: stream_in_memory_tile
+}
+
 
 def load_cloud_data(file_path: Path,
                     cloud: Cloud = CLOUD,
-                    location: str | None = None
+                    location: str | None = None,
+                    mmap: bool = False,
+                    strict: bool = False,
+                    **loader_kwargs: Any
                     ) -> DATA_TYPE:
     """
     Load cloud data from file_path location.
+
+    If a local tier is active and holds file_path data, it is served from local disk.
+    If file_path is a pack member (e.g. folder/batch.pack/member.json, see cloud_pack), only its
+     bytes are fetched, with a ranged request.
+    If mmap, the object is downloaded in the host cache and memory mapped from there (only
+     supported for DISK_MMAP_LOADERS extensions).
+    If strict, fetching or decoding errors are raised, they are logged (and None returned)
+     otherwise.
+    loader_kwargs are passed to the extension loader (e.g. bbox and where to only decode
+     matching features of a GeoPackage or a shapefile).
     """
+    location = resolve_location(cloud, location)
+    if split_member(file_path):
+        if mmap:
+            raise AttributeError(f'pack member {file_path.name=} cannot be mmaped')
+        return _cloud_load(file_path, *member_accessors(cloud, location), strict,
+                           **loader_kwargs)
+    if mmap:
+        return _mmap_load(file_path, cloud, location, **loader_kwargs)
+    if (local_tier := tier()) and local_tier.holds(cloud, location, forge_store_path(file_path)):
+        return _cloud_load(file_path, local_tier.getter(cloud, location),
+                           local_tier.reader(cloud, location), strict, **loader_kwargs)
     if cloud == Cloud.AZURE:
-        return load_blob_data(file_path, location=location or CONTAINER)
-    return load_s3_data(file_path, location=location or BUCKET)
+        return load_blob_data(file_path, location=location, strict=strict, **loader_kwargs)
+    return load_s3_data(file_path, location=location, strict=strict, **loader_kwargs)
 
 
-def load_s3_data(file_path: Path, location: str = BUCKET) -> DATA_TYPE:
+def load_cloud_batch(file_paths: Iterable[Path],
+                     cloud: Cloud = CLOUD,
+                     location: str | None = None,
+                     max_workers: int | None = None,
+                     processes: int | None = None
+                     ) -> dict[Path, DATA_TYPE]:
+    """
+    Concurrently load cloud data from all file_paths locations (with retries and concurrency
+     control on throttling). Raise the first failure once all loads are done.
+
+    If processes is set, bytes are fetched by threads but decoded by a pool of that many
+     processes, and data is returned in a transferable form (see TRANSFERABLE_DECODERS).
+    """
+    if processes:
+        return decode_cloud_batch(file_paths, processes, cloud, location, max_workers)
+    loaded, errors = {}, []
+    for file_path, data, error in run_bulk(
+            partial(load_cloud_data, cloud=cloud, location=location, strict=True), file_paths,
+            max_workers):
+        if error:
+            log.critical(f'loading {file_path} failed: {error} happened')
+            errors.append(error)
+        loaded[file_path] = data
+    if errors:
+        raise errors[0]
+    return loaded
+
+
+def load_cloud_pack(pack_path: Path,
+                    names: Iterable[str] | None = None,
+                    cloud: Cloud = CLOUD,
+                    location: str | None = None
+                    ) -> dict[str, DATA_TYPE]:
+    """
+    Load members of the pack at pack_path (all of them, or only the names ones) with a single
+     request for the whole pack. Return data per member name.
+    """
+    location = resolve_location(cloud, location)
+    if (local_tier := tier()) and local_tier.holds(cloud, location, pack_path):
+        local, getter = True, local_tier.getter(cloud, location)
+    else:
+        local, getter = False, partial(get_blob_object if cloud == Cloud.AZURE else get_s3_object,
+                                       location=location)
+    index = read_index(data := with_retry(getter, pack_path, False))
+    # an index read out of a whole cloud pack has no ETag to condition member reads on
+    cache_index(pack_path, cloud, location, index if local else None)
+    views = member_views(data, index)
+    return {name: _member_load(name, views[forge_store_path(Path(name)).as_posix()])
+            for name in (index.members if names is None else names)}
+
+
+def cloud_iter_load(prefix_or_paths: Path | Iterable[Path],
+                    pattern: str | None = None,
+                    prefetch: int = PREFETCH,
+                    cloud: Cloud = CLOUD,
+                    location: str | None = None,
+                    max_bytes: int = PREFETCH_BYTES
+                    ) -> Iterator[tuple[Path, DATA_TYPE]]:
+    """
+    Lazily load cloud data, downloading and decoding the next objects in the background while
+     the caller processes the current one.
+
+    Attributes are:
+        - prefix_or_paths: either a cloud folder (whose files matching pattern are loaded, see
+         cloud_rglob), or the paths to load
+        - pattern: pattern of the files to load in the prefix_or_paths folder
+        - prefetch: maximum number of objects being loaded ahead of the caller
+        - cloud, location: where to load from
+        - max_bytes: no more object is loaded ahead while loaded (not yet yielded) objects exceed
+         this budget (at least one object is always being loaded)
+
+    Yield (path, data) tuples in path order. Outstanding loads are cancelled if the caller stops.
+    """
+    paths = iter(cloud_rglob(prefix_or_paths, pattern, cloud, location)
+                 if isinstance(prefix_or_paths, Path) else prefix_or_paths)
+    load = partial(_sized_load, cloud=cloud, location=location)
+    loading: deque[tuple[Path, Future]] = deque()
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    try:
+        while True:
+            while len(loading) < prefetch and (not loading or _loaded_bytes(loading) < max_bytes):
+                if (file_path := next(paths, None)) is None:
+                    break
+                loading.append((file_path, executor.submit(load, file_path)))
+            if not loading:
+                return
+            file_path, future = loading.popleft()
+            yield file_path, future.result()[0]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_s3_data(file_path: Path, location: str = BUCKET, strict: bool = False,
+                 **loader_kwargs: Any) -> DATA_TYPE:
     """
     Load S3 data from file_path location.
     """
-    return _cloud_load(file_path, partial(get_s3_object, location=location))
+    return _cloud_load(file_path, partial(get_s3_object, location=location),
+                       partial(s3_reader, location=location), strict, **loader_kwargs)
 
 
-def load_blob_data(file_path: Path, location: str = CONTAINER) -> DATA_TYPE:
+def load_blob_data(file_path: Path, location: str = CONTAINER, strict: bool = False,
+                   **loader_kwargs: Any) -> DATA_TYPE:
     """
     Load blob data from file_path location.
     """
-    return _cloud_load(file_path, partial(get_blob_object, location=location))
+    return _cloud_load(file_path, partial(get_blob_object, location=location),
+                       partial(blob_reader, location=location), strict, **loader_kwargs)
 
 
-def _cloud_load(file_path: Path, getter: Callable) -> DATA_TYPE:
+def _cloud_load(file_path: Path,
+                getter: Callable,
+                reader: Callable,
+                strict: bool = False,
+                **loader_kwargs: Any
+                ) -> DATA_TYPE:
     """
     Load cloud data from file_path location.
 
     Pick the correct loading method thanks to file_path file extension.
+    Errors are raised if strict, logged (returning None) otherwise.
     """
-    if not (loader := CLOUD_LOADERS.get(suffix := file_path.suffix)):
+    stream_loader = CLOUD_STREAM_LOADERS.get(suffix := file_path.suffix)
+    if not stream_loader and suffix not in CLOUD_LOADERS:
         raise AttributeError(f'{suffix} extension of {file_path.name=} is not supported')
 
     try:
-        load_path = file_path.with_suffix(ZIP_EXT) if suffix == SHP_EXT else file_path
-        return loader(getter(load_path, _is_byte(suffix)))
+        if stream_loader:
+            return stream_loader(buffered(reader(file_path)), **loader_kwargs)
+        data = with_retry(getter, forge_store_path(file_path), _is_byte(suffix))
+        if suffix in COMPRESSIBLE_EXTENSIONS:
+            data = decompressed(data)
+        return CLOUD_LOADERS[suffix](data, **loader_kwargs)
     except Exception as error:
-        log.crtical(f'loading failed: {error} happened')
+        if strict:
+            raise
+        log.critical(f'loading failed: {error} happened')
+
+
+def _member_load(name: str, view: memoryview) -> DATA_TYPE:
+    """
+    Decode the name member of a pack, out of the view of its bytes
+    """
+    return _cloud_load(Path(name), lambda _, byte: MemoryReader(view) if byte else bytes(view),
+                       lambda _: MemoryReader(view), strict=True)
+
+
+def _sized_load(file_path: Path, cloud: Cloud, location: str | None) -> tuple[DATA_TYPE, int]:
+    """
+    Load cloud data from file_path location, along with its (approximate) size in memory
+    """
+    data = load_cloud_data(file_path, cloud, location, strict=True)
+    return data, _nbytes(data)
+
+
+def _loaded_bytes(loading: deque[tuple[Path, Future]]) -> int:
+    """
+    Memory held by the already loaded objects of loading
+    """
+    return sum(future.result()[1] for _, future in loading if future.done() and
+               not future.exception())
+
+
+def _nbytes(data: DATA_TYPE) -> int:
+    """
+    Approximate size in memory of loaded data (arrays, dataframes, bytes and strings)
+    """
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(index=True).sum())
+    if hasattr(data, 'nbytes'):
+        return int(data.nbytes)
+    return len(data) if isinstance(data, (bytes, bytearray, str)) else sys.getsizeof(data)
+
+
+def _mmap_load(file_path: Path, cloud: Cloud, location: str, **loader_kwargs: Any
+               ) -> DATA_TYPE:
+    """
+    Memory map file_path data, out of the local tier if it holds it, or of the host cache.
+    """
+    if file_path.suffix not in DISK_MMAP_LOADERS:
+        raise AttributeError(f'{file_path.suffix} extension of {file_path.name=} cannot be mmaped')
+    if (local_tier := tier()) and local_tier.holds(cloud, location, file_path):
+        return disk_load(local_tier.local_path(cloud, location, file_path), mmap=True,
+                         **loader_kwargs)
+    return disk_load(cached_download(file_path, cloud, location), mmap=True, **loader_kwargs)
 
 
 def _is_byte(suffix: str) -> bool:
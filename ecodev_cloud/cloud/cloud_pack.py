@@ -0,0 +1,288 @@
+"""
+Module implementing pack objects: many small serialized objects (members) appended into a single
+cloud object, along with an index of their offsets and lengths. A member is addressed by the path
+of the pack followed by its name (e.g. folder/batch.pack/member.json).
+
+A pack starts with PACK_MAGIC, the length of the index (8 bytes, little endian) and the index
+itself (json of name -> (offset, length), offsets counted from the end of the index), followed by
+the members bytes. Indexes are cached in memory along with the ETag of the pack they were read
+from, members being then read only if the pack still has that ETag. If it was rewritten since, its
+index is read again: member getters then read the member again, member readers raise an IOError
+(the member bytes they already returned being stale).
+"""
+import json
+import struct
+import threading
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any
+from typing import BinaryIO
+from typing import Callable
+from typing import NamedTuple
+
+from azure.core.exceptions import ResourceModifiedError
+from botocore.errorfactory import ClientError
+
+from ecodev_cloud.cloud.blob.blob_helpers import get_blob_range
+from ecodev_cloud.cloud.blob.blob_helpers import get_blob_tagged_range
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_tier import tier
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_range
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_tagged_range
+from ecodev_cloud.constants import PACK_EXT
+from ecodev_cloud.constants import UTF8_STR
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.stream_processing import RangedReader
+from ecodev_cloud.file_processing.stream_processing import READ_BUFFER
+
+PACK_MAGIC = b'ECPACK01'
+HEADER = struct.Struct('<8sQ')
+HEAD_FETCH = 64 * 1024
+PACK_INDEX_CACHE_SIZE = 10_000
+PACK_KEY = tuple[str, str, str]
+PRECONDITION_FAILED = 412
+
+
+class PackIndex(NamedTuple):
+    """
+    Index of a pack: offset of the first member, offset (from there) and length per member, and
+     ETag of the pack it was read from (None if read from the local tier)
+    """
+    data_start: int
+    members: dict[str, tuple[int, int]]
+    etag: str | None = None
+
+    def span(self, name: str) -> tuple[int, int]:
+        """
+        Absolute offset and length of the name member in the pack
+        """
+        if (member := self.members.get(name)) is None:
+            raise FileNotFoundError(f'{name} is not a member of the pack')
+        return self.data_start + member[0], member[1]
+
+
+class PackIndexCache:
+    """
+    LRU cache of (cloud, location, pack key) -> PackIndex
+    """
+
+    def __init__(self, max_size: int = PACK_INDEX_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._indexes: OrderedDict[PACK_KEY, PackIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: PACK_KEY) -> PackIndex | None:
+        """
+        Return the cached index of key, if any
+        """
+        with self._lock:
+            if (index := self._indexes.get(key)) is not None:
+                self._indexes.move_to_end(key)
+            return index
+
+    def put(self, key: PACK_KEY, index: PackIndex) -> None:
+        """
+        Cache the index of key
+        """
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+
+    def forget(self, key: PACK_KEY) -> None:
+        """
+        Drop the cached index of key (the pack was rewritten)
+        """
+        with self._lock:
+            self._indexes.pop(key, None)
+
+
+PACK_INDEXES = PackIndexCache()
+
+
+def split_member(file_path: Path) -> tuple[Path, str] | None:
+    """
+    Pack path and member name of file_path, None if file_path is not a pack member
+    """
+    return next(((parent, file_path.relative_to(parent).as_posix())
+                 for parent in file_path.parents if parent.suffix == PACK_EXT), None)
+
+
+def write_pack(members: dict[str, Path], stream: BinaryIO) -> None:
+    """
+    Write in stream the pack of the members files, per member name
+    """
+    index, offset = {}, 0
+    for name, file_path in members.items():
+        index[name] = (offset, length := file_path.stat().st_size)
+        offset += length
+    encoded = json.dumps(index, separators=(',', ':')).encode(UTF8_STR)
+    stream.write(HEADER.pack(PACK_MAGIC, len(encoded)))
+    stream.write(encoded)
+    for file_path in members.values():
+        with open(file_path, 'rb') as member:
+            while chunk := member.read(READ_BUFFER):
+                stream.write(chunk)
+
+
+def read_index(head: Any, fetch: Callable[[int, int], bytes] | None = None) -> PackIndex:
+    """
+    Parse the index of a pack out of its first bytes (head), fetching the end of the index
+     (fetch(start, end), end included) if head does not hold it all
+    """
+    view = memoryview(head).cast('B')
+    magic, length = HEADER.unpack(bytes(view[:HEADER.size]))
+    if magic != PACK_MAGIC:
+        raise IOError('not a pack: unexpected leading bytes')
+    data_start = HEADER.size + length
+    encoded = bytes(view[HEADER.size:data_start])
+    if len(encoded) < length:
+        if fetch is None:
+            raise IOError('truncated pack index: its end cannot be fetched')
+        encoded += fetch(HEADER.size + len(encoded), data_start - 1)
+    members = {name: (start, size) for name, (start, size) in json.loads(encoded).items()}
+    return PackIndex(data_start, members)
+
+
+def member_views(data: Any, index: PackIndex) -> dict[str, memoryview]:
+    """
+    Zero copy views of the bytes of each member of a whole pack held in memory, per name
+    """
+    view, views = memoryview(data).cast('B'), {}
+    for name in index.members:
+        offset, length = index.span(name)
+        views[name] = view[offset:offset + length]
+    return views
+
+
+def pack_index(pack_path: Path, cloud: Cloud, location: str, refresh: bool = False) -> PackIndex:
+    """
+    Index of the pack stored at pack_path, cached after its first read (one ranged request for
+     packs with an index under HEAD_FETCH bytes) unless refresh
+    """
+    key = _pack_key(cloud, location, pack_path)
+    if refresh or (index := PACK_INDEXES.get(key)) is None:
+        head, etag = _tagged_fetcher(pack_path, cloud, location)(0, HEAD_FETCH - 1)
+        index = read_index(head, pack_fetcher(pack_path, cloud, location, etag))._replace(etag=etag)
+        PACK_INDEXES.put(key, index)
+    return index
+
+
+def cache_index(pack_path: Path, cloud: Cloud, location: str, index: PackIndex | None) -> None:
+    """
+    Cache the index of the pack at pack_path (forget it if None, e.g. when rewritten)
+    """
+    if index is None:
+        PACK_INDEXES.forget(_pack_key(cloud, location, pack_path))
+    else:
+        PACK_INDEXES.put(_pack_key(cloud, location, pack_path), index)
+
+
+def pack_fetcher(pack_path: Path, cloud: Cloud, location: str, etag: str | None = None
+                 ) -> Callable[[int, int], bytes]:
+    """
+    Fetcher of the bytes of the pack at pack_path between start and end (included): out of the
+     local tier if it holds the pack, with a ranged request otherwise (only if the pack still has
+     etag, if passed)
+    """
+    if (local_tier := tier()) and local_tier.holds(cloud, location, pack_path):
+        return partial(_local_range, local_tier.local_path(cloud, location, pack_path))
+    get_range = get_blob_range if cloud == Cloud.AZURE else get_s3_range
+    return partial(get_range, pack_path, location=location, etag=etag)
+
+
+def member_accessors(cloud: Cloud, location: str) -> tuple[Callable, Callable]:
+    """
+    Getter and reader with the same signatures as the cloud object ones, reading pack members
+     with one ranged request each
+    """
+    def get_member(member_path: Path, byte: bool = False) -> bytes | MemoryReader:
+        pack_path, name = _member_of(member_path)
+        try:
+            data = _member_bytes(pack_index(pack_path, cloud, location), pack_path, name, cloud,
+                                 location)
+        except (ClientError, ResourceModifiedError) as error:
+            if not _is_rewritten(error):
+                raise
+            data = _member_bytes(pack_index(pack_path, cloud, location, refresh=True), pack_path,
+                                 name, cloud, location)
+        return MemoryReader(data) if byte else data
+
+    def member_reader(member_path: Path) -> RangedReader:
+        pack_path, name = _member_of(member_path)
+        index = pack_index(pack_path, cloud, location)
+        offset, length = index.span(name)
+        fetch = pack_fetcher(pack_path, cloud, location, index.etag)
+
+        def fetch_range(start: int, end: int) -> bytes:
+            try:
+                return fetch(offset + start, offset + end)
+            except (ClientError, ResourceModifiedError) as error:
+                if not _is_rewritten(error):
+                    raise
+                pack_index(pack_path, cloud, location, refresh=True)
+                raise IOError(f'{pack_path} was rewritten while {name} was read') from error
+
+        return RangedReader(length, fetch_range)
+
+    return get_member, member_reader
+
+
+def _member_bytes(index: PackIndex, pack_path: Path, name: str, cloud: Cloud, location: str
+                  ) -> bytes:
+    """
+    Bytes of the name member of the pack at pack_path, read at the span given by index (only if
+     the pack still has the index ETag)
+    """
+    offset, length = index.span(name)
+    if not length:
+        return b''
+    return pack_fetcher(pack_path, cloud, location, index.etag)(offset, offset + length - 1)
+
+
+def _tagged_fetcher(pack_path: Path, cloud: Cloud, location: str
+                    ) -> Callable[[int, int], tuple[bytes, str | None]]:
+    """
+    Fetcher of the bytes of the pack at pack_path between start and end (included) along with the
+     pack ETag (None if read from the local tier)
+    """
+    if (local_tier := tier()) and local_tier.holds(cloud, location, pack_path):
+        local_path = local_tier.local_path(cloud, location, pack_path)
+        return lambda start, end: (_local_range(local_path, start, end), None)
+    get_range = get_blob_tagged_range if cloud == Cloud.AZURE else get_s3_tagged_range
+    return partial(get_range, pack_path, location=location)
+
+
+def _member_of(member_path: Path) -> tuple[Path, str]:
+    """
+    Pack path and member name of member_path, raising if it is not a pack member
+    """
+    if (member := split_member(member_path)) is None:
+        raise FileNotFoundError(f'{member_path} is not a pack member')
+    return member
+
+
+def _is_rewritten(error: ClientError | ResourceModifiedError) -> bool:
+    """
+    Check if error is the failed precondition of a ranged read on a pack rewritten since
+    """
+    return isinstance(error, ResourceModifiedError) or \
+        error.response['ResponseMetadata'].get('HTTPStatusCode') == PRECONDITION_FAILED
+
+
+def _local_range(file_path: Path, start: int, end: int) -> bytes:
+    """
+    Bytes of the local file_path between start and end (included)
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+
+def _pack_key(cloud: Cloud, location: str, pack_path: Path) -> PACK_KEY:
+    """
+    Key of the pack at pack_path in the index cache
+    """
+    return cloud.value, location, pack_path.as_posix()
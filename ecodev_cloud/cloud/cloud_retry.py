@@ -0,0 +1,269 @@
+"""
+Module implementing a retry policy shared by all cloud helpers (exponential backoff with full
+jitter on throttling and transient connection errors), along with an AIMD concurrency control for
+bulk operations: parallelism is halved when the provider throttles, and additively ramped back up
+afterwards.
+
+Retries happen at a single layer: SDK clients do not retry throttled requests themselves, and
+with_retry only retries at its outermost call (nested calls, e.g. a helper retried by a bulk
+operation itself retried, run func once).
+"""
+import contextvars
+import functools
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import TypeVar
+
+from azure.core.exceptions import HttpResponseError
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import HTTPClientError
+from botocore.exceptions import IncompleteReadError
+from ecodev_core import logger_get
+from pydantic_settings import BaseSettings
+
+log = logger_get(__name__)
+ITEM = TypeVar('ITEM')
+THROTTLING_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                    'TooManyRequests', 'ServiceUnavailable', 'ServerBusy', 'OperationTimedOut'}
+THROTTLING_STATUSES = {429, 503}
+# internal server errors, retried without lowering concurrency (they are not throttling)
+SERVER_ERROR_CODES = {'InternalError'}
+SERVER_ERROR_STATUSES = {500}
+# S3 connection errors (Azure clients retry those themselves, see azure_service)
+TRANSIENT_ERRORS = (BotoConnectionError, HTTPClientError, IncompleteReadError)
+
+
+class RetryConfiguration(BaseSettings):
+    """
+    Retry and bulk concurrency configuration (filled thanks to the local .env)
+    """
+    retry_attempts: int = 8
+    retry_base_delay: float = 0.2
+    retry_max_delay: float = 20.
+    bulk_workers: int = 16
+
+
+RETRY_CONF = RetryConfiguration()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter: at most limit operations run at once. The limit is halved on
+     throttling (at most once per cooldown seconds) and increased by one after limit successes.
+    """
+
+    def __init__(self, max_workers: int, min_workers: int = 1, cooldown: float = 1.) -> None:
+        self.max_workers = max_workers
+        self.min_workers = min_workers
+        self.limit = max_workers
+        self._cooldown = cooldown
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.
+        self._condition = threading.Condition()
+
+    def __enter__(self) -> 'AdaptiveLimiter':
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        """
+        Additive increase: one more worker allowed after a full round of successes
+        """
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_workers:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self) -> None:
+        """
+        Multiplicative decrease: halve the number of allowed workers
+        """
+        with self._condition:
+            if (now := time.monotonic()) - self._last_decrease < self._cooldown:
+                return
+            self.limit = max(self.min_workers, self.limit // 2)
+            self._successes, self._last_decrease = 0, now
+            log.warning(f'throttled by the cloud provider: concurrency lowered to {self.limit}')
+
+
+LIMITER: contextvars.ContextVar[AdaptiveLimiter | None] = contextvars.ContextVar(
+    'limiter', default=None)
+RETRYING: contextvars.ContextVar[bool] = contextvars.ContextVar('retrying', default=False)
+
+
+def is_throttling(error: BaseException) -> bool:
+    """
+    Check if error (or one of the errors it was raised from) is a S3/Azure throttling error
+    """
+    return _has_status(error, THROTTLING_CODES, THROTTLING_STATUSES)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Check if error (or one of the errors it was raised from) is worth retrying: throttling, an
+     internal server error, or a transient S3 connection error
+    """
+    if is_throttling(error) or _has_status(error, SERVER_ERROR_CODES, SERVER_ERROR_STATUSES):
+        return True
+    cause: BaseException | None = error
+    while cause:
+        if isinstance(cause, TRANSIENT_ERRORS):
+            return True
+        cause = cause.__cause__ or cause.__context__
+    return False
+
+
+def _has_status(error: BaseException, codes: set[str], statuses: set[int]) -> bool:
+    """
+    Check if error (or one of the errors it was raised from) is a S3/Azure error with one of the
+     codes error codes or of the statuses HTTP statuses
+    """
+    cause: BaseException | None = error
+    while cause:
+        if isinstance(cause, ClientError) and (
+                cause.response.get('Error', {}).get('Code') in codes or
+                cause.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in statuses):
+            return True
+        if isinstance(cause, HttpResponseError) and (
+                getattr(cause, 'error_code', None) in codes or cause.status_code in statuses):
+            return True
+        cause = cause.__cause__ or cause.__context__
+    return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the passed (0 based) attempt
+    """
+    ceiling = min(RETRY_CONF.retry_max_delay, RETRY_CONF.retry_base_delay * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def with_retry(func: Callable, *args, **kwargs) -> Any:
+    """
+    Call func, retrying on throttling and transient errors with exponential backoff. Successes
+     and throttling are reported to the limiter of the bulk operation func is part of (if any).
+    If already called by a retried function, func is only called once: the outermost call retries.
+    func is always called at least once, whatever the configured number of attempts.
+    """
+    if RETRYING.get():
+        return func(*args, **kwargs)
+    token, limiter = RETRYING.set(True), LIMITER.get()
+    attempts = max(1, RETRY_CONF.retry_attempts)
+    try:
+        for attempt in range(attempts):
+            try:
+                result = func(*args, **kwargs)
+                if limiter:
+                    limiter.on_success()
+                return result
+            except Exception as error:
+                if not is_retryable(error) or attempt == attempts - 1:
+                    raise
+                if limiter and is_throttling(error):
+                    limiter.on_throttle()
+                log.warning(f'retrying ({error}), attempt {attempt + 1}')
+                time.sleep(backoff_delay(attempt))
+    finally:
+        RETRYING.reset(token)
+
+
+def retried(func: Callable) -> Callable:
+    """
+    Decorator calling func with retries (see with_retry)
+    """
+    @functools.wraps(func)
+    def retried_func(*args, **kwargs) -> Any:
+        return with_retry(func, *args, **kwargs)
+
+    return retried_func
+
+
+def retried_pages(fetch_page: Callable[[Any], tuple[Any, Any]]) -> Iterator[Any]:
+    """
+    Iterate over the pages of a paginated listing, fetching each page with retries: fetch_page
+     is called with the continuation token of the page (None for the first one), and returns the
+     page along with the token of the next one (None after the last page).
+    """
+    token = None
+    while True:
+        page, token = with_retry(fetch_page, token)
+        yield page
+        if not token:
+            return
+
+
+def run_bulk(func: Callable[[ITEM], Any],
+             items: Iterable[ITEM],
+             max_workers: int | None = None
+             ) -> Iterator[tuple[ITEM, Any, BaseException | None]]:
+    """
+    Apply func to all items concurrently, under AIMD concurrency control and with retries.
+    Yield (item, result, error) tuples as they complete. items are consumed lazily.
+    """
+    limiter = AdaptiveLimiter(max_workers or RETRY_CONF.bulk_workers)
+
+    def task(item: ITEM) -> Any:
+        with limiter:
+            token = LIMITER.set(limiter)
+            try:
+                return with_retry(func, item)
+            finally:
+                LIMITER.reset(token)
+
+    pending: dict[Future, ITEM] = {}
+    with ThreadPoolExecutor(max_workers=limiter.max_workers) as executor:
+        for item in items:
+            pending[executor.submit(task, item)] = item
+            if len(pending) >= 2 * limiter.max_workers:
+                yield from _completed(pending)
+        while pending:
+            yield from _completed(pending)
+
+
+def run_all(func: Callable[[ITEM], Any], items: Iterable[ITEM], max_workers: int | None = None
+            ) -> None:
+    """
+    Apply func to all items concurrently (see run_bulk). Raise the first error once all are done
+    """
+    errors = []
+    for item, _, error in run_bulk(func, items, max_workers):
+        if error:
+            log.critical(f'bulk operation on {item} failed: {error} happened')
+            errors.append(error)
+    if errors:
+        raise errors[0]
+
+
+def _completed(pending: dict[Future, ITEM]
+               ) -> Iterator[tuple[ITEM, Any, BaseException | None]]:
+    """
+    Wait for some pending futures, and yield the (item, result, error) of completed ones
+    """
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        item = pending.pop(future)
+        if error := future.exception():
+            yield item, None, error
+        else:
+            yield item, future.result(), None
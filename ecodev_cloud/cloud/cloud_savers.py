@@ -5,35 +5,58 @@ import tempfile
 from functools import partial
 from pathlib import Path
 from typing import Any
+from typing import BinaryIO
 from typing import Callable
 
 from ecodev_core import logger_get
+from ecodev_core import make_dir
 
 from ecodev_cloud.cloud.blob.blob_container import CONTAINER
 from ecodev_cloud.cloud.blob.blob_helpers import blob_upload
+from ecodev_cloud.cloud.blob.blob_helpers import blob_writer
 from ecodev_cloud.cloud.cloud import CLOUD
 from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_dedup import dedup_uploader
+from ecodev_cloud.cloud.cloud_inventory import inventory
+from ecodev_cloud.cloud.cloud_pack import cache_index
+from ecodev_cloud.cloud.cloud_pack import write_pack
+from ecodev_cloud.cloud.cloud_retry import run_all
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.cloud_tier import Tier
+from ecodev_cloud.cloud.cloud_tier import tier
 from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
 from ecodev_cloud.cloud.s3.s3_helpers import s3_upload
+from ecodev_cloud.cloud.s3.s3_helpers import s3_writer
 from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import GPKG_EXT
 from ecodev_cloud.constants import JSON_EXT
 from ecodev_cloud.constants import LATEX_EXT
+from ecodev_cloud.constants import NETCDF_EXT
 from ecodev_cloud.constants import NPY_EXT
 from ecodev_cloud.constants import NPZ_EXT
 from ecodev_cloud.constants import PNG_EXT
 from ecodev_cloud.constants import SHP_EXT
+from ecodev_cloud.constants import TIF_EXT
 from ecodev_cloud.constants import TXT_EXT
 from ecodev_cloud.constants import XLSX_EXT
 from ecodev_cloud.constants import ZIP_EXT
 from ecodev_cloud.disk.disk_loader import DATA_TYPE
-from ecodev_cloud.file_processing.basic_file_processing import save_folder
 from ecodev_cloud.file_processing.basic_file_processing import save_xlsx
 from ecodev_cloud.file_processing.basic_file_processing import write_json_file
 from ecodev_cloud.file_processing.basic_file_processing import write_png_file
 from ecodev_cloud.file_processing.basic_file_processing import write_text_file
+from ecodev_cloud.file_processing.basic_file_processing import write_zipped_folder
+from ecodev_cloud.file_processing.compression_processing import compress_file
+from ecodev_cloud.file_processing.compression_processing import COMPRESSIBLE_EXTENSIONS
+from ecodev_cloud.file_processing.netcdf_processing import save_netcdf
 from ecodev_cloud.file_processing.numpy_processing import save_numpy_compressed_data
 from ecodev_cloud.file_processing.numpy_processing import save_numpy_data
+from ecodev_cloud.file_processing.shapely_processing import save_gpkg
 from ecodev_cloud.file_processing.shapely_processing import save_shp
+from ecodev_cloud.file_processing.tif_processing import save_tif
+from ecodev_cloud.path_utils import forge_store_path
 
 log = logger_get(__name__)
 
@@ -49,50 +72,249 @@ CLOUD_SAVERS: dict[str, Callable[[Path, Any], None]] = {
     TXT_EXT: write_text_file,
     LATEX_EXT: write_text_file,
     SHP_EXT: save_shp,
-    ZIP_EXT: save_folder,
-    PNG_EXT: write_png_file
+    PNG_EXT: write_png_file,
+    TIF_EXT: save_tif,
+    NETCDF_EXT: save_netcdf,
+    GPKG_EXT: save_gpkg
+}
+
+"""
+Saving mechanisms writing straight into a cloud upload stream, without any local file
+"""
+CLOUD_STREAM_SAVERS: dict[str, Callable[[BinaryIO, Any], None]] = {
+    ZIP_EXT: write_zipped_folder
 }
 
 
 def save_cloud_data(file_path: Path,
                     data: DATA_TYPE,
                     cloud: Cloud = CLOUD,
-                    location: str | None = None
+                    location: str | None = None,
+                    dedup: bool = False,
+                    compression: str | None = None,
+                    strict: bool = False
                     ) -> None:
     """
     Store data at cloud file_path location.
+
+    If a local tier is active, data is written on local disk and uploaded in the background.
+    If dedup, the upload is skipped when the stored object already holds the same content (see
+     cloud_dedup, not applicable to CLOUD_STREAM_SAVERS extensions).
+    compression (gzip or zstd) is applied to COMPRESSIBLE_EXTENSIONS files, and recorded as their
+     Content-Encoding. Loads decompress transparently.
+    If strict, upload errors are raised, they are logged otherwise.
     """
-    if cloud == Cloud.AZURE:
-        return save_blob_data(file_path, data, location=location or CONTAINER)
-    return save_s3_data(file_path, data, location=location or BUCKET)
+    location = resolve_location(cloud, location)
+    if local_tier := tier():
+        return _tier_save(file_path, data, local_tier, cloud, location, dedup, compression)
+    saver = save_blob_data if cloud == Cloud.AZURE else save_s3_data
+    streamed = saver(file_path, data, location, dedup, compression, strict)
+    if (local_inventory := inventory()) and streamed is not None:
+        local_inventory.saved(cloud, location, file_path, streamed)
 
 
-def save_s3_data(file_path: Path, data: DATA_TYPE, location: str = BUCKET) -> None:
+def save_cloud_batch(data: dict[Path, DATA_TYPE],
+                     cloud: Cloud = CLOUD,
+                     location: str | None = None,
+                     max_workers: int | None = None,
+                     dedup: bool = False,
+                     compression: str | None = None
+                     ) -> None:
     """
-    Store data at S3 file_path location.
+    Concurrently store all data values at their cloud file_path key location (with retries and
+     concurrency control on throttling). Raise the first failure once all saves are done.
     """
-    _cloud_save(file_path, data, uploader=partial(s3_upload, location=location))
+    run_all(lambda file_path: save_cloud_data(file_path, data[file_path], cloud, location, dedup,
+                                              compression, strict=True), data, max_workers)
+
 
+def save_cloud_pack(pack_path: Path,
+                    data: dict[str, DATA_TYPE],
+                    cloud: Cloud = CLOUD,
+                    location: str | None = None,
+                    compression: str | None = None
+                    ) -> None:
+    """
+    Store all data values, serialized per the extension of their member name, in a single pack
+     object at cloud pack_path location (see cloud_pack). Each member is then loaded with
+     load_cloud_data(pack_path / name), or all at once with load_cloud_pack.
 
-def save_blob_data(file_path: Path, data: DATA_TYPE, location: str = CONTAINER) -> None:
+    If a local tier is active, the pack is written on local disk and uploaded in the background.
+    compression (gzip or zstd) is applied to COMPRESSIBLE_EXTENSIONS members.
     """
-    Store data at blob file_path location.
+    location = resolve_location(cloud, location)
+    for name in data:
+        if Path(name).suffix not in CLOUD_STREAM_SAVERS:
+            _check_saver(Path(name))
+    serialize = partial(_serialize_pack, pack_path, data, compression=compression)
+    if local_tier := tier():
+        local_tier.save(cloud, location, pack_path, serialize, _uploader(cloud, location, False))
+    else:
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                with_retry(_uploader(cloud, location, False), serialize(Path(folder)), pack_path)
+        except Exception as error:
+            log.critical(f'saving failed: {error} happened')
+    cache_index(pack_path, cloud, location, None)
+
+
+def save_s3_data(file_path: Path,
+                 data: DATA_TYPE,
+                 location: str = BUCKET,
+                 dedup: bool = False,
+                 compression: str | None = None,
+                 strict: bool = False
+                 ) -> int | None:
     """
-    _cloud_save(file_path, data,  uploader=partial(blob_upload, location=location))
+    Store data at S3 file_path location. Return the size of streamed objects (see _cloud_save).
+    """
+    encoding = _encoding(file_path, compression)
+    return _cloud_save(file_path, data, uploader=_uploader(Cloud.AWS, location, dedup, encoding),
+                       writer=partial(s3_writer, location=location), compression=encoding,
+                       strict=strict)
+
+
+def save_blob_data(file_path: Path,
+                   data: DATA_TYPE,
+                   location: str = CONTAINER,
+                   dedup: bool = False,
+                   compression: str | None = None,
+                   strict: bool = False
+                   ) -> int | None:
+    """
+    Store data at blob file_path location. Return the size of streamed objects (see _cloud_save).
+    """
+    encoding = _encoding(file_path, compression)
+    return _cloud_save(file_path, data,
+                       uploader=_uploader(Cloud.AZURE, location, dedup, encoding),
+                       writer=partial(blob_writer, location=location), compression=encoding,
+                       strict=strict)
 
 
-def _cloud_save(file_path: Path, data: DATA_TYPE, uploader: Callable) -> None:
+def _cloud_save(file_path: Path,
+                data: DATA_TYPE,
+                uploader: Callable,
+                writer: Callable,
+                compression: str | None = None,
+                strict: bool = False
+                ) -> int | None:
     """
     Store data at blob file_path location.
     Pick the correct saving method thanks to file_path file extension..
+    Serialization and upload errors are raised if strict, logged otherwise.
+    Return the number of bytes written for CLOUD_STREAM_SAVERS extensions (None otherwise, those
+     uploads being recorded in the inventory by the uploader).
     """
-    if not (saver := CLOUD_SAVERS.get(suffix := file_path.suffix)):
-        raise AttributeError(f'{suffix} extension of {file_path.name=} is not supported')
-
+    if not (stream_saver := CLOUD_STREAM_SAVERS.get(file_path.suffix)):
+        _check_saver(file_path)
     try:
+        if stream_saver:
+            with writer(file_path) as stream:
+                stream_saver(stream, data)
+                return stream.tell()
         with tempfile.TemporaryDirectory() as folder:
-            saver(Path(folder) / file_path.name, data)
-            store_path = file_path if suffix != SHP_EXT else file_path.with_suffix(ZIP_EXT)
-            uploader(Path(folder) / store_path.name, store_path)
+            with_retry(uploader, _serialize(file_path, data, Path(folder), compression),
+                       forge_store_path(file_path))
     except Exception as error:
-        log.crtical(f'saving failed: {error} happened')
+        if strict:
+            raise
+        log.critical(f'saving failed: {error} happened')
+    return None
+
+
+def _tier_save(file_path: Path,
+               data: DATA_TYPE,
+               local_tier: Tier,
+               cloud: Cloud,
+               location: str,
+               dedup: bool,
+               compression: str | None
+               ) -> None:
+    """
+    Store data in the local tier, and schedule its upload at cloud file_path location.
+    """
+    if not CLOUD_STREAM_SAVERS.get(file_path.suffix):
+        _check_saver(file_path)
+    encoding = _encoding(file_path, compression)
+    local_tier.save(cloud, location, forge_store_path(file_path),
+                    partial(_serialize, file_path, data, compression=encoding),
+                    _uploader(cloud, location, dedup, encoding))
+
+
+def _uploader(cloud: Cloud, location: str, dedup: bool, content_encoding: str | None = None
+              ) -> Callable[[Path, Path], Checksums | None]:
+    """
+    Uploader of local files to the cloud location, deduplicating uploads if asked to. Uploads are
+     recorded in the active local inventory, if any, and return the checksums of uploaded content.
+    """
+    if dedup:
+        uploader = dedup_uploader(cloud, location, content_encoding)
+    else:
+        uploader = partial(blob_upload if cloud == Cloud.AZURE else s3_upload, location=location,
+                           content_encoding=content_encoding)
+    return partial(_inventoried_upload, uploader=uploader, cloud=cloud, location=location)
+
+
+def _inventoried_upload(local_path: Path,
+                        store_path: Path,
+                        uploader: Callable[[Path, Path], Checksums | None],
+                        cloud: Cloud,
+                        location: str
+                        ) -> Checksums | None:
+    """
+    Upload local_path at store_path, and record it in the active local inventory (if any).
+    Return the checksums of uploaded content (None if not uploaded).
+    """
+    checksums = uploader(local_path, store_path)
+    if local_inventory := inventory():
+        local_inventory.saved(cloud, location, store_path, local_path.stat().st_size)
+    return checksums
+
+
+def _encoding(file_path: Path, compression: str | None) -> str | None:
+    """
+    Wire compression to apply to file_path (only text-like files are compressed)
+    """
+    return compression if file_path.suffix in COMPRESSIBLE_EXTENSIONS else None
+
+
+def _serialize(file_path: Path, data: DATA_TYPE, folder: Path, compression: str | None = None
+               ) -> Path:
+    """
+    Serialize data in folder, in the format of the file_path extension (then compressed if asked
+     to). Return the written file.
+    """
+    if stream_saver := CLOUD_STREAM_SAVERS.get(file_path.suffix):
+        with open(folder / file_path.name, 'wb') as stream:
+            stream_saver(stream, data)
+        return folder / file_path.name
+
+    CLOUD_SAVERS[file_path.suffix](folder / file_path.name, data)
+    written = folder / forge_store_path(file_path).name
+    return compress_file(written, compression) if compression else written
+
+
+def _serialize_pack(pack_path: Path,
+                    data: dict[str, DATA_TYPE],
+                    folder: Path,
+                    compression: str | None = None
+                    ) -> Path:
+    """
+    Serialize all data values in folder, and pack them in a pack_path named file. Return it.
+    """
+    members = {}
+    for number, (name, value) in enumerate(data.items()):
+        make_dir(member_folder := folder / str(number))
+        members[forge_store_path(Path(name)).as_posix()] = _serialize(
+            Path(name), value, member_folder, _encoding(Path(name), compression))
+    with open(folder / pack_path.name, 'wb') as stream:
+        write_pack(members, stream)
+    return folder / pack_path.name
+
+
+def _check_saver(file_path: Path) -> None:
+    """
+    Check that a saving method is implemented for the file_path extension
+    """
+    if file_path.suffix not in CLOUD_SAVERS:
+        raise AttributeError(f'{file_path.suffix} extension of {file_path.name=} is not supported')
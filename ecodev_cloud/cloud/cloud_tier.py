@@ -0,0 +1,290 @@
+"""
+Module implementing an optional local disk write-back tier in front of cloud object storage.
+
+When a tier is active, save_cloud_data writes on local disk and uploads in the background,
+load_cloud_data serves recently written keys from local disk, and flush_tier waits for (and
+checks) all pending uploads. Local copies beyond tier_max_bytes are evicted, least recently used
+first, once uploaded: copies whose upload failed are kept until uploaded again (see flush).
+"""
+import atexit
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from typing import Callable
+from typing import Iterator
+
+from ecodev_core import logger_get
+from ecodev_core import make_dir
+from pydantic_settings import BaseSettings
+
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.stream_processing import read_into
+from ecodev_cloud.path_utils import forge_key
+
+log = logger_get(__name__)
+TIER_KEY = tuple[Cloud, str, str]
+
+
+class TierConfiguration(BaseSettings):
+    """
+    Local tier configuration (filled thanks to the local .env). No tier if tier_folder is empty.
+
+    Attributes are:
+        - tier_folder: folder of the local copies
+        - tier_workers: number of concurrent background uploads
+        - tier_max_bytes: disk space of the local copies (0 for no limit), beyond which uploaded
+         ones are evicted
+    """
+    tier_folder: str = ''
+    tier_workers: int = 4
+    tier_max_bytes: int = 10 * 1024 ** 3
+
+
+class Tier:
+    """
+    Local disk tier: objects are written in folder and uploaded by a pool of workers threads.
+    Local copies are evicted (least recently used first, and only once uploaded) when they exceed
+     max_bytes (0 for no limit). Uploads that failed are kept, along with their local copies, until
+     scheduled again by flush(retry=True) or replaced by a new save of their key.
+    """
+
+    def __init__(self, folder: Path, workers: int = 4, max_bytes: int = 0) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        make_dir(folder)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending: dict[TIER_KEY, Future] = {}
+        self._jobs: dict[TIER_KEY, Callable[[], Checksums | None]] = {}
+        self._failed: dict[TIER_KEY, Callable[[], Checksums | None]] = {}
+        self._written: OrderedDict[TIER_KEY, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def save(self,
+             cloud: Cloud,
+             location: str,
+             store_path: Path,
+             serialize: Callable[[Path], Path],
+             upload: Callable[[Path, Path], Checksums | None]
+             ) -> None:
+        """
+        Serialize an object into the tier (serialize writes in the passed folder and returns the
+         written file) and schedule its upload at store_path.
+        """
+        key = _key(cloud, location, store_path)
+        self._wait([key])
+        make_dir((local_path := self._local_path(key)).parent)
+        with tempfile.TemporaryDirectory(dir=self.folder) as folder:
+            os.replace(serialize(Path(folder)), local_path)
+        size = local_path.stat().st_size
+        with self._lock:
+            self._bytes += size - self._written.pop(key, 0)
+            self._written[key] = size
+            self._failed.pop(key, None)
+            self._jobs[key] = partial(upload, local_path, store_path)
+            self._pending[key] = self._executor.submit(self._jobs[key])
+        self._evict()
+
+    def holds(self, cloud: Cloud, location: str, store_path: Path) -> bool:
+        """
+        Check if the object stored at store_path can be served from the tier (marking it as
+         recently used)
+        """
+        with self._lock:
+            if held := (key := _key(cloud, location, store_path)) in self._written:
+                self._written.move_to_end(key)
+            return held
+
+    def local_path(self, cloud: Cloud, location: str, store_path: Path) -> Path:
+        """
+        Local tier path of the object stored at store_path (replaced, never modified, on saves)
+        """
+        return self._local_path(_key(cloud, location, store_path))
+
+    def getter(self, cloud: Cloud, location: str) -> Callable:
+        """
+        Getter with the same signature as the cloud object getters, reading from the tier
+        """
+        def get_object(store_path: Path, byte: bool = False) -> bytearray | MemoryReader:
+            with open(self._local_path(_key(cloud, location, store_path)), 'rb') as f:
+                data = read_into(f, os.fstat(f.fileno()).st_size)
+            return MemoryReader(data) if byte else data
+
+        return get_object
+
+    def reader(self, cloud: Cloud, location: str) -> Callable:
+        """
+        Reader with the same signature as the cloud object readers, reading from the tier
+        """
+        return lambda store_path: open(self._local_path(_key(cloud, location, store_path)), 'rb')
+
+    def settle(self, cloud: Cloud, location: str, file_path: Path) -> None:
+        """
+        Wait for pending uploads of the file_path key and of all the keys in the file_path folder
+        """
+        self._wait(self._under(cloud, location, file_path, self._pending))
+
+    def forget(self, cloud: Cloud, location: str, file_path: Path) -> None:
+        """
+        Settle, then stop serving from the tier file_path and all keys in the file_path folder
+        """
+        self.settle(cloud, location, file_path)
+        for key in self._under(cloud, location, file_path, self._written):
+            with self._lock:
+                self._bytes -= self._written.pop(key, 0)
+                self._jobs.pop(key, None)
+                self._failed.pop(key, None)
+            self._local_path(key).unlink(missing_ok=True)
+
+    def flush(self, retry: bool = False) -> None:
+        """
+        Barrier: wait for all pending uploads (scheduling again the failed ones first if retry).
+        Raise if any upload failed and was not uploaded again since: their local copies are kept
+         (served and never evicted) until then.
+        """
+        with self._lock:
+            if retry:
+                for key, job in self._failed.items():
+                    self._pending[key] = self._executor.submit(job)
+                self._failed.clear()
+            pending = dict(self._pending)
+        errors = []
+        for key, upload in pending.items():
+            if error := upload.exception():
+                log.critical(f'tiered upload of {key} failed: {error} happened')
+                errors.append(error)
+            with self._lock:
+                if self._pending.get(key) is upload:
+                    del self._pending[key]
+                    if not error:
+                        self._jobs.pop(key, None)
+                    elif failed_job := self._jobs.get(key):
+                        self._failed[key] = failed_job
+        if failed := len(self._failed):
+            raise RuntimeError(f'{failed} tiered uploads failed (flush with retry to upload them '
+                               f'again)') from (errors[0] if errors else None)
+
+    def close(self) -> None:
+        """
+        Flush and stop the upload workers
+        """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used local copies already uploaded, until the tier holds at
+         most max_bytes (copies pending or whose upload failed are kept)
+        """
+        with self._lock:
+            if not self.max_bytes or self._bytes <= self.max_bytes:
+                return
+            evicted = []
+            for key, size in list(self._written.items()):
+                if self._bytes <= self.max_bytes:
+                    break
+                if key in self._failed or (upload := self._pending.get(key)) and not (
+                        upload.done() and upload.exception() is None):
+                    continue
+                del self._written[key]
+                self._pending.pop(key, None)
+                self._jobs.pop(key, None)
+                self._bytes -= size
+                evicted.append(key)
+        for key in evicted:
+            self._local_path(key).unlink(missing_ok=True)
+
+    def _wait(self, keys: list[TIER_KEY]) -> None:
+        """
+        Wait for the pending uploads of passed keys (errors are only raised by flush)
+        """
+        for key in keys:
+            if upload := self._pending.get(key):
+                upload.exception()
+
+    def _under(self,
+               cloud: Cloud,
+               location: str,
+               file_path: Path,
+               keys: dict | set
+               ) -> list[TIER_KEY]:
+        """
+        Return all keys equal to file_path or in the file_path folder
+        """
+        prefix = forge_key(file_path)
+        with self._lock:
+            return [key for key in keys if key[:2] == (cloud, location) and (
+                key[2] == prefix or key[2].startswith(f'{prefix}/'))]
+
+    def _local_path(self, key: TIER_KEY) -> Path:
+        """
+        Local tier path of the passed key
+        """
+        return self.folder / key[0].value / key[1] / key[2]
+
+
+TIER_CONF = TierConfiguration()
+TIER: Tier | None = None
+
+
+def tier() -> Tier | None:
+    """
+    Singleton to retrieve the active local tier, if any.
+    """
+    global TIER
+    if not TIER and TIER_CONF.tier_folder:
+        TIER = Tier(Path(TIER_CONF.tier_folder), TIER_CONF.tier_workers,
+                    TIER_CONF.tier_max_bytes)
+        atexit.register(TIER.close)
+    return TIER
+
+
+@contextmanager
+def tiered_storage(folder: Path | None = None,
+                   workers: int = TIER_CONF.tier_workers,
+                   max_bytes: int = TIER_CONF.tier_max_bytes
+                   ) -> Iterator[Tier]:
+    """
+    Activate a local tier (in folder, or in a temporary folder, holding at most max_bytes of
+     local copies) for the duration of the context.
+    All pending uploads are flushed when leaving the context.
+    """
+    global TIER
+    previous = TIER
+    with ExitStack() as stack:
+        tier_folder = folder or Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        TIER = Tier(tier_folder, workers, max_bytes)
+        try:
+            yield TIER
+        finally:
+            try:
+                TIER.close()
+            finally:
+                TIER = previous
+
+
+def flush_tier(retry: bool = False) -> None:
+    """
+    Barrier guaranteeing that everything saved through the active tier (if any) is on the cloud,
+     uploading again the saves whose upload failed if retry (see Tier.flush).
+    """
+    if local_tier := tier():
+        local_tier.flush(retry)
+
+
+def _key(cloud: Cloud, location: str, store_path: Path) -> TIER_KEY:
+    """
+    Tier key of the object stored at store_path
+    """
+    return cloud, location, forge_key(store_path)
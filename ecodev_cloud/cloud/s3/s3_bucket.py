@@ -4,6 +4,7 @@ Module implementing the S3 connection logic
 from typing import Any
 
 import boto3
+from botocore.config import Config
 from pydantic_settings import BaseSettings
 
 
@@ -25,6 +26,8 @@ S3_STR = 's3'
 S3: Any | None = None
 BUCKET = S3_CONF.s3_bucket_name
 TEST_BUCKET = 'testbucket'
+# retries are handled by cloud_retry.with_retry: boto must not retry requests on its own
+S3_CLIENT_CONFIG = Config(retries={'mode': 'standard', 'total_max_attempts': 1})
 
 
 def s3() -> Any:
@@ -33,14 +36,16 @@ def s3() -> Any:
     """
     global S3
     if not S3:
-        S3 = S3_SESSION.resource(S3_STR) if S3_CONF.aws_use else S3_SESSION.resource(
-            service_name=S3_STR,
-            aws_access_key_id=S3_CONF.s3_access_key_id,
-            aws_secret_access_key=S3_CONF.s3_secret_access_key,
-            endpoint_url=S3_CONF.s3_endpoint_url,
-            region_name=S3_CONF.s3_region_name,
-            use_ssl=True,
-            verify=True
-        )
+        S3 = S3_SESSION.resource(S3_STR, config=S3_CLIENT_CONFIG) if S3_CONF.aws_use \
+            else S3_SESSION.resource(
+                service_name=S3_STR,
+                config=S3_CLIENT_CONFIG,
+                aws_access_key_id=S3_CONF.s3_access_key_id,
+                aws_secret_access_key=S3_CONF.s3_secret_access_key,
+                endpoint_url=S3_CONF.s3_endpoint_url,
+                region_name=S3_CONF.s3_region_name,
+                use_ssl=True,
+                verify=True
+            )
 
     return S3
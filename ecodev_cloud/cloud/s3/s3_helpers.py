@@ -1,36 +1,160 @@
-from io import BytesIO
+from functools import partial
 from pathlib import Path
+from typing import Any
+from typing import Iterable
 from typing import Iterator
 
+from boto3.s3.transfer import ProgressCallbackInvoker
+from boto3.s3.transfer import TransferConfig
 from botocore.errorfactory import ClientError
-from botocore.response import StreamingBody
+from s3transfer.manager import TransferManager
 
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud_bandwidth import boto_callback
+from ecodev_cloud.cloud.cloud_bandwidth import Direction
+from ecodev_cloud.cloud.cloud_bandwidth import throttle
+from ecodev_cloud.cloud.cloud_bandwidth import ThrottledReader
+from ecodev_cloud.cloud.cloud_checksum import check_s3_response
+from ecodev_cloud.cloud.cloud_checksum import CHECKSUM_CONF
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_checksum import crc32c_algorithm
+from ecodev_cloud.cloud.cloud_checksum import HashingReader
+from ecodev_cloud.cloud.cloud_checksum import HashingWriter
+from ecodev_cloud.cloud.cloud_checksum import S3_MULTIPART_THRESHOLD
+from ecodev_cloud.cloud.cloud_retry import is_retryable
+from ecodev_cloud.cloud.cloud_retry import retried
+from ecodev_cloud.cloud.cloud_retry import retried_pages
+from ecodev_cloud.cloud.cloud_retry import run_all
+from ecodev_cloud.cloud.cloud_retry import with_retry
 from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
 from ecodev_cloud.cloud.s3.s3_bucket import s3
 from ecodev_cloud.file_processing.basic_file_processing import get_common_ancestor
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.stream_processing import MultipartWriter
+from ecodev_cloud.file_processing.stream_processing import PART_SIZE
+from ecodev_cloud.file_processing.stream_processing import RangedReader
+from ecodev_cloud.file_processing.stream_processing import read_into
 from ecodev_cloud.path_utils import forge_key
 from ecodev_cloud.path_utils import ROOT_DIRECTORY
 
+# boto3 transfers with the part size checksums are computed with
+S3_TRANSFER = TransferConfig(multipart_threshold=S3_MULTIPART_THRESHOLD,
+                             multipart_chunksize=PART_SIZE)
 
-PAGINATOR = s3().meta.client.get_paginator('list_objects_v2')
 
+@retried
+def s3_upload(source_path: Path,
+              dest_path: Path,
+              location: str = BUCKET,
+              metadata: dict[str, str] | None = None,
+              content_encoding: str | None = None
+              ) -> Checksums:
+    """
+    Upload content of source_path to dest_path on s3 bucket (along with optional user metadata
+     and Content-Encoding). Checksums are computed while the file is streamed, and compared with
+     the stored object ones. Return them.
+    """
+    key, client = forge_key(dest_path), s3().meta.client
+    extra_args = {'Metadata': metadata, 'ContentEncoding': content_encoding,
+                  'ChecksumAlgorithm': crc32c_algorithm()}
+    with open(source_path, 'rb') as source:
+        client.upload_fileobj(stream := HashingReader(source), location, key,
+                              ExtraArgs={name: arg for name, arg in extra_args.items() if arg},
+                              Callback=boto_callback(Direction.UPLOAD), Config=S3_TRANSFER)
+    if CHECKSUM_CONF.checksum_check and CHECKSUM_CONF.checksum_upload_head:
+        s3_check(dest_path, stream.checksums(), location, PART_SIZE)
+    return stream.checksums()
 
-def s3_upload(source_path: Path, dest_path: Path, location: str = BUCKET) -> None:
+
+@retried
+def s3_check(file_path: Path,
+             checksums: Checksums,
+             location: str = BUCKET,
+             part_size: int | None = None
+             ) -> None:
     """
-    Upload content of source_path to dest_path on s3 bucket
+    Compare checksums with those of the S3 object stored at file_path (metadata request only),
+     multipart ETags only if uploaded with parts of part_size. Raise a ChecksumError on mismatch.
     """
-    s3().meta.client.upload_file(str(source_path), location, forge_key(dest_path))
+    key = forge_key(file_path)
+    check_s3_response(checksums, s3().meta.client.head_object(
+        Bucket=location, Key=key, ChecksumMode='ENABLED'), key, part_size)
 
 
+@retried
 def get_s3_object(fp: Path,
                   byte: bool = True,
                   location: str = BUCKET
-                  ) -> bytes | StreamingBody:
+                  ) -> bytearray | MemoryReader:
+    """
+    Retrieves byte content stored on a S3 at file_path key location, downloaded into a single
+     buffer preallocated from the Content-Length (wrapped in a zero copy stream if byte)
+    """
+    response = s3().Object(bucket_name=location, key=forge_key(fp)).get()
+    data = read_into(ThrottledReader(response['Body']), response['ContentLength'])
+    return MemoryReader(data) if byte else data
+
+
+def s3_writer(dest_path: Path, location: str = BUCKET) -> MultipartWriter:
+    """
+    Open a write-only stream on dest_path, uploaded part by part as a S3 multipart upload
+    """
+    key, client = forge_key(dest_path), s3().meta.client
+    upload_id = with_retry(client.create_multipart_upload, Bucket=location, Key=key)['UploadId']
+
+    def upload_part(number: int, data: bytes) -> dict:
+        throttle(Direction.UPLOAD, len(data))
+        etag = with_retry(client.upload_part, Bucket=location, Key=key, UploadId=upload_id,
+                          PartNumber=number, Body=data)['ETag']
+        return {'ETag': etag, 'PartNumber': number}
+
+    return MultipartWriter(
+        upload_part,
+        lambda parts: with_retry(
+            client.complete_multipart_upload, Bucket=location, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': parts}),
+        lambda: client.abort_multipart_upload(Bucket=location, Key=key, UploadId=upload_id))
+
+
+@retried
+def s3_reader(fp: Path, location: str = BUCKET) -> RangedReader:
+    """
+    Open a read-only seekable stream on the S3 object at fp, only fetching the bytes read
+    """
+    s3_object = s3().Object(bucket_name=location, key=forge_key(fp))
+    return RangedReader(s3_object.content_length, partial(get_s3_range, fp, location=location))
+
+
+def get_s3_range(fp: Path,
+                 start: int,
+                 end: int,
+                 location: str = BUCKET,
+                 etag: str | None = None
+                 ) -> bytes:
+    """
+    Retrieves the bytes stored on a S3 at file_path key location between start and end (included).
+    If etag is passed, only if the object was not rewritten since (a ClientError with a 412 status
+     is raised otherwise).
     """
-    Retrieves byte content stored on a S3 at file_path key location
+    return get_s3_tagged_range(fp, start, end, location, etag)[0]
+
+
+@retried
+def get_s3_tagged_range(fp: Path,
+                        start: int,
+                        end: int,
+                        location: str = BUCKET,
+                        etag: str | None = None
+                        ) -> tuple[bytes, str]:
     """
-    s3_object = s3().Object(bucket_name=location, key=forge_key(fp)).get()['Body'].read()
-    return BytesIO(s3_object) if byte else s3_object
+    Retrieves the bytes stored on a S3 at file_path key location between start and end (included)
+     along with the object ETag (see get_s3_range)
+    """
+    throttle(Direction.DOWNLOAD, end - start + 1)
+    condition = {'IfMatch': etag} if etag else {}
+    response = s3().meta.client.get_object(Bucket=location, Key=forge_key(fp),
+                                           Range=f'bytes={start}-{end}', **condition)
+    return response['Body'].read(), response['ETag']
 
 
 def s3_move_folder(origin: Path,
@@ -41,6 +165,7 @@ def s3_move_folder(origin: Path,
     """
     Move all files in the origin folder (either present locally or already on the S3,
      depending on dist_origin) to either another local folder dest, or a s3 dest.
+     Files are moved concurrently, with retries and concurrency control on throttling.
 
         Attributes are:
         - origin: folder to move
@@ -49,9 +174,9 @@ def s3_move_folder(origin: Path,
         - delete_file: whether to delete or not the origin folder. If false, amount to cp and not mv
         - location: bucket name inside the s3 storage on which to move
     """
-    for origin_path in s3_rglob(origin):
-        s3_move_file(origin_path, dest / origin_path.relative_to(origin),
-                     dist_origin=dist_origin, delete_file=delete_file, location=location)
+    run_all(lambda origin_path: s3_move_file(
+        origin_path, dest / origin_path.relative_to(origin), dist_origin=dist_origin,
+        delete_file=delete_file, location=location), s3_rglob(origin))
 
 
 def s3_copy_file(origin: Path,
@@ -71,6 +196,17 @@ def s3_copy_file(origin: Path,
     s3_move_file(origin, dest, location=location, dist_origin=dist_origin, delete_file=False)
 
 
+@retried
+def s3_copy_across(file_path: Path, origin_location: str, dest_location: str) -> None:
+    """
+    Server side copy of the file_path object from the origin_location bucket to dest_location
+     (as a multipart UploadPartCopy for large objects)
+    """
+    source = {'Bucket': origin_location, 'Key': forge_key(file_path)}
+    s3().meta.client.copy(source, dest_location, forge_key(file_path))
+
+
+@retried
 def s3_move_file(origin: Path,
                  dest: Path,
                  location: str = BUCKET,
@@ -93,7 +229,7 @@ def s3_move_file(origin: Path,
         if delete_file:
             delete_s3_content(origin, location)
     else:
-        s3().meta.client.upload_file(str(origin), location, forge_key(dest))
+        s3_upload(origin, dest, location)
         if delete_file:
             origin.unlink()
 
@@ -111,6 +247,23 @@ def get_s3_url(fp: Path, timeout: int = 3600, location: str = BUCKET) -> str | N
         return None
 
 
+def get_s3_urls(fps: Iterable[Path], timeout: int = 3600, location: str = BUCKET
+                ) -> dict[Path, str | None]:
+    """
+    Generate pre-signed URLs to share S3 objects, reusing the same client for all fps.
+    Expiration is the time in seconds for the pre-signed URLs to remain valid.
+    """
+    client = s3().meta.client
+    urls = {}
+    for fp in fps:
+        try:
+            urls[fp] = client.generate_presigned_url('get_object', Params={
+                'Bucket': location, 'Key': forge_key(fp)}, ExpiresIn=timeout)
+        except ClientError:
+            urls[fp] = None
+    return urls
+
+
 def s3_rglob(fp: Path, pattern: str | None = None, location: str = BUCKET) -> Iterator[Path]:
     """
     Rglob functionality: recursively find all S3 keys in the file_path S3 key
@@ -118,6 +271,18 @@ def s3_rglob(fp: Path, pattern: str | None = None, location: str = BUCKET) -> It
     yield from _s3_keys(fp, location, pattern.replace('*', '') if pattern else None)
 
 
+def s3_scan(fp: Path, pattern: str | None = None, location: str = BUCKET
+            ) -> Iterator[CloudEntry]:
+    """
+    Recursively find all S3 objects in the fp S3 key having passed pattern, along with their size,
+     ETag and last modification date (all read from the listing pages)
+    """
+    cleaned_pattern = pattern.replace('*', '') if pattern else None
+    for content in _s3_contents(fp, location, cleaned_pattern):
+        yield CloudEntry(path=ROOT_DIRECTORY / content['Key'], size=content['Size'],
+                         etag=content['ETag'].strip('"'), last_modified=content['LastModified'])
+
+
 def s3_iterdir(file_path: Path, location: str = BUCKET) -> Iterator[Path]:
     """
     iterdir functionality: list all files and folders directly in the file_path folder.
@@ -128,6 +293,7 @@ def s3_iterdir(file_path: Path, location: str = BUCKET) -> Iterator[Path]:
     yield from sorted(list(files))
 
 
+@retried
 def s3_exists(file_path: Path, location: str = BUCKET) -> bool:
     """
     Check if a file_path exists, either locally or on a S3
@@ -135,17 +301,71 @@ def s3_exists(file_path: Path, location: str = BUCKET) -> bool:
     try:
         s3().meta.client.head_object(Bucket=location, Key=forge_key(file_path))
         return True
-    except ClientError:
+    except ClientError as error:
+        if is_retryable(error):
+            raise
         return False
 
 
-def download_s3_object(file_path: Path, local_path: Path, location: str = BUCKET) -> None:
+def s3_list_names(prefix: str, max_pages: int, location: str = BUCKET
+                  ) -> tuple[set[str], str | None]:
+    """
+    List the keys (and sub folder prefixes) directly under prefix, sending at most max_pages
+     listing requests. Return the listed names, along with the last listed name if the listing
+     was cut short (None if it is complete): names before it are exhaustively listed.
+    """
+    names: set[str] = set()
+    for number, page in enumerate(_s3_pages(location, Prefix=prefix, Delimiter='/'), 1):
+        page_names = [elt['Key'] for elt in page.get('Contents', ())] + [
+            elt['Prefix'] for elt in page.get('CommonPrefixes', ())]
+        names.update(page_names)
+        if number >= max_pages and page.get('IsTruncated'):
+            return names, max(page_names, default='')
+    return names, None
+
+
+@retried
+def s3_metadata(file_path: Path, location: str = BUCKET) -> dict[str, str] | None:
+    """
+    User metadata of the S3 object stored at file_path (None if there is no such object)
+    """
+    try:
+        return s3().meta.client.head_object(Bucket=location, Key=forge_key(file_path))['Metadata']
+    except ClientError as error:
+        if is_retryable(error):
+            raise
+        return None
+
+
+@retried
+def s3_etag(file_path: Path, location: str = BUCKET) -> str:
+    """
+    Entity tag (changing with the content) of the S3 object stored at file_path
+    """
+    return s3().meta.client.head_object(Bucket=location, Key=forge_key(file_path))['ETag']
+
+
+@retried
+def download_s3_object(file_path: Path, local_path: Path, location: str = BUCKET) -> Checksums:
     """
     Download on disk at local_path location the content of bucket at file_path key location.
+    Ranges are fetched concurrently by boto3 (all of them only if the object still has the ETag
+     it had when the download started) and written in order: checksums are computed on the way,
+     and compared with the size and ETag of the downloaded object. Return them.
     """
-    s3().Bucket(location).download_file(forge_key(file_path), local_path)
+    key = forge_key(file_path)
+    progress = ProgressCallbackInvoker(boto_callback(Direction.DOWNLOAD))
+    with open(local_path, 'wb') as dest, TransferManager(s3().meta.client, S3_TRANSFER) as manager:
+        future = manager.download(location, key, writer := HashingWriter(dest),
+                                  subscribers=[progress])
+        future.result()
+    if CHECKSUM_CONF.checksum_check:
+        check_s3_response(writer.checksums(), {'ContentLength': future.meta.size,
+                                               'ETag': future.meta.etag}, key)
+    return writer.checksums()
 
 
+@retried
 def delete_s3_content(file_path: Path, location: str = BUCKET) -> None:
     """
     Delete content from a S3 at file_path key location
@@ -157,7 +377,32 @@ def _s3_keys(file_path: Path, location: str, pattern: str | None = None) -> Iter
     """
     Retrieves all S3 keys starting with file_path having the passed pattern
     """
-    for page in PAGINATOR.paginate(Bucket=location, Prefix=forge_key(file_path)):
+    for content in _s3_contents(file_path, location, pattern):
+        yield ROOT_DIRECTORY / content['Key']
+
+
+def _s3_contents(file_path: Path, location: str, pattern: str | None = None
+                 ) -> Iterator[dict[str, Any]]:
+    """
+    Retrieves the listing contents (key and properties) of all S3 objects starting with file_path
+     having the passed pattern
+    """
+    for page in _s3_pages(location, Prefix=forge_key(file_path)):
         for content in page.get('Contents', ()):
             if not pattern or pattern in content['Key']:
-                yield ROOT_DIRECTORY / content['Key']
+                yield content
+
+
+def _s3_pages(location: str, **kwargs) -> Iterator[dict[str, Any]]:
+    """
+    Pages of the listing of the location bucket (with kwargs listing arguments), each fetched
+     with retries
+    """
+    client = s3().meta.client
+
+    def fetch_page(token: str | None) -> tuple[dict[str, Any], str | None]:
+        page = client.list_objects_v2(Bucket=location, **kwargs,
+                                      **({'ContinuationToken': token} if token else {}))
+        return page, page.get('NextContinuationToken') if page.get('IsTruncated') else None
+
+    yield from retried_pages(fetch_page)
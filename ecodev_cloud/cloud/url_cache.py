@@ -0,0 +1,49 @@
+"""
+Module implementing a bounded cache of shareable cloud URLs, valid until their expiry time
+"""
+import threading
+from collections import OrderedDict
+
+URL_CACHE_SIZE = 100_000
+URL_KEY = tuple[str, str, str]
+
+
+class UrlCache:
+    """
+    LRU cache of (cloud, location, key) -> (url, expiry timestamp)
+    """
+
+    def __init__(self, max_size: int = URL_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._urls: OrderedDict[URL_KEY, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: URL_KEY, valid_until: float) -> str | None:
+        """
+        Return the cached URL of key, if it is still valid at valid_until timestamp
+        """
+        with self._lock:
+            if not (cached := self._urls.get(key)) or cached[1] < valid_until:
+                return None
+            self._urls.move_to_end(key)
+            return cached[0]
+
+    def put(self, key: URL_KEY, url: str, expiry: float) -> None:
+        """
+        Cache url of key, valid until the expiry timestamp
+        """
+        with self._lock:
+            self._urls[key] = (url, expiry)
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Empty the cache
+        """
+        with self._lock:
+            self._urls.clear()
+
+
+URL_CACHE = UrlCache()
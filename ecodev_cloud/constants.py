@@ -19,5 +19,7 @@ ZIP_EXT = '.zip'
 PNG_EXT = '.png'
 MARKDOWN_EXT = '.md'
 SH_EXT = '.sh'
+PACK_EXT = '.pack'
 FILE_EXTENSIONS = [NPY_NPZ_EXT, NPY_EXT, NPZ_EXT, SHP_EXT, GPKG_EXT, TIF_EXT, JSON_EXT,
-                   NETCDF_EXT, CSV_EXT, TXT_EXT, LATEX_EXT, XLSX_EXT, MARKDOWN_EXT, SH_EXT]
+                   NETCDF_EXT, CSV_EXT, TXT_EXT, LATEX_EXT, XLSX_EXT, ZIP_EXT, MARKDOWN_EXT, SH_EXT,
+                   PACK_EXT]
@@ -1,30 +1,70 @@
 """
 Module implementing disk helper methods (centered around pathlib)
 """
+import os
 import shutil
 from pathlib import Path
 from typing import Iterator
+from typing import NamedTuple
 
 
-def disk_is_dir(file_path: Path) -> bool:
+class DiskEntry(NamedTuple):
     """
-    Check if a disk file_path is a folder or not
+    Disk path along with its size and modification time (only filled by disk_scan, left to 0 by
+     walks not needing them). Symbolic links are entries of their own, never followed.
     """
-    return file_path.is_dir()
+    path: Path
+    size: int
+    mtime: float
+    is_dir: bool
 
 
-def disk_rglob(file_path: Path, pattern: str | None = None) -> Iterator[Path]:
+def disk_is_dir(file_path: Path | DiskEntry) -> bool:
+    """
+    Check if a disk file_path is a folder or not (without any stat call for a DiskEntry)
+    """
+    return file_path.is_dir if isinstance(file_path, DiskEntry) else file_path.is_dir()
+
+
+def disk_scan(file_path: Path,
+              pattern: str | None = None,
+              sort: bool = False,
+              include_dirs: bool = True
+              ) -> Iterator[DiskEntry]:
+    """
+    Lazily and recursively walk the file_path folder with os.scandir, one directory at a time.
+
+    Attributes are:
+        - file_path: folder to walk
+        - pattern: glob pattern entries must match (as in Path.rglob)
+        - sort: if True, yield entries in sorted path order (depth first), otherwise yield each
+         directory content (sorted by name) before walking its sub directories
+        - include_dirs: whether to yield directory entries or only files
+
+    Nothing is yielded if file_path is not a folder (as with Path.rglob).
+    """
+    yield from (entry for entry in _walk(file_path, sort, True)
+                if _is_matching(entry, pattern, include_dirs))
+
+
+def disk_rglob(file_path: Path,
+               pattern: str | None = None,
+               sort: bool = False,
+               include_dirs: bool = True
+               ) -> Iterator[Path]:
     """
     Rglob functionality: recursively find all files in the file_path folder having passed pattern
+     (nothing if file_path is not a folder)
     """
-    yield from sorted(list(file_path.rglob(pattern or '*')))
+    yield from (entry.path for entry in _walk(file_path, sort, False)
+                if _is_matching(entry, pattern, include_dirs))
 
 
 def disk_iterdir(file_path: Path) -> Iterator[Path]:
     """
     list all files and folders directly in the disk file_path folder.
     """
-    yield from sorted(list(file_path.iterdir()))
+    yield from (entry.path for entry in _scan_folder(file_path, False))
 
 
 def disk_exists(file_path: Path) -> bool:
@@ -46,3 +86,68 @@ def disk_move(origin: Path, dest: Path) -> None:
     Move a disk origin path to a disk destination path
     """
     shutil.move(str(origin), str(dest))
+
+
+def _walk(file_path: Path, sort: bool, stat: bool) -> Iterator[DiskEntry]:
+    """
+    Walk of file_path (see disk_scan), yielding nothing if file_path is not a folder
+    """
+    if not file_path.is_dir():
+        return iter(())
+    return _walk_sorted(file_path, stat) if sort else _walk_by_directory(file_path, stat)
+
+
+def _walk_sorted(file_path: Path, stat: bool) -> Iterator[DiskEntry]:
+    """
+    Depth first walk of file_path, yielding entries in the same order as sorted paths would
+     (stat-ing them if stat)
+    """
+    for entry in _scan_folder(file_path, stat):
+        yield entry
+        if entry.is_dir:
+            yield from _walk_sorted(entry.path, stat)
+
+
+def _walk_by_directory(file_path: Path, stat: bool) -> Iterator[DiskEntry]:
+    """
+    Walk of file_path yielding the whole content of a directory before walking its sub directories
+     (stat-ing them if stat)
+    """
+    folders = [file_path]
+    while folders:
+        entries = _scan_folder(folders.pop(), stat)
+        yield from entries
+        folders.extend(reversed([entry.path for entry in entries if entry.is_dir]))
+
+
+def _scan_folder(file_path: Path, stat: bool) -> list[DiskEntry]:
+    """
+    List (sorted by name) all entries directly in the file_path folder, along with their size and
+     modification time if stat (entries that cannot be stat-ed, e.g. removed meanwhile, are
+     skipped)
+    """
+    with os.scandir(file_path) as scanned:
+        entries = [entry for elt in scanned if (entry := _to_entry(file_path, elt, stat))]
+    return sorted(entries, key=lambda entry: entry.path.name)
+
+
+def _to_entry(folder: Path, elt: os.DirEntry, stat: bool) -> DiskEntry | None:
+    """
+    Convert an os.DirEntry into a DiskEntry, without following symbolic links (no extra syscall
+     on most filesystems if not stat). None if elt cannot be stat-ed.
+    """
+    is_dir = elt.is_dir(follow_symlinks=False)
+    if not stat:
+        return DiskEntry(folder / elt.name, 0, 0., is_dir)
+    try:
+        info = elt.stat(follow_symlinks=False)
+    except OSError:
+        return None
+    return DiskEntry(folder / elt.name, 0 if is_dir else info.st_size, info.st_mtime, is_dir)
+
+
+def _is_matching(entry: DiskEntry, pattern: str | None, include_dirs: bool) -> bool:
+    """
+    Check if entry should be yielded by a scan given its pattern and directory filters
+    """
+    return (include_dirs or not entry.is_dir) and (not pattern or entry.path.match(pattern))
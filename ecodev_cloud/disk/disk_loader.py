@@ -19,11 +19,14 @@ from ecodev_cloud.constants import SHP_EXT
 from ecodev_cloud.constants import TIF_EXT
 from ecodev_cloud.constants import TXT_EXT
 from ecodev_cloud.constants import XLSX_EXT
+from ecodev_cloud.constants import ZIP_EXT
 from ecodev_cloud.file_processing.basic_file_processing import load_json_file
 from ecodev_cloud.file_processing.basic_file_processing import load_text_file
+from ecodev_cloud.file_processing.basic_file_processing import load_zipped_folder
 from ecodev_cloud.file_processing.netcdf_processing import read_netcdf
 from ecodev_cloud.file_processing.numpy_processing import get_npz_data
 from ecodev_cloud.file_processing.numpy_processing import get_numpy_data
+from ecodev_cloud.file_processing.numpy_processing import mmap_numpy_data
 from ecodev_cloud.file_processing.shapely_processing import load_shp
 from ecodev_cloud.file_processing.tif_processing import get_tif_tile
 
@@ -41,20 +44,32 @@ DISK_LOADERS: dict[str, Callable[[Path], DATA_TYPE]] = {
     CSV_EXT: pd.read_csv,
     TXT_EXT: load_text_file,
     LATEX_EXT: load_text_file,
-    XLSX_EXT: pd.ExcelFile
+    XLSX_EXT: pd.ExcelFile,
+    ZIP_EXT: load_zipped_folder
+}
+
+"""
+Loaders memory mapping the file instead of reading it: data larger than RAM can be used, and
+ processes mapping the same file share their page cache pages
+"""
+DISK_MMAP_LOADERS: dict[str, Callable[[Path], DATA_TYPE]] = {
+    NPY_EXT: mmap_numpy_data
 }
 
 
-def disk_load(file_path: Path) -> DATA_TYPE:
+def disk_load(file_path: Path, mmap: bool = False, **loader_kwargs: Any) -> DATA_TYPE:
     """
     Load disk data from file_path location.
 
     Pick the correct loading method thanks to file_path file extension.
+    If mmap, the data is memory mapped (only supported for DISK_MMAP_LOADERS extensions).
+    loader_kwargs are passed to the extension loader (e.g. bbox and where to only decode
+     matching features of a GeoPackage or a shapefile).
     """
-    if not (loader := DISK_LOADERS.get(file_path.suffix)):
+    if not (loader := (DISK_MMAP_LOADERS if mmap else DISK_LOADERS).get(file_path.suffix)):
         raise AttributeError(f'{file_path.suffix} extension of {file_path.name=} is not supported')
 
     try:
-        return loader(file_path)
+        return loader(file_path, **loader_kwargs)
     except Exception as error:
-        log.crtical(f'loading failed: {error} happened')
+        log.critical(f'loading failed: {error} happened')
@@ -8,12 +8,15 @@ from ecodev_core import logger_get
 from ecodev_core import make_dir
 
 from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import GPKG_EXT
 from ecodev_cloud.constants import JSON_EXT
 from ecodev_cloud.constants import LATEX_EXT
+from ecodev_cloud.constants import NETCDF_EXT
 from ecodev_cloud.constants import NPY_EXT
 from ecodev_cloud.constants import NPZ_EXT
 from ecodev_cloud.constants import PNG_EXT
 from ecodev_cloud.constants import SHP_EXT
+from ecodev_cloud.constants import TIF_EXT
 from ecodev_cloud.constants import TXT_EXT
 from ecodev_cloud.constants import XLSX_EXT
 from ecodev_cloud.constants import ZIP_EXT
@@ -23,9 +26,12 @@ from ecodev_cloud.file_processing.basic_file_processing import save_xlsx
 from ecodev_cloud.file_processing.basic_file_processing import write_json_file
 from ecodev_cloud.file_processing.basic_file_processing import write_png_file
 from ecodev_cloud.file_processing.basic_file_processing import write_text_file
+from ecodev_cloud.file_processing.netcdf_processing import save_netcdf
 from ecodev_cloud.file_processing.numpy_processing import save_numpy_compressed_data
 from ecodev_cloud.file_processing.numpy_processing import save_numpy_data
+from ecodev_cloud.file_processing.shapely_processing import save_gpkg
 from ecodev_cloud.file_processing.shapely_processing import save_polygon
+from ecodev_cloud.file_processing.tif_processing import save_tif
 
 
 log = logger_get(__name__)
@@ -42,7 +48,10 @@ DISK_SAVERS: dict[str, Callable] = {
     LATEX_EXT: write_text_file,
     SHP_EXT: save_polygon,
     ZIP_EXT: save_folder,
-    PNG_EXT: write_png_file
+    PNG_EXT: write_png_file,
+    TIF_EXT: save_tif,
+    NETCDF_EXT: save_netcdf,
+    GPKG_EXT: save_gpkg
 }
 
 
@@ -58,4 +67,4 @@ def disk_save(file_path: Path, data: DATA_TYPE) -> None:
         make_dir(file_path.parent)
         return saver(file_path, data)
     except Exception as error:
-        log.crtical(f'saving failed: {error} happened')
+        log.critical(f'saving failed: {error} happened')
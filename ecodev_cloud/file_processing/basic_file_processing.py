@@ -5,6 +5,7 @@ import json
 import os
 import zipfile
 from pathlib import Path
+from typing import BinaryIO
 
 import pandas as pd
 
@@ -77,11 +78,26 @@ def save_folder(file_path: Path, data: Path):
     """
     Save a zipped folder
     """
-    with zipfile.ZipFile(file_path.name, mode='w') as f:
+    with open(file_path, 'wb') as stream:
+        write_zipped_folder(stream, data)
+
+
+def write_zipped_folder(stream: BinaryIO, data: Path):
+    """
+    Compress all files of the data folder into the passed (possibly non seekable) stream
+    """
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as f:
         for fp in disk_rglob(data):
             f.write(fp, str(fp.relative_to(data)))
 
 
+def load_zipped_folder(data: Path | BinaryIO) -> zipfile.ZipFile:
+    """
+    Open a zipped folder: only the central directory is read, members are extracted on demand
+    """
+    return zipfile.ZipFile(data)
+
+
 def get_common_ancestor(current_path: Path, folder: Path) -> Path:
     """
     Subtlety when the current path is a file directly into the folder we want to iterdir on
@@ -0,0 +1,85 @@
+"""
+Module regrouping the wire compression methods of text-like files (gzip, and zstd if installed)
+"""
+import gzip
+import io
+import os
+import shutil
+from pathlib import Path
+
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import JSON_EXT
+from ecodev_cloud.constants import LATEX_EXT
+from ecodev_cloud.constants import TXT_EXT
+from ecodev_cloud.file_processing.stream_processing import BYTES_LIKE
+from ecodev_cloud.file_processing.stream_processing import MEMORY_STREAM
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is only available if zstandard is installed
+    zstandard = None
+
+GZIP_ENCODING = 'gzip'
+ZSTD_ENCODING = 'zstd'
+COMPRESSIBLE_EXTENSIONS = [CSV_EXT, JSON_EXT, TXT_EXT, LATEX_EXT]
+"""
+Leading bytes of compressed payloads (a text file cannot start with them): encodings are
+ detected out of the loaded bytes themselves, so that uncompressed objects keep loading.
+"""
+MAGIC_NUMBERS: dict[str, bytes] = {
+    GZIP_ENCODING: b'\x1f\x8b',
+    ZSTD_ENCODING: b'\x28\xb5\x2f\xfd'
+}
+
+
+def compress_file(file_path: Path, encoding: str) -> Path:
+    """
+    Compress file_path (streaming) with the passed encoding. Return the compressed file path.
+    Compression is deterministic: same content, same compressed bytes.
+    """
+    compressed_path = file_path.with_name(f'{file_path.name}.{encoding}')
+    with open(file_path, 'rb') as source, open(compressed_path, 'wb') as dest:
+        if encoding == GZIP_ENCODING:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=dest, mtime=0) as stream:
+                shutil.copyfileobj(source, stream)
+        elif encoding == ZSTD_ENCODING:
+            compressor = _zstandard().ZstdCompressor()
+            compressor.copy_stream(source, dest, size=os.path.getsize(file_path))
+        else:
+            raise AttributeError(f'{encoding} compression is not supported')
+    return compressed_path
+
+
+def detect_encoding(data: bytes | bytearray | memoryview | MEMORY_STREAM) -> str | None:
+    """
+    Encoding of the passed (possibly compressed) data, None if not compressed
+    """
+    head = bytes(data[:4]) if isinstance(data, BYTES_LIKE) else data.getbuffer()[:4].tobytes()
+    return next((encoding for encoding, magic in MAGIC_NUMBERS.items()
+                 if head.startswith(magic)), None)
+
+
+def decompressed(data: bytes | bytearray | memoryview | MEMORY_STREAM
+                 ) -> bytes | bytearray | memoryview | MEMORY_STREAM | io.BufferedIOBase:
+    """
+    Decompress data if compressed: bytes are returned as bytes, and streams as decompressing
+     streams (decompressed on the fly while read)
+    """
+    if not (encoding := detect_encoding(data)):
+        return data
+    stream: MEMORY_STREAM = MemoryReader(data) if isinstance(data, BYTES_LIKE) else data
+    if encoding == GZIP_ENCODING:
+        decompressing = gzip.GzipFile(fileobj=stream, mode='rb')
+    else:
+        decompressing = _zstandard().ZstdDecompressor().stream_reader(stream)
+    return decompressing.read() if isinstance(data, BYTES_LIKE) else decompressing
+
+
+def _zstandard():
+    """
+    zstandard module, raising an explicit error if not installed
+    """
+    if zstandard is None:
+        raise ImportError('zstd compression requires the zstandard package')
+    return zstandard
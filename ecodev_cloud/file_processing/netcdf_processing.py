@@ -1,13 +1,51 @@
 """
 Module regrouping all netcdf reading and writing methods
 """
+import math
 from pathlib import Path
+from typing import Any
+from typing import NamedTuple
 
+import numpy as np
 from netCDF4 import Dataset
+from pydantic_settings import BaseSettings
 from typing_extensions import TypeAlias
 
 
 NETCDF_DATASET: TypeAlias = Dataset
+FILL_VALUE = '_FillValue'
+
+
+class NetcdfConfiguration(BaseSettings):
+    """
+    Netcdf writing configuration (filled thanks to the local .env): zlib compression level (0 to
+     disable compression), shuffle filter, and target size of default chunks
+    """
+    netcdf_complevel: int = 4
+    netcdf_shuffle: bool = True
+    netcdf_chunk_bytes: int = 1024 * 1024
+
+
+NETCDF_CONF = NetcdfConfiguration()
+
+
+class NetcdfVariable(NamedTuple):
+    """
+    Netcdf variable to write: values, dimension names, attributes and (optional) chunk shape
+    """
+    data: np.ndarray
+    dimensions: tuple[str, ...]
+    attributes: dict[str, Any] | None = None
+    chunks: tuple[int, ...] | None = None
+
+
+class NetcdfData(NamedTuple):
+    """
+    Netcdf content to write: dimension sizes (None for unlimited), variables and global attributes
+    """
+    dimensions: dict[str, int | None]
+    variables: dict[str, NetcdfVariable]
+    attributes: dict[str, Any] | None = None
 
 
 def read_netcdf(file_path: Path) -> NETCDF_DATASET:
@@ -22,3 +60,70 @@ def read_data_netcdf(data: bytes) -> NETCDF_DATASET:
     Read the netcdf content of the given filename
     """
     return NETCDF_DATASET('memory', memory=data)
+
+
+def save_netcdf(file_path: Path, data: NETCDF_DATASET | NetcdfData) -> None:
+    """
+    Save a netcdf Dataset (or NetcdfData) at file_path, in a layout suited to partial cloud reads:
+     variables are chunked and compressed (zlib + shuffle), and the whole header (dimensions,
+     variables, attributes) is defined before any data is written so that it stays at the start
+     of the file.
+    """
+    content = data if isinstance(data, NetcdfData) else _netcdf_content(data)
+    with NETCDF_DATASET(str(file_path), 'w', format='NETCDF4') as dataset:
+        for name, size in content.dimensions.items():
+            dataset.createDimension(name, size)
+        dataset.setncatts(content.attributes or {})
+        variables = {name: _create_variable(dataset, name, variable)
+                     for name, variable in content.variables.items()}
+        for name, variable in content.variables.items():
+            variables[name][...] = variable.data
+
+
+def _create_variable(dataset: NETCDF_DATASET, name: str, variable: NetcdfVariable) -> Any:
+    """
+    Define (without writing its values) the variable name in dataset, chunked and compressed
+    """
+    attributes = dict(variable.attributes or {})
+    fill_value = attributes.pop(FILL_VALUE, None)
+    data = np.asanyarray(variable.data)
+    chunked = bool(variable.dimensions)
+    created = dataset.createVariable(
+        name, data.dtype, variable.dimensions, fill_value=fill_value,
+        zlib=chunked and NETCDF_CONF.netcdf_complevel > 0,
+        complevel=NETCDF_CONF.netcdf_complevel or 1,
+        shuffle=chunked and NETCDF_CONF.netcdf_shuffle,
+        chunksizes=(variable.chunks or _default_chunks(data)) if chunked else None)
+    created.setncatts(attributes)
+    return created
+
+
+def _default_chunks(data: np.ndarray) -> tuple[int, ...]:
+    """
+    Chunk shape of data of about NETCDF_CONF.netcdf_chunk_bytes: the largest dimension is halved
+     until small enough, so that chunks stay balanced across dimensions
+    """
+    chunks = [max(1, size) for size in data.shape]
+    while math.prod(chunks) * data.dtype.itemsize > NETCDF_CONF.netcdf_chunk_bytes and \
+            max(chunks) > 1:
+        largest = chunks.index(max(chunks))
+        chunks[largest] = math.ceil(chunks[largest] / 2)
+    return tuple(chunks)
+
+
+def _netcdf_content(dataset: NETCDF_DATASET) -> NetcdfData:
+    """
+    NetcdfData copy of an opened netcdf Dataset (chunk shapes are kept when not contiguous)
+    """
+    variables = {}
+    for name, variable in dataset.variables.items():
+        chunking = variable.chunking()
+        variables[name] = NetcdfVariable(
+            data=variable[...], dimensions=variable.dimensions,
+            attributes={key: variable.getncattr(key) for key in variable.ncattrs()},
+            chunks=tuple(chunking) if isinstance(chunking, list) else None)
+    return NetcdfData(
+        dimensions={name: None if dimension.isunlimited() else len(dimension)
+                    for name, dimension in dataset.dimensions.items()},
+        variables=variables,
+        attributes={key: dataset.getncattr(key) for key in dataset.ncattrs()})
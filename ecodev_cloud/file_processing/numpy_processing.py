@@ -1,6 +1,7 @@
 """
 Module regrouping all methods treating numpy files
 """
+import math
 from pathlib import Path
 
 import numpy as np
@@ -9,6 +10,10 @@ from typing_extensions import TypeAlias
 
 NP_ARRAY: TypeAlias = np.ndarray
 INDICATOR_STR = 'indicator'
+NPY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0
+}
 
 
 def get_npz_data(data, indicator: str = INDICATOR_STR) -> NP_ARRAY:
@@ -25,6 +30,30 @@ def get_numpy_data(data) -> NP_ARRAY | dict[str, NP_ARRAY]:
     return np.load(str(data) if isinstance(data, Path) else data)
 
 
+def get_numpy_view(data) -> NP_ARRAY:
+    """
+    Numpy array viewing in place (no copy) the npy bytes held in memory by the passed stream
+     (anything with getbuffer, e.g. BytesIO or MemoryReader). Object arrays and unknown npy
+     versions are regularly loaded.
+    """
+    version = np.lib.format.read_magic(data)
+    header_reader = NPY_HEADER_READERS.get(version)
+    shape, fortran_order, dtype = header_reader(data) if header_reader else ((), False, None)
+    if dtype is None or dtype.hasobject:
+        data.seek(0)
+        return get_numpy_data(data)
+    array = np.frombuffer(data.getbuffer(), dtype=dtype, count=math.prod(shape),
+                          offset=data.tell())
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def mmap_numpy_data(file_path: Path) -> np.memmap:
+    """
+    Memory map (read only) the numpy array stored at file_path: pages are only read on access
+    """
+    return np.load(str(file_path), mmap_mode='r')
+
+
 def save_numpy_data(file_path: Path, data: NP_ARRAY):
     """
     Save passed numpy array data into file_path
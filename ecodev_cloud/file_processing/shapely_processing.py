@@ -1,25 +1,46 @@
 """
 Helpers to read and write shapely polygons
 """
+import json
 import zipfile
 from pathlib import Path
+from typing import Any
+from typing import NamedTuple
+from uuid import uuid4
 
 import fiona
 from ecodev_core import logger_get
 from fiona.io import MemoryFile
 from fiona.io import ZipMemoryFile
+from osgeo import gdal
+from osgeo import ogr
 from shapely.geometry import mapping
 from shapely.geometry import Point
 from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
 from typing_extensions import TypeAlias
 
+from ecodev_cloud.constants import GPKG_EXT
 from ecodev_cloud.constants import SHP_EXT
 from ecodev_cloud.constants import ZIP_EXT
+from ecodev_cloud.file_processing.stream_processing import MEMORY_STREAM
 
 log = logger_get(__name__)
 
 CordexShape: TypeAlias = Polygon | list[Polygon] | list[Point]
 CordexPoint: TypeAlias = Point
+BBOX: TypeAlias = tuple[float, float, float, float]
+FIELD_TYPES: dict[type, str] = {bool: 'int', int: 'int', float: 'float', str: 'str'}
+FIELD_WIDENING = ['int', 'float', 'str']
+
+
+class VectorLayer(NamedTuple):
+    """
+    Features to save (fiona like dicts of geometry, shapely or GeoJSON like, and properties)
+     along with their coordinate reference system (as WKT)
+    """
+    features: list[dict[str, Any]]
+    crs: str | None = None
 
 
 def save_polygon(file_path: Path, polygon: Polygon):
@@ -30,29 +51,54 @@ def save_polygon(file_path: Path, polygon: Polygon):
         c.write({'geometry': mapping(polygon)})
 
 
-def load_shp(file_path: Path) -> CordexShape:
+def save_gpkg(file_path: Path, data: VectorLayer | list[dict[str, Any]]) -> None:
     """
-    Retrieve a list of Polygons stored at file_path location
+    Store the passed features (with their properties) at file_path location as a GeoPackage,
+     along with its R-tree spatial index. The schema is inferred from the features.
+    """
+    layer = data if isinstance(data, VectorLayer) else VectorLayer(data)
+    features = [{'geometry': _geojson(feature['geometry']),
+                 'properties': dict(feature.get('properties') or {})} for feature in layer.features]
+    with fiona.open(file_path, 'w', driver='GPKG', schema=_schema(features), crs_wkt=layer.crs,
+                    SPATIAL_INDEX='YES') as collection:
+        collection.writerecords(features)
+
+
+def load_shp(file_path: Path, bbox: BBOX | None = None, where: str | None = None
+             ) -> CordexShape:
     """
+    Retrieve a list of Polygons stored at file_path location (only the ones intersecting bbox
+     and matching the where OGR SQL filter if passed)
+    """
+    if bbox is not None or where is not None:
+        return _filtered_features(str(file_path), bbox, where)
     with fiona.open(file_path) as shape:
         parsed_shape = list(shape)
     return parsed_shape
 
 
-def load_zipped_shp(zipped_data: bytes) -> CordexShape:
+def load_zipped_shp(zipped_data: bytes, bbox: BBOX | None = None, where: str | None = None
+                    ) -> CordexShape:
     """
-    Retrieve a list of Polygons stored at file_path location
+    Retrieve a list of Polygons stored at file_path location (only the ones intersecting bbox
+     and matching the where OGR SQL filter if passed)
     """
+    if bbox is not None or where is not None:
+        return _filtered_memory_features(zipped_data, ZIP_EXT, bbox, where)
     with ZipMemoryFile(zipped_data) as zip_memory_file:
         with zip_memory_file.open() as shape:
             parsed_shape = list(shape)
     return parsed_shape
 
 
-def load_memory_gpkg(zipped_data: bytes) -> CordexShape:
+def load_memory_gpkg(zipped_data: bytes, bbox: BBOX | None = None, where: str | None = None
+                     ) -> CordexShape:
     """
-    Retrieve a list of Polygons stored at file_path location
+    Retrieve a list of Polygons stored at file_path location (only the ones intersecting bbox
+     and matching the where OGR SQL filter if passed)
     """
+    if bbox is not None or where is not None:
+        return _filtered_memory_features(zipped_data, GPKG_EXT, bbox, where)
     with MemoryFile(zipped_data) as memory_file:
         with memory_file.open() as shape:
             parsed_shape = list(shape)
@@ -102,3 +148,72 @@ def save_shp(file_path: Path, data: CordexShape):
     with zipfile.ZipFile(file_path.with_suffix(ZIP_EXT), mode='w') as f:
         for extension in [SHP_EXT, '.cpg', '.shx', '.dbf']:
             f.write(file_path.with_suffix(extension))
+
+
+def _filtered_memory_features(data: bytes | MEMORY_STREAM,
+                              suffix: str,
+                              bbox: BBOX | None,
+                              where: str | None
+                              ) -> list[dict[str, Any]]:
+    """
+    Filtered features of in memory vector data (zipped shapefile or GeoPackage), read from gdal
+     vsimem memory
+    """
+    filename = f'/vsimem/{uuid4()}{suffix}'
+    gdal.FileFromMemBuffer(filename, data if isinstance(data, bytes) else bytes(data.getbuffer()))
+    try:
+        return _filtered_features(f'/vsizip/{filename}' if suffix == ZIP_EXT else filename,
+                                  bbox, where)
+    finally:
+        gdal.Unlink(filename)
+
+
+def _filtered_features(source: str, bbox: BBOX | None, where: str | None
+                       ) -> list[dict[str, Any]]:
+    """
+    GeoJSON like features of the source first layer intersecting bbox (minx, miny, maxx, maxy)
+     and matching the where OGR SQL filter. Filters are evaluated by OGR (R-tree lookup for a
+     GeoPackage), non matching features are never decoded.
+    """
+    dataset = ogr.Open(source)
+    if dataset is None:
+        raise ValueError(f'{source} cannot be read as vector data')
+    layer = dataset.GetLayer(0)
+    if bbox is not None:
+        layer.SetSpatialFilterRect(*bbox)
+    if where is not None and layer.SetAttributeFilter(where) != ogr.OGRERR_NONE:
+        raise ValueError(f'{where} is not a valid attribute filter')
+    return [json.loads(feature.ExportToJson()) for feature in layer]
+
+
+def _geojson(geometry: BaseGeometry | dict) -> dict:
+    """
+    GeoJSON like mapping of a shapely (or already GeoJSON like) geometry
+    """
+    return mapping(geometry) if isinstance(geometry, BaseGeometry) else dict(geometry)
+
+
+def _schema(features: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Fiona schema of features: common geometry type (Unknown if mixed) and property types, widened
+     to hold all the values of the property (int with float values gives float, any type with str
+     values gives str, as do types fiona cannot map and properties only holding None)
+    """
+    geometries = {feature['geometry']['type'] for feature in features}
+    properties: dict[str, str | None] = {}
+    for feature in features:
+        for key, value in feature['properties'].items():
+            field = None if value is None else FIELD_TYPES.get(type(value), 'str')
+            properties[key] = _widest(properties.get(key), field)
+    properties = {key: field or 'str' for key, field in properties.items()}
+    return {'geometry': geometries.pop() if len(geometries) == 1 else 'Unknown',
+            'properties': properties}
+
+
+def _widest(current: str | None, field: str | None) -> str | None:
+    """
+    Widest of two fiona property types (None standing for no value yet)
+    """
+    if current is None or field is None:
+        return current or field
+    return max(current, field, key=FIELD_WIDENING.index)
@@ -0,0 +1,249 @@
+"""
+Module regrouping file-like helpers streaming bytes to and from cloud object storage
+"""
+import io
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+
+PART_SIZE = 8 * 1024 * 1024
+READ_BUFFER = 1024 * 1024
+UPLOAD_WORKERS = 4
+BYTES_LIKE = (bytes, bytearray, memoryview)
+
+
+class MultipartWriter(io.RawIOBase):
+    """
+    Write-only, non seekable stream cutting written bytes into parts uploaded in the background.
+
+    Attributes are:
+        - upload_part: upload the passed bytes as the part of given (1 based) index, return its id
+        - complete: commit the upload out of the ordered list of part ids
+        - abort: cancel the upload (called instead of complete if an error happened)
+        - part_size: size in bytes of every part but the last one
+        - workers: maximum number of parts being uploaded concurrently
+    """
+
+    def __init__(self,
+                 upload_part: Callable[[int, bytes], Any],
+                 complete: Callable[[list[Any]], None],
+                 abort: Callable[[], None],
+                 part_size: int = PART_SIZE,
+                 workers: int = UPLOAD_WORKERS
+                 ) -> None:
+        super().__init__()
+        self._upload_part = upload_part
+        self._complete = complete
+        self._abort = abort
+        self._part_size = part_size
+        self._workers = workers
+        self._buffer = bytearray()
+        self._parts: list[Future] = []
+        self._position = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += (size := len(data))
+        while len(self._buffer) >= self._part_size:
+            self._submit(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return size
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._parts:
+                self._submit(bytes(self._buffer))
+            self._complete([part.result() for part in self._parts])
+        except BaseException:
+            self._executor.shutdown(cancel_futures=True)
+            self._abort()
+            raise
+        finally:
+            self._executor.shutdown()
+            super().close()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            return self.close()
+        self._executor.shutdown(cancel_futures=True)
+        self._abort()
+        super().close()
+
+    def _submit(self, data: bytes) -> None:
+        """
+        Upload data as the next part, waiting for the oldest part if too many are in flight
+        """
+        if len(in_flight := [part for part in self._parts if not part.done()]) >= self._workers:
+            in_flight[0].result()
+        self._parts.append(self._executor.submit(self._upload_part, len(self._parts) + 1, data))
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Read-only, seekable stream over a remote object of known size, fetching bytes on demand.
+
+    Attributes are:
+        - size: size in bytes of the remote object
+        - fetch: retrieve the bytes of the remote object between start and end (both included)
+    """
+
+    def __init__(self, size: int, fetch: Callable[[int, int], bytes]) -> None:
+        super().__init__()
+        self._size = size
+        self._fetch = fetch
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._size}[whence]
+        self._position = max(0, start + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if (end := min(self._position + len(buffer), self._size)) <= self._position:
+            return 0
+        data = self._fetch(self._position, end - 1)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def buffered(reader: RangedReader, buffer_size: int = READ_BUFFER) -> io.BufferedReader:
+    """
+    Wrap a ranged reader so that small consecutive reads are served by a single ranged request
+    """
+    return io.BufferedReader(reader, buffer_size=buffer_size)
+
+
+class MemoryReader(io.RawIOBase):
+    """
+    Read-only, seekable stream over an in memory buffer, that never copies the whole buffer:
+     getbuffer gives a zero copy view of it (to be decoded in place, e.g. with np.frombuffer).
+
+    Attributes are:
+        - buffer: bytes-like object (bytes, bytearray, memoryview) to read from
+    """
+
+    def __init__(self, buffer: Any) -> None:
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, start + offset)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._position + size
+        data = bytes(self._view[self._position:end])
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def getbuffer(self) -> memoryview:
+        """
+        Zero copy view of the whole underlying buffer
+        """
+        return self._view
+
+
+"""
+In memory streams, giving a zero copy view of their whole buffer (getbuffer)
+"""
+MEMORY_STREAM = io.BytesIO | MemoryReader
+
+
+class MemoryWriter(io.RawIOBase):
+    """
+    Write-only, seekable stream filling a buffer preallocated to the expected size (grown only if
+     more bytes than expected are written), so that a download never reallocates nor copies it.
+    """
+
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self._buffer = bytearray(size)
+        self._position = 0
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._written}[whence]
+        self._position = max(0, start + offset)
+        return self._position
+
+    def write(self, data) -> int:
+        size = len(data)
+        self._buffer[self._position:self._position + size] = data
+        self._position += size
+        self._written = max(self._written, self._position)
+        return size
+
+    def getvalue(self) -> bytearray:
+        """
+        Written bytes (the preallocated buffer itself, trimmed to what was actually written)
+        """
+        del self._buffer[self._written:]
+        return self._buffer
+
+
+def read_into(stream: Any, size: int) -> bytearray:
+    """
+    Read the size bytes of stream into a single preallocated buffer: straight into it if the
+     stream supports readinto, READ_BUFFER chunk by chunk otherwise.
+    """
+    buffer = bytearray(size)
+    view, offset = memoryview(buffer), 0
+    readinto = getattr(stream, 'readinto', None)
+    while offset < size:
+        if readinto:
+            read = readinto(view[offset:])
+        else:
+            chunk = stream.read(min(READ_BUFFER, size - offset))
+            read = len(chunk)
+            view[offset:offset + read] = chunk
+        if not read:
+            raise IOError(f'stream ended after {offset} of the {size} expected bytes')
+        offset += read
+    view.release()
+    return buffer
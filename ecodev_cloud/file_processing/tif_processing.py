@@ -2,15 +2,58 @@
 Module regrouping all methods treating tif files
 """
 from pathlib import Path
+from typing import BinaryIO
+from typing import NamedTuple
 from uuid import uuid4
 
+import numpy as np
 from osgeo import gdal
+from osgeo import gdal_array
+from pydantic_settings import BaseSettings
 from typing_extensions import TypeAlias
 
+from ecodev_cloud.file_processing.stream_processing import PART_SIZE
+
 
 GDAL_DATASET: TypeAlias = gdal.Dataset
 
 
+class CogConfiguration(BaseSettings):
+    """
+    Cloud Optimized GeoTIFF writing configuration (filled thanks to the local .env).
+    Compression must be lossless (DEFLATE, LZW, ZSTD...) for saved rasters to load back unchanged.
+    """
+    cog_compression: str = 'DEFLATE'
+    cog_blocksize: int = 512
+    cog_resampling: str = 'AVERAGE'
+
+
+COG_CONF = CogConfiguration()
+
+
+class GeoArray(NamedTuple):
+    """
+    Raster as a numpy array (rows x columns, or bands x rows x columns) plus its georeferencing
+    """
+    array: np.ndarray
+    geotransform: tuple[float, float, float, float, float, float]
+    projection: str
+    nodata: float | None = None
+
+
+def save_tif(file_path: Path, data: GDAL_DATASET | GeoArray) -> None:
+    """
+    Save a gdal Dataset (or a georeferenced numpy array) as a Cloud Optimized GeoTIFF: internally
+     tiled, compressed, with precomputed overviews stored before the full resolution tiles, so
+     that windowed readers only range read the tiles and zoom levels they need.
+    """
+    source = _memory_dataset(data) if isinstance(data, GeoArray) else data
+    options = [f'COMPRESS={COG_CONF.cog_compression}', f'BLOCKSIZE={COG_CONF.cog_blocksize}',
+               f'RESAMPLING={COG_CONF.cog_resampling}', 'OVERVIEWS=AUTO', 'BIGTIFF=IF_SAFER']
+    if gdal.Translate(str(file_path), source, format='COG', creationOptions=options) is None:
+        raise ValueError(f'{file_path.name} could not be written: {gdal.GetLastErrorMsg()}')
+
+
 def get_tif_tile(file_path: Path) -> GDAL_DATASET:
     """
     Read tif file from local disk storage and return a gdal Dataset
@@ -29,6 +72,41 @@ def get_in_memory_tile(in_memory_data: bytes) -> GDAL_DATASET:
     return tile
 
 
+def stream_in_memory_tile(stream: BinaryIO) -> GDAL_DATASET:
+    """
+    Form a gdal Dataset out of a (cloud) stream, written PART_SIZE by PART_SIZE straight into gdal
+     vsimem memory: the whole object is never held by python on top of gdal copy.
+    """
+    filename = _in_memory_filename()
+    handle = gdal.VSIFOpenL(filename, 'wb')
+    try:
+        while chunk := stream.read(PART_SIZE):
+            gdal.VSIFWriteL(chunk, 1, len(chunk), handle)
+    finally:
+        gdal.VSIFCloseL(handle)
+    tile = gdal.Open(filename)
+    gdal.Unlink(filename)
+    return tile
+
+
+def _memory_dataset(data: GeoArray) -> GDAL_DATASET:
+    """
+    Wrap a georeferenced numpy array into an in memory gdal Dataset
+    """
+    bands = data.array[np.newaxis] if data.array.ndim == 2 else data.array
+    dataset = gdal.GetDriverByName('MEM').Create(
+        '', bands.shape[2], bands.shape[1], bands.shape[0],
+        gdal_array.NumericTypeCodeToGDALTypeCode(bands.dtype))
+    dataset.SetGeoTransform(data.geotransform)
+    dataset.SetProjection(data.projection)
+    for index, band in enumerate(bands, start=1):
+        raster_band = dataset.GetRasterBand(index)
+        raster_band.WriteArray(band)
+        if data.nodata is not None:
+            raster_band.SetNoDataValue(data.nodata)
+    return dataset
+
+
 def _in_memory_filename():
     """
     Generate a random filename tu put in gdal vsimem memory.
@@ -0,0 +1,76 @@
+"""
+Module regrouping decoders returning transferable (picklable, handle free) data out of raw bytes:
+NumPy arrays, DataFrames and WKB geometries. They can be run in another process than the caller.
+
+Decoders read the raw bytes from a stream: npy, npz, csv and xlsx ones decode it as they read it,
+the others (whose libraries only take bytes) reading it whole.
+"""
+from typing import Any
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from shapely.geometry import shape
+
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.constants import GPKG_EXT
+from ecodev_cloud.constants import NETCDF_EXT
+from ecodev_cloud.constants import NPY_EXT
+from ecodev_cloud.constants import NPZ_EXT
+from ecodev_cloud.constants import SHP_EXT
+from ecodev_cloud.constants import TIF_EXT
+from ecodev_cloud.constants import XLSX_EXT
+from ecodev_cloud.file_processing.compression_processing import decompressed
+from ecodev_cloud.file_processing.netcdf_processing import read_data_netcdf
+from ecodev_cloud.file_processing.numpy_processing import get_numpy_data
+from ecodev_cloud.file_processing.numpy_processing import INDICATOR_STR
+from ecodev_cloud.file_processing.shapely_processing import load_memory_gpkg
+from ecodev_cloud.file_processing.shapely_processing import load_zipped_shp
+from ecodev_cloud.file_processing.stream_processing import MemoryReader
+from ecodev_cloud.file_processing.tif_processing import get_in_memory_tile
+
+
+def tile_array(data: bytes) -> np.ndarray:
+    """
+    Read all bands of an in memory tif as a numpy array
+    """
+    return get_in_memory_tile(data).ReadAsArray()
+
+
+def netcdf_arrays(data: bytes) -> dict[str, np.ndarray]:
+    """
+    Read all variables of an in memory netcdf as numpy (possibly masked) arrays
+    """
+    with read_data_netcdf(data) as dataset:
+        return {name: variable[:] for name, variable in dataset.variables.items()}
+
+
+def npz_array(stream: MemoryReader) -> np.ndarray:
+    """
+    Read the array of an npz stream (closing the archive, so that it no longer reads the stream)
+    """
+    with np.load(stream) as npz:
+        return npz.get(INDICATOR_STR)
+
+
+def wkb_features(features: list[dict]) -> list[dict[str, Any]]:
+    """
+    Convert fiona features into dicts of WKB geometry and plain properties
+    """
+    return [{'geometry': shape(feature['geometry']).wkb,
+             'properties': dict(feature['properties'])} for feature in features]
+
+
+"""
+Transferable decoders of raw object bytes, per extension
+"""
+TRANSFERABLE_DECODERS: dict[str, Callable[[MemoryReader], Any]] = {
+    NPZ_EXT: npz_array,
+    NPY_EXT: get_numpy_data,
+    NETCDF_EXT: lambda stream: netcdf_arrays(stream.read()),
+    SHP_EXT: lambda stream: wkb_features(load_zipped_shp(stream.read())),
+    GPKG_EXT: lambda stream: wkb_features(load_memory_gpkg(stream.read())),
+    TIF_EXT: lambda stream: tile_array(stream.read()),
+    CSV_EXT: lambda stream: pd.read_csv(decompressed(stream)),
+    XLSX_EXT: lambda stream: pd.read_excel(stream, sheet_name=None)
+}
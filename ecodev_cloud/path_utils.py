@@ -1,5 +1,8 @@
 from pathlib import Path
 
+from ecodev_cloud.constants import SHP_EXT
+from ecodev_cloud.constants import ZIP_EXT
+
 
 def forge_key(file_path: Path) -> str:
     """
@@ -9,4 +12,11 @@ def forge_key(file_path: Path) -> str:
     return str(file_path.relative_to(*file_path.parts[:2]))
 
 
+def forge_store_path(file_path: Path) -> Path:
+    """
+    Path of the cloud object actually storing file_path data (shapefiles are stored zipped)
+    """
+    return file_path.with_suffix(ZIP_EXT) if file_path.suffix == SHP_EXT else file_path
+
+
 ROOT_DIRECTORY = Path('/app')
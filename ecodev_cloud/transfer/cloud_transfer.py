@@ -0,0 +1,111 @@
+"""
+Module migrating all relevant objects between any two cloud locations (buckets or containers)
+"""
+import shutil
+from functools import partial
+from pathlib import Path
+
+from azure.core.exceptions import HttpResponseError
+from ecodev_core import logger_get
+
+from ecodev_cloud.cloud.blob.blob_container import container
+from ecodev_cloud.cloud.blob.blob_helpers import blob_copy_from_url
+from ecodev_cloud.cloud.blob.blob_helpers import blob_reader
+from ecodev_cloud.cloud.blob.blob_helpers import blob_rglob
+from ecodev_cloud.cloud.blob.blob_helpers import blob_set_md5
+from ecodev_cloud.cloud.blob.blob_helpers import blob_writer
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import CHECKSUM_CONF
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_checksum import HashingReader
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_url
+from ecodev_cloud.cloud.s3.s3_helpers import s3_check
+from ecodev_cloud.cloud.s3.s3_helpers import s3_copy_across
+from ecodev_cloud.cloud.s3.s3_helpers import s3_reader
+from ecodev_cloud.cloud.s3.s3_helpers import s3_rglob
+from ecodev_cloud.cloud.s3.s3_helpers import s3_writer
+from ecodev_cloud.file_processing.stream_processing import PART_SIZE
+from ecodev_cloud.path_utils import forge_key
+from ecodev_cloud.transfer.migration_helpers import SHARDS
+from ecodev_cloud.transfer.migration_helpers import to_blob
+from ecodev_cloud.transfer.migration_leases import LeaseStore
+
+log = logger_get(__name__)
+
+
+def cloud_transfer(src_cloud: Cloud,
+                   src_location: str,
+                   dst_cloud: Cloud,
+                   dst_location: str,
+                   prefixes: Path | list[Path],
+                   index_folder: Path,
+                   lease_store: LeaseStore | None = None,
+                   shards: int = SHARDS,
+                   max_workers: int | None = None
+                   ) -> None:
+    """
+    Robust migration of all objects under prefixes from a cloud location to another one, with
+     the same keys. Already transferred (or failed) objects are tracked in index_folder, or in
+     lease_store if passed (the migration is then sharded across all workers running it, see
+     to_blob_sharded). At most max_workers objects are transferred concurrently.
+
+    The cheapest path is picked per provider pair:
+        - S3 to S3: server side copy (UploadPartCopy for large objects)
+        - Azure to Azure: server side copy from the source blob URL
+        - S3 to Azure: server side copy from a pre-signed S3 URL (relayed if Azure cannot reach it)
+        - Azure to S3: streamed relay, ranged reads into a multipart upload (bounded memory)
+    """
+    scanner = partial(blob_rglob if src_cloud == Cloud.AZURE else s3_rglob, location=src_location)
+    transferer = partial(transfer_object, src_cloud=src_cloud, src_location=src_location,
+                         dst_cloud=dst_cloud, dst_location=dst_location)
+    to_blob([prefixes] if isinstance(prefixes, Path) else prefixes, transferer, scanner,
+            index_folder, lease_store=lease_store, shards=shards, max_workers=max_workers)
+
+
+def transfer_object(file_path: Path,
+                    src_cloud: Cloud,
+                    src_location: str,
+                    dst_cloud: Cloud,
+                    dst_location: str
+                    ) -> Checksums | None:
+    """
+    Transfer the file_path object from the source cloud location to the destination one. Return
+     the checksums of relayed objects (None for server side copies).
+    """
+    if src_cloud == dst_cloud == Cloud.AWS:
+        return s3_copy_across(file_path, src_location, dst_location)
+    if src_cloud == dst_cloud == Cloud.AZURE:
+        source_url = container(src_location).get_blob_client(forge_key(file_path)).url
+        return blob_copy_from_url(source_url, file_path, location=dst_location)
+    if dst_cloud == Cloud.AZURE and (source_url := get_s3_url(file_path, location=src_location)):
+        try:
+            return blob_copy_from_url(source_url, file_path, location=dst_location)
+        except (HttpResponseError, RuntimeError) as error:
+            log.warning(f'server side copy of {file_path} failed ({error}): relaying it')
+    return relay_object(file_path, src_cloud, src_location, dst_cloud, dst_location)
+
+
+def relay_object(file_path: Path,
+                 src_cloud: Cloud,
+                 src_location: str,
+                 dst_cloud: Cloud,
+                 dst_location: str,
+                 dest_path: Path | None = None
+                 ) -> Checksums:
+    """
+    Copy the file_path object (to dest_path if passed, same key otherwise) through this machine:
+     PART_SIZE ranged reads are streamed into a multipart upload, so that at most a few parts are
+     held in memory. Checksums are computed on the way, stored as Content-MD5 on Azure and
+     compared with the stored object ones on S3. Return them.
+    """
+    dest_path = dest_path or file_path
+    reader = HashingReader(
+        (blob_reader if src_cloud == Cloud.AZURE else s3_reader)(file_path, src_location))
+    writer = blob_writer if dst_cloud == Cloud.AZURE else s3_writer
+    with writer(dest_path, dst_location) as dest:
+        shutil.copyfileobj(reader, dest, PART_SIZE)
+    if dst_cloud == Cloud.AZURE:
+        blob_set_md5(dest_path, reader.checksums().md5, location=dst_location)
+    elif CHECKSUM_CONF.checksum_check and CHECKSUM_CONF.checksum_upload_head:
+        s3_check(dest_path, reader.checksums(), dst_location, PART_SIZE)
+    return reader.checksums()
@@ -6,24 +6,41 @@ from pathlib import Path
 
 from ecodev_cloud.cloud.blob.blob_container import CONTAINER
 from ecodev_cloud.cloud.blob.blob_helpers import blob_upload
-from ecodev_cloud.disk.disk_helpers import disk_is_dir
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_dedup import dedup_upload
 from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.transfer.migration_helpers import SHARDS
 from ecodev_cloud.transfer.migration_helpers import to_blob
+from ecodev_cloud.transfer.migration_leases import LeaseStore
 
 
 def transfer_disk_to_blob(folders: list[Path],
                           index_folder: Path,
-                          container: str = CONTAINER
+                          container: str = CONTAINER,
+                          dedup: bool = False,
+                          lease_store: LeaseStore | None = None,
+                          shards: int = SHARDS,
+                          max_workers: int | None = None
                           ) -> None:
     """
-    Robust migration from all disk content to Azure blob storage
+    Robust migration from all disk content to Azure blob storage.
+
+    Folders are filtered out while walking the disk, so that no file is stat-ed twice.
+    If dedup, files whose content is already stored are not uploaded again (see cloud_dedup).
+    If a lease_store is passed, the migration is sharded across all workers running it (see
+     to_blob_sharded).
+    Files are transferred with at most max_workers concurrent uploads.
     """
-    to_blob(folders, partial(_transfer_file, container=container), disk_rglob, index_folder,
-            disk_is_dir)
+    to_blob(folders, partial(_transfer_file, container=container, dedup=dedup),
+            partial(disk_rglob, include_dirs=False), index_folder, lease_store=lease_store,
+            shards=shards, max_workers=max_workers)
 
 
-def _transfer_file(file_path: Path, container: str) -> None:
+def _transfer_file(file_path: Path, container: str, dedup: bool = False) -> Checksums | None:
     """
-    Transfer file_path from disk to Azure blob storage.
+    Transfer file_path from disk to Azure blob storage. Return the uploaded content checksums.
     """
-    blob_upload(file_path, file_path, location=container)
+    if dedup:
+        return dedup_upload(file_path, file_path, Cloud.AZURE, container)
+    return blob_upload(file_path, file_path, location=container)
@@ -1,63 +1,251 @@
 """
 module implementing helper methods for migration to azure blob storage
 """
+import contextlib
+import hashlib
+import os
+import random
+import socket
+import threading
+import time
 from pathlib import Path
 from typing import Callable
 from typing import Iterator
 
 from ecodev_core import logger_get
 
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_retry import with_retry
 from ecodev_cloud.disk.disk_helpers import disk_exists
 from ecodev_cloud.disk.disk_loader import disk_load
 from ecodev_cloud.disk.disk_saver import disk_save
+from ecodev_cloud.path_utils import forge_key
+from ecodev_cloud.transfer.migration_leases import LEASE_DURATION
+from ecodev_cloud.transfer.migration_leases import LeaseStore
 
 
 log = logger_get(__name__)
 TRANSFER_IDX = 'transferred_files.json'
 FAILED_IDX = 'failed_files.json'
+CHECKSUM_IDX = 'transferred_checksums.json'
+SHARDS = 256
+SHARD_ATTEMPTS = 3
+LEASE_POLLING = 5.
 
 
 def to_blob(folders: list[Path],
-            file_transferer: Callable[[Path], None],
+            file_transferer: Callable[[Path], Checksums | None],
             folder_scanner: Callable[[Path], Iterator[Path]],
             index_folder: Path,
-            dir_checker: Callable[[Path], bool]
+            dir_checker: Callable[[Path], bool] | None = None,
+            lease_store: LeaseStore | None = None,
+            shards: int = SHARDS,
+            max_workers: int | None = None
             ) -> None:
     """
-    Robust migration from all content (in folders paths) to Azure blob storage.
+    Robust migration from all content (in folders paths) to Azure blob storage, with at most
+     max_workers concurrent transfers.
+
+    dir_checker is only needed if folder_scanner can yield folders along with files.
+    If a lease_store is passed, the migration is sharded (see to_blob_sharded) and index_folder
+     is not used.
     """
+    if lease_store:
+        return to_blob_sharded(folders, file_transferer, folder_scanner, lease_store, shards,
+                               dir_checker, max_workers=max_workers)
     for folder in folders:
         _transfer_all(folder, _load_index(TRANSFER_IDX, index_folder), _load_index(
-            FAILED_IDX, index_folder), file_transferer, folder_scanner, index_folder, dir_checker)
+            FAILED_IDX, index_folder), file_transferer, folder_scanner, index_folder, dir_checker,
+            max_workers)
+
+
+def to_blob_sharded(folders: list[Path],
+                    file_transferer: Callable[[Path], Checksums | None],
+                    folder_scanner: Callable[[Path], Iterator[Path]],
+                    lease_store: LeaseStore,
+                    shards: int = SHARDS,
+                    dir_checker: Callable[[Path], bool] | None = None,
+                    worker: str | None = None,
+                    lease_duration: float = LEASE_DURATION,
+                    attempts: int = SHARD_ATTEMPTS,
+                    max_workers: int | None = None
+                    ) -> None:
+    """
+    Sharded migration: the same call can be run by as many worker processes or nodes as wanted.
+
+    Keys are partitioned in shards by hash (see shard_of), each worker listing folders once. Each
+     worker claims a pending shard through lease_store (shards it saw done once being skipped),
+     migrates it while renewing its lease, records its completion, and carries on until all
+     shards are done. Shards of crashed workers are reclaimed once their lease expires (transfers
+     being idempotent, a partially migrated shard is simply redone). Shards with failed keys are
+     released, their failed keys being retried by the next claim, and only recorded as done
+     (along with the keys still failing) after attempts migrations.
+
+    Attributes are:
+        - folders, file_transferer, folder_scanner, dir_checker: see to_blob
+        - lease_store: where shard leases are recorded (shared by all workers)
+        - shards: number of shards (must be the same for all workers)
+        - worker: name of this worker (host and process id if None)
+        - lease_duration: seconds after which the shard of a silent worker can be reclaimed
+        - attempts: number of migrations of a shard with failed keys before giving them up
+        - max_workers: maximum number of concurrent transfers of this worker
+    """
+    worker, keys = worker or f'{socket.gethostname()}-{os.getpid()}', None
+    done: set[int] = set()
+    while pending := [shard for shard in range(shards) if shard not in done]:
+        random.shuffle(pending)
+        if (shard := next((shard for shard in pending if _claim(
+                shard, worker, lease_store, lease_duration, done)), None)) is None:
+            time.sleep(min(LEASE_POLLING, lease_duration / 2))
+            continue
+        log.info(f'{worker} migrating shard {shard}/{shards} ({len(pending)} pending)')
+        if keys is None:
+            keys = _shard_keys(folders, shards, folder_scanner, dir_checker)
+        _transfer_shard(shard, keys[shard], file_transferer, lease_store, worker, lease_duration,
+                        attempts, max_workers)
+    log.info(f'{worker}: all {shards} shards migrated')
+
+
+def _claim(shard: int, worker: str, lease_store: LeaseStore, lease_duration: float, done: set[int]
+           ) -> bool:
+    """
+    Claim shard for worker. If the claim fails, record in done whether the shard is done, so that
+     it is never read again.
+    """
+    if with_retry(lease_store.claim, shard, worker, lease_duration):
+        return True
+    if with_retry(lease_store.is_done, shard):
+        done.add(shard)
+    return False
+
+
+def shard_of(file_path: Path, shards: int) -> int:
+    """
+    Shard of the file_path key among shards (deterministic: the same on all workers and nodes)
+    """
+    return int(hashlib.sha1(forge_key(file_path).encode('utf-8')).hexdigest()[:8], 16) % shards
+
+
+def _shard_keys(folders: list[Path],
+                shards: int,
+                folder_scanner: Callable[[Path], Iterator[Path]],
+                dir_checker: Callable[[Path], bool] | None
+                ) -> list[list[Path]]:
+    """
+    List all files of folders once, bucketed by shard
+    """
+    keys: list[list[Path]] = [[] for _ in range(shards)]
+    for folder in folders:
+        for file_path in folder_scanner(folder):
+            if not (dir_checker and dir_checker(file_path)):
+                keys[shard_of(file_path, shards)].append(file_path)
+    return keys
+
+
+def _transfer_shard(shard: int,
+                    keys: list[Path],
+                    file_transferer: Callable[[Path], Checksums | None],
+                    lease_store: LeaseStore,
+                    worker: str,
+                    lease_duration: float,
+                    attempts: int,
+                    max_workers: int | None = None
+                    ) -> None:
+    """
+    Transfer the keys of shard (only the failed ones of the previous attempt, if any), and record
+     its completion, or release it if some keys failed and attempts are left. Give up if the
+     lease is lost.
+    """
+    failed, record = [], with_retry(lease_store.record, shard) or {}
+    if record.get('failed'):
+        retried = set(record['failed'])
+        keys = [file_path for file_path in keys if str(file_path) in retried]
+    with _heartbeat(lease_store, shard, worker, lease_duration) as lost:
+        for file_path, _, error in run_bulk(file_transferer, keys, max_workers):
+            if error:
+                log.critical(f'transferring {file_path.name} failed: {error} happened')
+                failed.append(str(file_path))
+            if lost.is_set():
+                log.warning(f'{worker} lost its lease on shard {shard}: giving it up')
+                return
+    if failed and record.get('attempts', 0) + 1 < attempts:
+        log.warning(f'{worker} releasing shard {shard}: {len(failed)} keys to retry')
+        done = with_retry(lease_store.release, shard, worker, failed)
+    else:
+        done = with_retry(lease_store.complete, shard, worker, failed)
+    if not done:
+        log.warning(f'{worker} lost its lease on shard {shard} before completing it')
+
+
+@contextlib.contextmanager
+def _heartbeat(lease_store: LeaseStore, shard: int, worker: str, lease_duration: float
+               ) -> Iterator[threading.Event]:
+    """
+    Renew the lease of worker on shard in the background (every third of lease_duration), the
+     yielded event being set if the lease was lost
+    """
+    stop, lost = threading.Event(), threading.Event()
+
+    def renew() -> None:
+        while not stop.wait(lease_duration / 3):
+            if not with_retry(lease_store.renew, shard, worker, lease_duration):
+                return lost.set()
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        thread.join()
 
 
 def _transfer_all(folder: Path,
                   ok_files: set[Path],
                   ko_files: set[Path],
-                  file_transferer: Callable[[Path], None],
+                  file_transferer: Callable[[Path], Checksums | None],
                   folder_scanner: Callable[[Path], Iterator[Path]],
                   index_folder: Path,
-                  dir_checker: Callable[[Path], bool]
+                  dir_checker: Callable[[Path], bool] | None,
+                  max_workers: int | None = None
                   ) -> None:
     """
     Transfer all files in folder from folder to Azure blob storage if not in ok_files | ko_files.
+    Files are transferred concurrently, with retries and concurrency control on throttling.
+    Checksums returned by file_transferer (if any) are journaled along with transferred files.
     """
     log.info(f'Transferring all files from {folder}')
-    files_to_transfer = [fp for fp in folder_scanner(folder) if fp not in ok_files | ko_files]
-
-    for file_path in [fp for fp in files_to_transfer if not dir_checker(fp)]:
-        try:
-            file_transferer(file_path)
-            ok_files.add(file_path)
-        except Exception as e:
-            log.critical(f'transferring {file_path.name} failed: {e} happened')
+    already_seen = ok_files | ko_files
+    checksums = load_checksums(index_folder)
+    files_to_transfer = (fp for fp in folder_scanner(folder) if fp not in already_seen and not (
+        dir_checker and dir_checker(fp)))
+    for file_path, result, error in run_bulk(file_transferer, files_to_transfer, max_workers):
+        if error:
+            log.critical(f'transferring {file_path.name} failed: {error} happened')
             ko_files.add(file_path)
+        else:
+            ok_files.add(file_path)
+            if isinstance(result, Checksums):
+                checksums[file_path] = result
 
     disk_save(index_folder / TRANSFER_IDX, [str(x) for x in ok_files])
     disk_save(index_folder / FAILED_IDX, [str(x) for x in ko_files])
+    disk_save(index_folder / CHECKSUM_IDX,
+              {str(fp): value._asdict() for fp, value in checksums.items()})
     log.info(f'Successfully transferred all files from {folder}')
 
 
+def load_checksums(index_folder: Path) -> dict[Path, Checksums]:
+    """
+    Load from disk the checksums journaled along with transferred files
+    """
+    if disk_exists(file_path := index_folder / CHECKSUM_IDX):
+        return {Path(fp): Checksums(**value) for fp, value in disk_load(file_path).items()}
+
+    return {}
+
+
 def _load_index(filename: str, index_folder: Path) -> set[Path]:
     """
     Load from disk the index consisting of all already transferred or failed files (filename given).
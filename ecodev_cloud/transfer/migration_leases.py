@@ -0,0 +1,235 @@
+"""
+Module implementing the lease stores coordinating sharded migrations across workers.
+
+A lease record per shard tells which worker holds the shard and until when, whether the shard
+is done, its failed keys and how many times it was released with failed keys. Records are only
+replaced through compare-and-swap writes (conditional writes on cloud storages, a file lock on
+disk), so that two workers can never both believe they hold a shard.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import time
+from abc import ABC
+from abc import abstractmethod
+from pathlib import Path
+from typing import Any
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError
+from azure.core.exceptions import ResourceModifiedError
+from azure.core.exceptions import ResourceNotFoundError
+from botocore.errorfactory import ClientError
+from ecodev_core import make_dir
+
+from ecodev_cloud.cloud.blob.blob_container import container
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import resolve_location
+from ecodev_cloud.cloud.s3.s3_bucket import s3
+from ecodev_cloud.path_utils import forge_key
+
+LEASE_DURATION = 300.
+CONFLICT_CODES = {409, 412}
+LEASE_RECORD = dict[str, Any]
+
+
+class LeaseStore(ABC):
+    """
+    Shard lease records, replaced through compare-and-swap writes (see _read and _write, to be
+     implemented by each store)
+    """
+
+    def claim(self, shard: int, worker: str, duration: float = LEASE_DURATION) -> bool:
+        """
+        Claim shard for worker during duration seconds. Fails if the shard is done, or leased to
+         another worker and not expired yet (expired leases of crashed workers are reclaimed).
+        """
+        record, tag = self._read(shard)
+        if record and (record['done'] or
+                       (record['worker'] != worker and record['expires'] > time.time())):
+            return False
+        return self._write(shard, _record(worker, time.time() + duration, False,
+                                          *_retries(record)), tag)
+
+    def renew(self, shard: int, worker: str, duration: float = LEASE_DURATION) -> bool:
+        """
+        Extend the lease of worker on shard. Fails if the lease was lost (reclaimed by another
+         worker after its expiry).
+        """
+        record, tag = self._read(shard)
+        if not record or record['done'] or record['worker'] != worker:
+            return False
+        return self._write(shard, _record(worker, time.time() + duration, False,
+                                          *_retries(record)), tag)
+
+    def complete(self, shard: int, worker: str, failed: list[str] | None = None) -> bool:
+        """
+        Record that worker migrated shard (along with its failed keys). Fails if the lease was lost.
+        """
+        record, tag = self._read(shard)
+        if not record or record['done'] or record['worker'] != worker:
+            return False
+        return self._write(shard, _record(worker, record['expires'], True, failed or [],
+                                          _retries(record)[1]), tag)
+
+    def release(self, shard: int, worker: str, failed: list[str]) -> bool:
+        """
+        Give up the lease of worker on shard so that its failed keys are retried by the next
+         claim (right away, without waiting for the lease expiry). Fails if the lease was lost.
+        """
+        record, tag = self._read(shard)
+        if not record or record['done'] or record['worker'] != worker:
+            return False
+        return self._write(shard, _record(worker, 0., False, failed,
+                                          _retries(record)[1] + 1), tag)
+
+    def is_done(self, shard: int) -> bool:
+        """
+        Check if shard was migrated
+        """
+        record, _ = self._read(shard)
+        return bool(record and record['done'])
+
+    def record(self, shard: int) -> LEASE_RECORD | None:
+        """
+        Current lease record of shard (None if never claimed)
+        """
+        return self._read(shard)[0]
+
+    @abstractmethod
+    def _read(self, shard: int) -> tuple[LEASE_RECORD | None, Any]:
+        """
+        Lease record of shard (None if never claimed) along with its version tag
+        """
+
+    @abstractmethod
+    def _write(self, shard: int, record: LEASE_RECORD, tag: Any) -> bool:
+        """
+        Replace the lease record of shard, only if still at the tag version (only if absent when
+         tag is None). Return whether the write happened.
+        """
+
+
+class DiskLeaseStore(LeaseStore):
+    """
+    Lease records stored as json files in a (possibly shared) local folder, written under a file
+     lock. Stand-in for cloud lease stores when all workers run on the same host.
+    """
+
+    def __init__(self, folder: Path) -> None:
+        make_dir(folder)
+        self.folder = folder
+
+    def _read(self, shard: int) -> tuple[LEASE_RECORD | None, Any]:
+        with self._locked(shard):
+            return self._content(shard)
+
+    def _write(self, shard: int, record: LEASE_RECORD, tag: Any) -> bool:
+        with self._locked(shard):
+            if self._content(shard)[1] != tag:
+                return False
+            temp_path = self._path(shard).with_suffix('.tmp')
+            temp_path.write_text(json.dumps(record), encoding='utf-8')
+            os.replace(temp_path, self._path(shard))
+            return True
+
+    def _content(self, shard: int) -> tuple[LEASE_RECORD | None, str | None]:
+        """
+        Lease record of shard along with its raw content (its version tag)
+        """
+        if not (path := self._path(shard)).exists():
+            return None, None
+        return json.loads(content := path.read_text(encoding='utf-8')), content
+
+    @contextlib.contextmanager
+    def _locked(self, shard: int):
+        """
+        Hold the exclusive lock of shard lease record
+        """
+        with open(self._path(shard).with_suffix('.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _path(self, shard: int) -> Path:
+        """
+        Path of the lease record of shard
+        """
+        return self.folder / f'shard_{shard}.json'
+
+
+class CloudLeaseStore(LeaseStore):
+    """
+    Lease records stored as json objects under folder of a cloud location (usually the migration
+     destination), replaced through conditional writes (If-None-Match / If-Match on the ETag).
+    """
+
+    def __init__(self, folder: Path, cloud: Cloud, location: str | None = None) -> None:
+        self.folder = folder
+        self.cloud = cloud
+        self.location = resolve_location(cloud, location)
+
+    def _read(self, shard: int) -> tuple[LEASE_RECORD | None, Any]:
+        key = self._key(shard)
+        if self.cloud == Cloud.AZURE:
+            try:
+                downloader = container(self.location).get_blob_client(key).download_blob()
+            except ResourceNotFoundError:
+                return None, None
+            return json.loads(downloader.readall()), downloader.properties.etag
+        try:
+            response = s3().meta.client.get_object(Bucket=self.location, Key=key)
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def _write(self, shard: int, record: LEASE_RECORD, tag: Any) -> bool:
+        key, body = self._key(shard), json.dumps(record).encode('utf-8')
+        condition: dict[str, Any]
+        if self.cloud == Cloud.AZURE:
+            condition = {'overwrite': False} if tag is None else {
+                'overwrite': True, 'etag': tag, 'match_condition': MatchConditions.IfNotModified}
+            try:
+                container(self.location).upload_blob(key, body, **condition)
+                return True
+            except (ResourceExistsError, ResourceModifiedError):
+                return False
+        condition = {'IfNoneMatch': '*'} if tag is None else {'IfMatch': tag}
+        try:
+            s3().meta.client.put_object(Bucket=self.location, Key=key, Body=body, **condition)
+            return True
+        except ClientError as error:
+            if error.response['ResponseMetadata'].get('HTTPStatusCode') in CONFLICT_CODES:
+                return False
+            raise
+
+    def _key(self, shard: int) -> str:
+        """
+        Key of the lease record of shard
+        """
+        return forge_key(self.folder / f'shard_{shard}.json')
+
+
+def _record(worker: str,
+            expires: float,
+            done: bool = False,
+            failed: list[str] | None = None,
+            attempts: int = 0
+            ) -> LEASE_RECORD:
+    """
+    Lease record of a shard
+    """
+    return {'worker': worker, 'expires': expires, 'done': done, 'failed': failed or [],
+            'attempts': attempts}
+
+
+def _retries(record: LEASE_RECORD | None) -> tuple[list[str], int]:
+    """
+    Failed keys and number of releases of a shard lease record, carried over by its next records
+    """
+    return (record['failed'], record.get('attempts', 0)) if record else ([], 0)
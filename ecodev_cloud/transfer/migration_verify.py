@@ -0,0 +1,80 @@
+"""
+Module verifying migrations out of metadata only: listings (sizes, Content-MD5, S3 ETags) and the
+checksums journaled during transfers. No object is downloaded again.
+"""
+from pathlib import Path
+from typing import Iterable
+
+from ecodev_core import logger_get
+
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud import CloudEntry
+from ecodev_cloud.cloud.cloud_checksum import etag_md5
+from ecodev_cloud.cloud.cloud_helpers import cloud_scan
+from ecodev_cloud.disk.disk_helpers import disk_scan
+from ecodev_cloud.disk.disk_helpers import DiskEntry
+from ecodev_cloud.transfer.migration_helpers import load_checksums
+
+log = logger_get(__name__)
+
+
+def verify_transfer(prefix: Path,
+                    dst_cloud: Cloud,
+                    dst_location: str | None = None,
+                    src_cloud: Cloud | None = None,
+                    src_location: str | None = None,
+                    index_folder: Path | None = None
+                    ) -> dict[Path, str]:
+    """
+    Check that all objects (or disk files) under prefix were migrated with the same keys to the
+     destination cloud location. Return the reason of every mismatch, per path.
+
+    Sizes are always compared. MD5s are compared whenever known on both sides: journaled in
+     index_folder during the transfer, stored as Content-MD5 on Azure, or being the ETag of S3
+     objects uploaded in a single part.
+
+    Attributes are:
+        - prefix: key prefix (or disk folder or file) to verify
+        - dst_cloud, dst_location: where objects were migrated to
+        - src_cloud, src_location: where objects were migrated from (disk if src_cloud is None)
+        - index_folder: index folder of the migration, holding the journaled checksums
+    """
+    journal = load_checksums(index_folder) if index_folder else {}
+    sources: dict[Path, tuple[int, str | None]]
+    if src_cloud is None:
+        sources = {entry.path: (entry.size, None) for entry in _disk_sources(prefix)}
+    else:
+        sources = {entry.path: (entry.size, _listed_md5(entry, src_cloud))
+                   for entry in cloud_scan(prefix, cloud=src_cloud, location=src_location)}
+    destinations = {entry.path: (entry.size, _listed_md5(entry, dst_cloud))
+                    for entry in cloud_scan(prefix, cloud=dst_cloud, location=dst_location)}
+    mismatches, checked = {}, 0
+    for file_path, (size, md5) in sources.items():
+        md5 = md5 or (journaled.md5 if (journaled := journal.get(file_path)) else None)
+        if not (destination := destinations.get(file_path)):
+            mismatches[file_path] = 'missing'
+        elif destination[0] != size:
+            mismatches[file_path] = f'{size} bytes, {destination[0]} migrated'
+        elif md5 and destination[1]:
+            checked += 1
+            if md5 != destination[1]:
+                mismatches[file_path] = f'MD5 {md5}, {destination[1]} migrated'
+    log.info(f'{len(sources)} objects verified ({checked} with checksums): '
+             f'{len(mismatches)} mismatches')
+    return mismatches
+
+
+def _listed_md5(entry: CloudEntry, cloud: Cloud) -> str | None:
+    """
+    MD5 of a listed object content, if known out of the listing
+    """
+    return entry.content_md5 if cloud == Cloud.AZURE else etag_md5(entry.etag)
+
+
+def _disk_sources(prefix: Path) -> Iterable[DiskEntry]:
+    """
+    Files of the disk prefix folder, or prefix itself if it is a file
+    """
+    if prefix.is_file():
+        return [DiskEntry(prefix, (info := prefix.stat()).st_size, info.st_mtime, False)]
+    return disk_scan(prefix, include_dirs=False)
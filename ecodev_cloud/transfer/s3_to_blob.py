@@ -7,29 +7,60 @@ from pathlib import Path
 
 from ecodev_cloud.cloud.blob.blob_container import CONTAINER
 from ecodev_cloud.cloud.blob.blob_helpers import blob_upload
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import ChecksumError
+from ecodev_cloud.cloud.cloud_checksum import Checksums
+from ecodev_cloud.cloud.cloud_dedup import dedup_upload
+from ecodev_cloud.cloud.cloud_dedup import stored_sha256
 from ecodev_cloud.cloud.cloud_helpers import cloud_is_dir
 from ecodev_cloud.cloud.s3.s3_bucket import BUCKET
 from ecodev_cloud.cloud.s3.s3_helpers import download_s3_object
 from ecodev_cloud.cloud.s3.s3_helpers import s3_rglob
+from ecodev_cloud.transfer.migration_helpers import SHARDS
 from ecodev_cloud.transfer.migration_helpers import to_blob
+from ecodev_cloud.transfer.migration_leases import LeaseStore
 
 
 def transfer_s3_to_blob(folders: list[Path],
                         index_folder: Path,
                         bucket: str = BUCKET,
-                        container: str = CONTAINER
+                        container: str = CONTAINER,
+                        dedup: bool = False,
+                        lease_store: LeaseStore | None = None,
+                        shards: int = SHARDS,
+                        max_workers: int | None = None
                         ) -> None:
     """
     Robust migration from all s3 content (in folder keys) to Azure blob storage.
+
+    If dedup, objects whose content is already stored are not uploaded again (nor downloaded, if
+     the S3 object is tagged with its content hash, see cloud_dedup).
+    If a lease_store is passed, the migration is sharded across all workers running it (see
+     to_blob_sharded).
+    Objects are transferred with at most max_workers concurrent transfers.
     """
-    transferer = partial(_transfer_file, bucket=bucket, container=container)
-    to_blob(folders, transferer, partial(s3_rglob, location=bucket), index_folder, cloud_is_dir)
+    transferer = partial(_transfer_file, bucket=bucket, container=container, dedup=dedup)
+    to_blob(folders, transferer, partial(s3_rglob, location=bucket), index_folder, cloud_is_dir,
+            lease_store, shards, max_workers)
 
 
-def _transfer_file(file_path: Path, bucket: str, container: str) -> None:
+def _transfer_file(file_path: Path, bucket: str, container: str, dedup: bool = False
+                   ) -> Checksums | None:
     """
-    Transfer file_path from S3 to Azure blob storage.
+    Transfer file_path from S3 to Azure blob storage. The checksums of the downloaded content
+     (checked against S3) and of the uploaded one must match. Return them.
     """
+    if dedup and (digest := stored_sha256(file_path, Cloud.AWS, bucket)) and \
+            stored_sha256(file_path, Cloud.AZURE, container) == digest:
+        return None
     with tempfile.TemporaryDirectory() as folder:
-        download_s3_object(file_path, Path(folder) / file_path.name, location=bucket)
-        blob_upload(Path(folder) / file_path.name, file_path, location=container)
+        downloaded = download_s3_object(file_path, Path(folder) / file_path.name, location=bucket)
+        if dedup:
+            uploaded = dedup_upload(Path(folder) / file_path.name, file_path, Cloud.AZURE,
+                                    container)
+        else:
+            uploaded = blob_upload(Path(folder) / file_path.name, file_path, location=container)
+    if uploaded and uploaded.md5 != downloaded.md5:
+        raise ChecksumError(f'{file_path}: MD5 {downloaded.md5} downloaded, {uploaded.md5} '
+                            f'uploaded')
+    return downloaded
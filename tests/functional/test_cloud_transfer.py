@@ -0,0 +1,54 @@
+"""
+Module testing End-to-end migrations between cloud providers.
+"""
+from parameterized import parameterized
+
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_copy_file
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from ecodev_cloud.transfer.cloud_transfer import cloud_transfer
+from ecodev_cloud.transfer.migration_helpers import _load_index
+from ecodev_cloud.transfer.migration_helpers import FAILED_IDX
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+ROOT_TEST = ROOT_DIRECTORY / 'tests/functional/root'
+EXPECTED_DIR = ROOT_DIRECTORY / 'tests/functional/expected'
+CLOUDS: dict[Cloud, str] = {
+    Cloud.AWS: TEST_BUCKET,
+    Cloud.AZURE: TEST_CONTAINER
+}
+
+
+class CloudTransferTest(CloudSafeTestCase):
+    """
+    Class testing End-to-end migrations between cloud providers.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize all needed variables for the end-to-end test. Erase produced data at end test
+        """
+        self.ext = ROOT_TEST / 'transfer'
+        self.directories_created.append(self.ext)
+
+    @parameterized.expand([[Cloud.AWS, Cloud.AZURE], [Cloud.AZURE, Cloud.AWS]])
+    def test_cloud_transfer(self, src_cloud: Cloud, dst_cloud: Cloud):
+        """
+        End-to-end test of a migration from src_cloud to dst_cloud.
+        """
+        files = list(disk_rglob(EXPECTED_DIR, include_dirs=False))
+        for file_path in files:
+            cloud_copy_file(file_path, file_path, cloud=src_cloud, location=CLOUDS[src_cloud])
+        index_folder = self.ext / f'{src_cloud.value}_{dst_cloud.value}'
+        cloud_transfer(src_cloud, CLOUDS[src_cloud], dst_cloud, CLOUDS[dst_cloud], EXPECTED_DIR,
+                       index_folder)
+        for file_path in [fp for fp in files if fp.suffix == CSV_EXT]:
+            cloud_data = load_cloud_data(file_path, cloud=dst_cloud, location=CLOUDS[dst_cloud])
+            self.assertTrue(cloud_data.equals(disk_load(file_path)))
+        self.assertTrue(len(_load_index(FAILED_IDX, index_folder)) == 0)
@@ -0,0 +1,113 @@
+"""
+Module testing End-to-end sharded migrations run by several worker processes.
+"""
+import multiprocessing
+import time
+from pathlib import Path
+
+from parameterized import parameterized
+
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.constants import CSV_EXT
+from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from ecodev_cloud.transfer.disk_to_blob import transfer_disk_to_blob
+from ecodev_cloud.transfer.migration_helpers import to_blob_sharded
+from ecodev_cloud.transfer.migration_leases import CloudLeaseStore
+from ecodev_cloud.transfer.migration_leases import DiskLeaseStore
+from ecodev_cloud.transfer.migration_leases import LeaseStore
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+ROOT_TEST = ROOT_DIRECTORY / 'tests/functional/root'
+EXPECTED_DIR = ROOT_DIRECTORY / 'tests/functional/expected'
+LEASES = ROOT_DIRECTORY / 'tests/functional/root/leases'
+SHARDS = 8
+WORKERS = 3
+
+
+def _migrate(lease_store: LeaseStore) -> None:
+    """
+    Worker process of the sharded migration of EXPECTED_DIR
+    """
+    transfer_disk_to_blob([EXPECTED_DIR], ROOT_TEST, TEST_CONTAINER, lease_store=lease_store,
+                          shards=SHARDS)
+
+
+class ShardedMigrationTest(CloudSafeTestCase):
+    """
+    Class testing End-to-end sharded migrations run by several worker processes.
+    """
+
+    def setUp(self) -> None:
+        """
+        Initialize all needed variables for the end-to-end test. Erase produced data at end test
+        """
+        self.directories_created.append(LEASES)
+
+    @parameterized.expand([['disk'], ['cloud']])
+    def test_sharded_migration(self, store: str):
+        """
+        End-to-end test of a disk to azure migration shared by WORKERS processes
+        """
+        lease_store = DiskLeaseStore(LEASES / 'disk') if store == 'disk' else \
+            CloudLeaseStore(Path('/app/leases'), Cloud.AZURE, TEST_CONTAINER)
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=_migrate, args=(lease_store,)) for _ in range(WORKERS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertTrue(all(lease_store.is_done(shard) for shard in range(SHARDS)))
+        self.assertFalse(any((lease_store.record(shard) or {}).get('failed')
+                             for shard in range(SHARDS)))
+        for file_path in disk_rglob(EXPECTED_DIR, include_dirs=False):
+            if file_path.suffix == CSV_EXT:
+                cloud_data = load_cloud_data(file_path, cloud=Cloud.AZURE,
+                                             location=TEST_CONTAINER)
+                self.assertTrue(cloud_data.equals(disk_load(file_path)))
+
+    @parameterized.expand([[Cloud.AWS, TEST_BUCKET], [Cloud.AZURE, TEST_CONTAINER]])
+    def test_lease_reclaim(self, cloud: Cloud, location: str):
+        """
+        Test that leases are exclusive, and that expired leases of crashed workers are reclaimed
+        """
+        for lease_store in [DiskLeaseStore(LEASES / cloud.value),
+                            CloudLeaseStore(Path('/app/leases/reclaim'), cloud, location)]:
+            self.assertTrue(lease_store.claim(0, 'crashed', duration=0.5))
+            self.assertFalse(lease_store.claim(0, 'alive', duration=0.5))
+            time.sleep(1)
+            self.assertTrue(lease_store.claim(0, 'alive', duration=60))
+            self.assertFalse(lease_store.renew(0, 'crashed'))
+            self.assertFalse(lease_store.complete(0, 'crashed'))
+            self.assertTrue(lease_store.complete(0, 'alive'))
+            self.assertTrue(lease_store.is_done(0))
+            self.assertFalse(lease_store.claim(0, 'other'))
+
+    def test_failed_keys_retried(self):
+        """
+        Test that folders are listed once per worker, and that failed keys are retried before
+         their shard is recorded as done
+        """
+        lease_store = DiskLeaseStore(LEASES / 'retried')
+        files = [Path(f'/app/retried/{index}.csv') for index in range(20)]
+        scanned, calls = [], {file_path: 0 for file_path in files}
+
+        def scanner(folder: Path) -> list[Path]:
+            scanned.append(folder)
+            return files
+
+        def transferer(file_path: Path) -> None:
+            calls[file_path] += 1
+            if file_path == files[0] and calls[file_path] < 2 or file_path == files[1]:
+                raise ValueError(f'{file_path} cannot be transferred')
+
+        to_blob_sharded([Path('/app/retried')], transferer, scanner, lease_store, shards=SHARDS,
+                        attempts=3)
+        self.assertEqual(len(scanned), 1)
+        self.assertEqual([calls[files[0]], calls[files[1]], calls[files[2]]], [2, 3, 1])
+        self.assertEqual([failed for shard in range(SHARDS)
+                          if (failed := lease_store.record(shard)['failed'])], [[str(files[1])]])
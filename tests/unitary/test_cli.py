@@ -0,0 +1,81 @@
+"""
+Module testing the ecodev-cloud command line tool
+"""
+import tempfile
+from pathlib import Path
+
+from parameterized import parameterized
+
+from ecodev_cloud.cli import main
+from ecodev_cloud.cli import parse_location
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_exists
+from ecodev_cloud.cloud.cloud_helpers import download_cloud_object
+from ecodev_cloud.cloud.cloud_retry import RETRY_CONF
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.disk.disk_helpers import disk_rglob
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+
+
+class CliTest(CloudSafeTestCase):
+    """
+    Class testing the ecodev-cloud command line tool
+    """
+
+    @parameterized.expand([
+        ('s3://bucket/folder/example.csv', Cloud.AWS, 'bucket', 'folder/example.csv'),
+        ('az://container/folder/', Cloud.AZURE, 'container', 'folder'),
+        ('az://container', Cloud.AZURE, 'container', ''),
+    ])
+    def test_parse_location(self, text: str, cloud: Cloud, location: str, key: str):
+        """
+        test that cloud locations are parsed into a cloud, a bucket/container and a path
+        """
+        parsed = parse_location(text)
+        self.assertEqual(parsed.cloud, cloud)
+        self.assertEqual(parsed.location, location)
+        self.assertEqual(parsed.path, ROOT_DIRECTORY / key)
+        self.assertEqual(str(parsed).rstrip('/'), text.rstrip('/'))
+
+    def test_disk_commands(self):
+        """
+        test cp, sync and rm (dry run or not) between disk folders, --jobs leaving the default
+         number of bulk workers untouched
+        """
+        files = sorted(file_path.relative_to(DATA_DIRECTORY)
+                       for file_path in disk_rglob(DATA_DIRECTORY, include_dirs=False))
+        with tempfile.TemporaryDirectory() as folder_name:
+            self.assertEqual(main(['cp', str(DATA_DIRECTORY), folder_name, '--dry-run']), 0)
+            self.assertEqual(list(disk_rglob(Path(folder_name))), [])
+            bulk_workers = RETRY_CONF.bulk_workers
+            self.assertEqual(main(['cp', str(DATA_DIRECTORY), folder_name, '--jobs', '4']), 0)
+            self.assertEqual(RETRY_CONF.bulk_workers, bulk_workers)
+            self.assertEqual(sorted(file_path.relative_to(folder_name) for file_path in
+                                    disk_rglob(Path(folder_name), include_dirs=False)), files)
+            (Path(folder_name) / files[0]).unlink()
+            (Path(folder_name) / 'extraneous.txt').write_text('extraneous')
+            self.assertEqual(main(['sync', str(DATA_DIRECTORY), folder_name, '--delete']), 0)
+            self.assertEqual(sorted(file_path.relative_to(folder_name) for file_path in
+                                    disk_rglob(Path(folder_name), include_dirs=False)), files)
+            self.assertEqual(main(['rm', folder_name]), 0)
+            self.assertEqual(list(disk_rglob(Path(folder_name), include_dirs=False)), [])
+
+    @parameterized.expand([['s3', Cloud.AWS, TEST_BUCKET], ['az', Cloud.AZURE, TEST_CONTAINER]])
+    def test_cloud_mv(self, scheme: str, cloud: Cloud, location: str):
+        """
+        test that mv within a bucket/container copies objects entirely before deleting sources
+        """
+        source = DATA_DIRECTORY / 'example.csv'
+        uploaded, moved = ROOT_DIRECTORY / 'cli/example.csv', ROOT_DIRECTORY / 'cli_mv/example.csv'
+        self.assertEqual(main(['cp', str(source), f'{scheme}://{location}/cli/example.csv']), 0)
+        self.assertEqual(main(['mv', f'{scheme}://{location}/cli/',
+                               f'{scheme}://{location}/cli_mv/']), 0)
+        self.assertFalse(cloud_exists(uploaded, cloud=cloud, location=location))
+        with tempfile.TemporaryDirectory() as folder_name:
+            download_cloud_object(moved, Path(folder_name) / 'example.csv', cloud, location)
+            self.assertEqual((Path(folder_name) / 'example.csv').read_bytes(), source.read_bytes())
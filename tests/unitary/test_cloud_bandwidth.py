@@ -0,0 +1,61 @@
+"""
+Module testing the bandwidth limiter of transfers
+"""
+import threading
+import time
+
+from ecodev_cloud import bandwidth_throughput
+from ecodev_cloud import set_bandwidth
+from ecodev_cloud.cloud.cloud_bandwidth import BandwidthLimiter
+from ecodev_cloud.cloud.cloud_bandwidth import Direction
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_object
+from ecodev_cloud.cloud.s3.s3_helpers import s3_upload
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+RATE = 1_000_000
+CHUNK = 50_000
+
+
+class CloudBandwidthTest(CloudSafeTestCase):
+    """
+    Class testing the bandwidth limiter of transfers
+    """
+
+    def test_token_bucket(self):
+        """
+        Test that concurrent transfers share the limit, and that limits can be lifted at runtime
+        """
+        limiter = BandwidthLimiter(0., RATE, 0., burst=0.1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=lambda: [
+            limiter.throttle(Direction.UPLOAD, CHUNK) for _ in range(10)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreater(time.monotonic() - start, 1.5)
+        self.assertGreater(limiter.throughput()[Direction.UPLOAD], 0)
+        self.assertEqual(limiter.throughput()[Direction.DOWNLOAD], 0)
+
+        limiter.set_limits(upload=0.)
+        start = time.monotonic()
+        limiter.throttle(Direction.UPLOAD, 100 * RATE)
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_throttled_transfers(self):
+        """
+        Test that uploads and downloads go through the shared limiter
+        """
+        set_bandwidth(download=RATE)
+        try:
+            s3_upload(DATA_DIRECTORY / 'example.csv', DATA_DIRECTORY / 'example.csv',
+                      location=TEST_BUCKET)
+            get_s3_object(DATA_DIRECTORY / 'example.csv', location=TEST_BUCKET)
+            throughput = bandwidth_throughput()
+            self.assertGreater(throughput[Direction.UPLOAD], 0)
+            self.assertGreater(throughput[Direction.DOWNLOAD], 0)
+        finally:
+            set_bandwidth(download=0.)
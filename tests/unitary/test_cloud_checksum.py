@@ -0,0 +1,127 @@
+"""
+Module testing the integrity checksums of transfers
+"""
+import hashlib
+import io
+import tempfile
+from pathlib import Path
+
+import google_crc32c
+
+from ecodev_cloud import verify_transfer
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_checksum import check_s3_response
+from ecodev_cloud.cloud.cloud_checksum import CHECKSUM_CONF
+from ecodev_cloud.cloud.cloud_checksum import ChecksumError
+from ecodev_cloud.cloud.cloud_checksum import HashingReader
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.cloud.s3.s3_helpers import download_s3_object
+from ecodev_cloud.cloud.s3.s3_helpers import s3_upload
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+PART = 1024
+
+
+class CloudChecksumTest(CloudSafeTestCase):
+    """
+    Class testing the integrity checksums of transfers
+    """
+
+    def test_streamed_checksums(self):
+        """
+        Test that checksums computed while streaming match those of the whole content, and that
+         mismatches with stored values are raised
+        """
+        data = bytes(range(256)) * 20
+        reader = HashingReader(io.BytesIO(data), part_size=PART)
+        while reader.read(300):
+            pass
+        checksums = reader.checksums()
+        self.assertEqual(checksums.size, len(data))
+        self.assertEqual(checksums.md5, hashlib.md5(data).hexdigest())
+        self.assertEqual(checksums.s3_etag, checksums.md5)
+
+        check_s3_response(checksums, {'ContentLength': len(data), 'ETag': f'"{checksums.md5}"'},
+                          'key')
+        with self.assertRaises(ChecksumError):
+            check_s3_response(checksums, {'ContentLength': len(data), 'ETag': f'"{"0" * 32}"'},
+                              'key')
+        with self.assertRaises(ChecksumError):
+            check_s3_response(checksums, {'ContentLength': 1, 'ETag': f'"{checksums.md5}"'},
+                              'key')
+
+    def test_crc32c(self):
+        """
+        Test that CRC32C checksums (google-crc32c being a dev requirement) are computed out of
+         the writable buffers upload clients read into, and match the stored ones
+        """
+        data = bytes(range(256)) * 20
+        reader = HashingReader(io.BytesIO(data), part_size=PART)
+        buffer = bytearray(300)
+        while reader.readinto(buffer):
+            pass
+        self.assertEqual(reader.checksums().crc32c, google_crc32c.Checksum(data).digest().hex())
+
+        file_path = DATA_DIRECTORY / 'example.csv'
+        uploaded = s3_upload(file_path, file_path, location=TEST_BUCKET)
+        self.assertEqual(uploaded.crc32c,
+                         google_crc32c.Checksum(file_path.read_bytes()).digest().hex())
+
+    def test_multipart_etag(self):
+        """
+        Test that multipart ETags are only compared when the stored part size is known and the
+         one they were computed with
+        """
+        data = bytes(range(256)) * 40 * 1024
+        reader = HashingReader(io.BytesIO(data), part_size=len(data) // 2)
+        while reader.read(PART):
+            pass
+        checksums = reader.checksums()
+        self.assertTrue(checksums.s3_etag.endswith('-2'))
+        self.assertEqual(checksums.s3_part_size, len(data) // 2)
+        response = {'ContentLength': len(data), 'ETag': f'"{"0" * 32}-2"'}
+        check_s3_response(checksums, response, 'key')
+        check_s3_response(checksums, response, 'key', part_size=len(data) // 4)
+        with self.assertRaises(ChecksumError):
+            check_s3_response(checksums, response, 'key', part_size=len(data) // 2)
+        check_s3_response(checksums, {'ContentLength': len(data), 'ETag': f'"{checksums.s3_etag}"'},
+                          'key', part_size=len(data) // 2)
+
+    def test_round_trip(self):
+        """
+        Test that an upload and a download of the same file report the same checksums, and that
+         the upload is verified against its source
+        """
+        file_path = DATA_DIRECTORY / 'example.csv'
+        uploaded = s3_upload(file_path, file_path, location=TEST_BUCKET)
+        with tempfile.TemporaryDirectory() as folder_name:
+            downloaded = download_s3_object(file_path, Path(folder_name) / 'example.csv',
+                                            location=TEST_BUCKET)
+        self.assertEqual(uploaded.md5, downloaded.md5)
+        self.assertEqual(uploaded.size, file_path.stat().st_size)
+        self.assertEqual(verify_transfer(file_path, Cloud.AWS, dst_location=TEST_BUCKET), {})
+        missing = DATA_DIRECTORY / 'example.json'
+        self.assertEqual(verify_transfer(missing, Cloud.AWS, dst_location=TEST_BUCKET),
+                         {missing: 'missing'})
+
+    def test_multipart_round_trip(self):
+        """
+        Test that a multipart upload is checked against its ETag when asked to (its part size
+         being known), and that its download reports the same checksums
+        """
+        data = bytes(range(256)) * 36 * 1024
+        with tempfile.TemporaryDirectory() as folder_name:
+            (source := Path(folder_name) / 'multipart.bin').write_bytes(data)
+            file_path = ROOT_DIRECTORY / 'multipart.bin'
+            CHECKSUM_CONF.checksum_upload_head = True
+            try:
+                uploaded = s3_upload(source, file_path, location=TEST_BUCKET)
+            finally:
+                CHECKSUM_CONF.checksum_upload_head = False
+            downloaded = download_s3_object(file_path, Path(folder_name) / 'downloaded.bin',
+                                            location=TEST_BUCKET)
+            self.assertEqual((Path(folder_name) / 'downloaded.bin').read_bytes(), data)
+        self.assertTrue(uploaded.s3_etag.endswith('-2'))
+        self.assertEqual(downloaded, uploaded)
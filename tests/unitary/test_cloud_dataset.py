@@ -0,0 +1,55 @@
+"""
+Module testing partitioned DataFrame datasets
+"""
+import pandas as pd
+
+from ecodev_cloud import delete_cloud_content
+from ecodev_cloud import load_cloud_dataset
+from ecodev_cloud import save_cloud_data
+from ecodev_cloud import save_cloud_dataset
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATASET = ROOT_DIRECTORY / 'tests/unitary/data/dataset'
+DATA = pd.DataFrame({'client': ['World', 'Rest/Of World', 'World', 'World'],
+                     'year': [2023, 2023, 2024, 2024], 'value': [1.5, 2.5, 3.5, 4.5]})
+
+
+class CloudDatasetTest(CloudSafeTestCase):
+    """
+    Class testing partitioned DataFrame datasets
+    """
+
+    def test_dataset_round_trip(self):
+        """
+        Test that a partitioned dataset loads back whole, or pruned to the filtered partitions
+        """
+        written = save_cloud_dataset(DATASET, DATA, ['year', 'client'], cloud=Cloud.AWS,
+                                     location=TEST_BUCKET)
+        self.assertEqual(len(written), 3)
+        loaded = load_cloud_dataset(DATASET, cloud=Cloud.AWS, location=TEST_BUCKET)
+        pd.testing.assert_frame_equal(
+            loaded.sort_values('value', ignore_index=True), DATA, check_dtype=False)
+
+        filtered = load_cloud_dataset(DATASET, {'year': 2024, 'client': ['World']},
+                                      cloud=Cloud.AWS, location=TEST_BUCKET)
+        self.assertEqual(sorted(filtered['value']), [3.5, 4.5])
+        self.assertEqual(set(filtered['year']), {2024})
+
+        self.assertTrue(load_cloud_dataset(DATASET, {'year': lambda year: year > 2024},
+                                           cloud=Cloud.AWS, location=TEST_BUCKET).empty)
+
+    def test_dataset_failures(self):
+        """
+        Test that a partition folder missing its file is raised instead of being left out of
+         loads
+        """
+        folder = DATASET.with_name('failed_dataset')
+        written = save_cloud_dataset(folder, DATA, ['year'], cloud=Cloud.AWS, location=TEST_BUCKET)
+        save_cloud_data(written[0].with_name('extra.json'), {}, cloud=Cloud.AWS,
+                        location=TEST_BUCKET)
+        delete_cloud_content(written[0], cloud=Cloud.AWS, location=TEST_BUCKET)
+        with self.assertRaises(Exception):
+            load_cloud_dataset(folder, cloud=Cloud.AWS, location=TEST_BUCKET)
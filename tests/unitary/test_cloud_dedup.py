@@ -0,0 +1,59 @@
+"""
+Module testing content hash based upload deduplication
+"""
+from unittest import mock
+
+from parameterized import parameterized
+
+from ecodev_cloud import Cloud
+from ecodev_cloud.cloud import cloud_dedup
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud_dedup import stored_sha256
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+DEDUP_PATH = DATA_DIRECTORY / 'dedup/example.csv'
+COPY_PATH = DATA_DIRECTORY / 'dedup/copy/example.csv'
+CLOUDS: dict[Cloud, str] = {
+    Cloud.AWS: TEST_BUCKET,
+    Cloud.AZURE: TEST_CONTAINER
+}
+
+
+class CloudDedupTest(CloudSafeTestCase):
+    """
+    Class testing content hash based upload deduplication
+    """
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_dedup_save(self, cloud: Cloud):
+        """
+        Test that identical saves are skipped, and cross key duplicates copied server side
+        """
+        local_data, location = disk_load(DATA_DIRECTORY / 'example.csv'), CLOUDS[cloud]
+        save_cloud_data(DEDUP_PATH, local_data, cloud=cloud, location=location, dedup=True)
+        self.assertIsNotNone(stored_sha256(DEDUP_PATH, cloud, location))
+        uploader = 'blob_upload' if cloud == Cloud.AZURE else 's3_upload'
+        with mock.patch.object(cloud_dedup, uploader) as upload:
+            save_cloud_data(DEDUP_PATH, local_data, cloud=cloud, location=location, dedup=True)
+            save_cloud_data(COPY_PATH, local_data, cloud=cloud, location=location, dedup=True)
+            upload.assert_not_called()
+        self.assertTrue(load_cloud_data(COPY_PATH, cloud=cloud, location=location).equals(
+            local_data))
+
+    def test_registry_bound(self):
+        """
+        Test that the registry only remembers its max_size last contents
+        """
+        registry = cloud_dedup.HashRegistry(max_size=2)
+        for digest in ['a', 'b', 'c']:
+            registry.put(Cloud.AWS, TEST_BUCKET, digest, DATA_DIRECTORY / digest)
+        self.assertIsNone(registry.get(Cloud.AWS, TEST_BUCKET, 'a'))
+        self.assertEqual(registry.get(Cloud.AWS, TEST_BUCKET, 'b'), DATA_DIRECTORY / 'b')
+        registry.put(Cloud.AWS, TEST_BUCKET, 'd', DATA_DIRECTORY / 'd')
+        self.assertIsNone(registry.get(Cloud.AWS, TEST_BUCKET, 'c'))
@@ -6,6 +6,7 @@ from io import BytesIO
 import pandas as pd
 import requests
 from azure.storage.blob import BlobClient
+from parameterized import parameterized
 
 from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
 from ecodev_cloud.cloud.blob.blob_helpers import blob_copy_file
@@ -13,7 +14,12 @@ from ecodev_cloud.cloud.blob.blob_helpers import blob_exists
 from ecodev_cloud.cloud.blob.blob_helpers import blob_iterdir
 from ecodev_cloud.cloud.blob.blob_helpers import blob_rglob
 from ecodev_cloud.cloud.blob.blob_helpers import get_blob_url
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_helpers import cloud_du
+from ecodev_cloud.cloud.cloud_helpers import cloud_exists_many
 from ecodev_cloud.cloud.cloud_helpers import cloud_is_dir
+from ecodev_cloud.cloud.cloud_helpers import cloud_scan
+from ecodev_cloud.cloud.cloud_helpers import get_cloud_urls
 from ecodev_cloud.cloud.cloud_loaders import load_blob_data
 from ecodev_cloud.cloud.cloud_loaders import load_s3_data
 from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
@@ -22,6 +28,7 @@ from ecodev_cloud.cloud.s3.s3_helpers import s3_copy_file
 from ecodev_cloud.cloud.s3.s3_helpers import s3_exists
 from ecodev_cloud.cloud.s3.s3_helpers import s3_iterdir
 from ecodev_cloud.cloud.s3.s3_helpers import s3_rglob
+from ecodev_cloud.cloud.url_cache import URL_CACHE
 from ecodev_cloud.path_utils import ROOT_DIRECTORY
 from tests.cloud_safe_test_case import CloudSafeTestCase
 
@@ -29,6 +36,10 @@ from tests.cloud_safe_test_case import CloudSafeTestCase
 DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
 LOCAL_PATH_1 = DATA_DIRECTORY / 'example.csv'
 LOCAL_PATH_2 = DATA_DIRECTORY / 'example.json'
+CLOUDS: dict[Cloud, str] = {
+    Cloud.AWS: TEST_BUCKET,
+    Cloud.AZURE: TEST_CONTAINER
+}
 
 
 class CloudHelpersTest(CloudSafeTestCase):
@@ -90,3 +101,58 @@ class CloudHelpersTest(CloudSafeTestCase):
         gt_json = load_s3_data(LOCAL_PATH_2 / LOCAL_PATH_2.name, location=TEST_BUCKET)
         prod_sas = requests.get(s3_url).json()
         self.assertCountEqual(gt_json, prod_sas)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_get_cloud_urls(self, cloud: Cloud):
+        """
+        Test that batch generated urls allow to download the data, and are cached if asked to
+         (cached urls not being reused for longer timeouts)
+        """
+        copy = s3_copy_file if cloud == Cloud.AWS else blob_copy_file
+        for file_path in [LOCAL_PATH_1, LOCAL_PATH_2]:
+            copy(file_path, file_path, location=CLOUDS[cloud])
+        URL_CACHE.clear()
+        urls = get_cloud_urls([LOCAL_PATH_1, LOCAL_PATH_2], cloud=cloud, location=CLOUDS[cloud],
+                              cache=True)
+        self.assertEqual(list(urls), [LOCAL_PATH_1, LOCAL_PATH_2])
+        self.assertTrue(all(urls.values()))
+        for file_path, url in urls.items():
+            self.assertEqual(requests.get(str(url)).content, file_path.read_bytes())
+        cached = get_cloud_urls([LOCAL_PATH_2], cloud=cloud, location=CLOUDS[cloud], cache=True)
+        self.assertEqual(cached[LOCAL_PATH_2], urls[LOCAL_PATH_2])
+        longer = get_cloud_urls([LOCAL_PATH_2], timeout=7200, cloud=cloud, location=CLOUDS[cloud],
+                                cache=True)
+        self.assertNotEqual(longer[LOCAL_PATH_2], urls[LOCAL_PATH_2])
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cloud_exists_many(self, cloud: Cloud):
+        """
+        Test that bulk existence checks agree with single ones, for clustered and scattered paths
+        """
+        copy = s3_copy_file if cloud == Cloud.AWS else blob_copy_file
+        for file_path in [LOCAL_PATH_1, LOCAL_PATH_2]:
+            copy(file_path, file_path, location=CLOUDS[cloud])
+        file_paths = [LOCAL_PATH_1, LOCAL_PATH_2, DATA_DIRECTORY / 'missing.csv',
+                      DATA_DIRECTORY.parent / 'missing.csv']
+        found = cloud_exists_many(file_paths, cloud=cloud, location=CLOUDS[cloud])
+        self.assertEqual(found, {LOCAL_PATH_1: True, LOCAL_PATH_2: True,
+                                 DATA_DIRECTORY / 'missing.csv': False,
+                                 DATA_DIRECTORY.parent / 'missing.csv': False})
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cloud_scan(self, cloud: Cloud):
+        """
+        Test that scanned entries carry the stored objects properties, and that du sums them
+        """
+        copy = s3_copy_file if cloud == Cloud.AWS else blob_copy_file
+        for file_path in [LOCAL_PATH_1, LOCAL_PATH_2]:
+            copy(file_path, file_path, location=CLOUDS[cloud])
+        entries = {entry.path: entry for entry in
+                   cloud_scan(DATA_DIRECTORY, pattern='example.*', cloud=cloud,
+                              location=CLOUDS[cloud])}
+        for file_path in [LOCAL_PATH_1, LOCAL_PATH_2]:
+            self.assertEqual(entries[file_path].size, file_path.stat().st_size)
+            self.assertTrue(entries[file_path].etag)
+        usage = cloud_du(DATA_DIRECTORY.parent, depth=1, cloud=cloud, location=CLOUDS[cloud])
+        self.assertGreaterEqual(usage[DATA_DIRECTORY],
+                                LOCAL_PATH_1.stat().st_size + LOCAL_PATH_2.stat().st_size)
@@ -0,0 +1,82 @@
+"""
+Module testing the local inventory of cloud locations
+"""
+from parameterized import parameterized
+
+from ecodev_cloud import Cloud
+from ecodev_cloud import cloud_du
+from ecodev_cloud import cloud_exists_many
+from ecodev_cloud import cloud_inventory
+from ecodev_cloud import cloud_iterdir
+from ecodev_cloud import cloud_rglob
+from ecodev_cloud import cloud_scan
+from ecodev_cloud import delete_cloud_content
+from ecodev_cloud import refresh_inventory
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+INVENTORY_FOLDER = ROOT_DIRECTORY / 'inventory'
+CLOUDS: dict[Cloud, str] = {
+    Cloud.AWS: TEST_BUCKET,
+    Cloud.AZURE: TEST_CONTAINER
+}
+
+
+class CloudInventoryTest(CloudSafeTestCase):
+    """
+    Class testing the local inventory of cloud locations
+    """
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cloud_inventory(self, cloud: Cloud):
+        """
+        Test that the inventory answers as the provider does, and follows saves and deletes
+        """
+        location = CLOUDS[cloud]
+        data = disk_load(DATA_DIRECTORY / 'example.csv')
+        for name in ['first/example.csv', 'first/sub/example.csv', 'second/example.csv']:
+            save_cloud_data(INVENTORY_FOLDER / name, data, cloud=cloud, location=location)
+        listed = sorted(cloud_rglob(INVENTORY_FOLDER, cloud=cloud, location=location))
+        children = list(cloud_iterdir(INVENTORY_FOLDER / 'first', cloud=cloud, location=location))
+        with cloud_inventory() as inventory:
+            self.assertGreater(refresh_inventory(cloud, location), 0)
+            self.assertTrue(inventory.holds(cloud, location))
+            self.assertEqual(list(cloud_rglob(INVENTORY_FOLDER, cloud=cloud, location=location)),
+                             listed)
+            self.assertEqual(list(cloud_iterdir(INVENTORY_FOLDER / 'first', cloud=cloud,
+                                                location=location)), children)
+
+            save_cloud_data(INVENTORY_FOLDER / 'third.csv', data, cloud=cloud, location=location)
+            delete_cloud_content(INVENTORY_FOLDER / 'second/example.csv', cloud=cloud,
+                                 location=location)
+            self.assertEqual(cloud_exists_many(
+                [INVENTORY_FOLDER / 'third.csv', INVENTORY_FOLDER / 'second/example.csv'],
+                cloud=cloud, location=location), {INVENTORY_FOLDER / 'third.csv': True,
+                                                  INVENTORY_FOLDER / 'second/example.csv': False})
+            sizes = {entry.path: entry.size for entry in
+                     cloud_scan(INVENTORY_FOLDER, cloud=cloud, location=location)}
+            refresh_inventory(cloud, location, full=True)
+            self.assertEqual({entry.path: entry.size for entry in
+                              cloud_scan(INVENTORY_FOLDER, cloud=cloud, location=location)}, sizes)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_streamed_save(self, cloud: Cloud):
+        """
+        Test that objects streamed to the cloud (zipped folders) are inventoried with their size
+        """
+        location = CLOUDS[cloud]
+        save_cloud_data(INVENTORY_FOLDER / 'zipped/example.csv',
+                        disk_load(DATA_DIRECTORY / 'example.csv'), cloud=cloud, location=location)
+        with cloud_inventory():
+            refresh_inventory(cloud, location)
+            save_cloud_data(INVENTORY_FOLDER / 'zipped/data.zip', DATA_DIRECTORY, cloud=cloud,
+                            location=location)
+            usage = cloud_du(INVENTORY_FOLDER / 'zipped', cloud=cloud, location=location)
+            refresh_inventory(cloud, location, full=True)
+            self.assertEqual(cloud_du(INVENTORY_FOLDER / 'zipped', cloud=cloud,
+                                      location=location), usage)
@@ -0,0 +1,64 @@
+"""
+Module testing pack objects of small members
+"""
+import numpy as np
+from parameterized import parameterized
+
+from ecodev_cloud import load_cloud_data
+from ecodev_cloud import load_cloud_pack
+from ecodev_cloud import save_cloud_pack
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud import Cloud
+from ecodev_cloud.cloud.cloud_pack import cache_index
+from ecodev_cloud.cloud.cloud_pack import pack_index
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+PACK_PATH = ROOT_DIRECTORY / 'tests/unitary/data/members.pack'
+MEMBERS = {'example.json': {'key': [1, 2, 3]}, 'folder/example.txt': 'packed text',
+           'example.npy': np.arange(12).reshape(3, 4), 'empty.txt': ''}
+
+
+class CloudPackTest(CloudSafeTestCase):
+    """
+    Class testing pack objects of small members
+    """
+
+    @parameterized.expand([(None, Cloud.AWS, TEST_BUCKET), ('gzip', Cloud.AWS, TEST_BUCKET),
+                           (None, Cloud.AZURE, TEST_CONTAINER),
+                           ('gzip', Cloud.AZURE, TEST_CONTAINER)])
+    def test_pack_round_trip(self, compression: str | None, cloud: Cloud, location: str):
+        """
+        Test that packed members load as the objects they were saved from, one by one (ranged
+         reads) or all at once
+        """
+        save_cloud_pack(PACK_PATH, MEMBERS, cloud=cloud, location=location,
+                        compression=compression)
+        loaded = load_cloud_pack(PACK_PATH, cloud=cloud, location=location)
+        self.assertEqual(list(loaded), list(MEMBERS))
+        for name, data in MEMBERS.items():
+            member = load_cloud_data(PACK_PATH / name, cloud=cloud, location=location)
+            if isinstance(data, np.ndarray):
+                np.testing.assert_array_equal(member, data)
+                np.testing.assert_array_equal(loaded[name], data)
+            else:
+                self.assertEqual(member, data)
+                self.assertEqual(loaded[name], data)
+
+    @parameterized.expand([[Cloud.AWS, TEST_BUCKET], [Cloud.AZURE, TEST_CONTAINER]])
+    def test_rewritten_pack(self, cloud: Cloud, location: str):
+        """
+        Test that a stale cached index (pack rewritten by another process) is read again instead
+         of serving members at outdated offsets
+        """
+        save_cloud_pack(PACK_PATH, MEMBERS, cloud=cloud, location=location)
+        self.assertEqual(load_cloud_data(PACK_PATH / 'example.json', cloud=cloud,
+                                         location=location), MEMBERS['example.json'])
+        stale = pack_index(PACK_PATH, cloud, location)
+        rewritten = {'folder/example.txt': 'rewritten text', 'example.json': {'key': [4]}}
+        save_cloud_pack(PACK_PATH, rewritten, cloud=cloud, location=location)
+        cache_index(PACK_PATH, cloud, location, stale)
+        self.assertEqual(load_cloud_data(PACK_PATH / 'example.json', cloud=cloud,
+                                         location=location), rewritten['example.json'])
+        self.assertNotEqual(pack_index(PACK_PATH, cloud, location).etag, stale.etag)
@@ -0,0 +1,155 @@
+"""
+Module testing retries and concurrency control under throttling
+"""
+import random
+import threading
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+from ecodev_cloud.cloud.cloud_retry import AdaptiveLimiter
+from ecodev_cloud.cloud.cloud_retry import is_retryable
+from ecodev_cloud.cloud.cloud_retry import is_throttling
+from ecodev_cloud.cloud.cloud_retry import LIMITER
+from ecodev_cloud.cloud.cloud_retry import retried
+from ecodev_cloud.cloud.cloud_retry import RETRY_CONF
+from ecodev_cloud.cloud.cloud_retry import run_bulk
+from ecodev_cloud.cloud.cloud_retry import with_retry
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.cloud.s3.s3_helpers import s3_exists
+from ecodev_cloud.cloud.s3.s3_helpers import s3_upload
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+SLOW_DOWN = ClientError({'Error': {'Code': 'SlowDown'}}, 'PutObject')
+INTERNAL_ERROR = ClientError({'Error': {'Code': 'InternalError'},
+                              'ResponseMetadata': {'HTTPStatusCode': 500}}, 'PutObject')
+
+
+class ThrottlingUploader:
+    """
+    Local stand-in injecting S3 SlowDown errors in front of a real upload
+    """
+
+    def __init__(self, throttling_rate: float) -> None:
+        self.throttling_rate = throttling_rate
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, dest: Path) -> None:
+        if random.random() < self.throttling_rate:
+            with self._lock:
+                self.throttled += 1
+            raise SLOW_DOWN
+        s3_upload(DATA_DIRECTORY / 'example.txt', dest, location=TEST_BUCKET)
+
+
+class CloudRetryTest(CloudSafeTestCase):
+    """
+    Class testing retries and concurrency control under throttling
+    """
+
+    def test_with_retry(self):
+        """
+        Test that throttling errors are retried, and that other errors are not
+        """
+        calls = []
+
+        def flaky() -> str:
+            calls.append(1)
+            if len(calls) < 3:
+                raise SLOW_DOWN
+            return 'ok'
+
+        self.assertTrue(is_throttling(SLOW_DOWN))
+        self.assertFalse(is_throttling(ValueError()))
+        self.assertEqual(with_retry(flaky), 'ok')
+        self.assertEqual(len(calls), 3)
+        with self.assertRaises(ValueError):
+            with_retry(lambda: int('not a number'))
+
+    def test_server_errors(self):
+        """
+        Test that internal server errors are retried without being reported as throttling
+        """
+        calls = []
+
+        def flaky() -> str:
+            calls.append(1)
+            if len(calls) < 2:
+                raise INTERNAL_ERROR
+            return 'ok'
+
+        self.assertTrue(is_retryable(INTERNAL_ERROR))
+        self.assertFalse(is_throttling(INTERNAL_ERROR))
+        limiter = AdaptiveLimiter(8, cooldown=0)
+        token = LIMITER.set(limiter)
+        try:
+            self.assertEqual(with_retry(flaky), 'ok')
+        finally:
+            LIMITER.reset(token)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(limiter.limit, 8)
+
+    def test_no_retry_attempts(self):
+        """
+        Test that functions are called once even if no retry attempts are configured
+        """
+        calls = []
+
+        def throttled() -> None:
+            calls.append(1)
+            raise SLOW_DOWN
+
+        attempts, RETRY_CONF.retry_attempts = RETRY_CONF.retry_attempts, 0
+        try:
+            self.assertEqual(with_retry(lambda: 'ok'), 'ok')
+            with self.assertRaises(ClientError):
+                with_retry(throttled)
+        finally:
+            RETRY_CONF.retry_attempts = attempts
+        self.assertEqual(len(calls), 1)
+
+    def test_nested_retry(self):
+        """
+        Test that a retried function called by another one is only retried by the outermost call
+        """
+        calls = []
+
+        @retried
+        def throttled() -> None:
+            calls.append(1)
+            raise SLOW_DOWN
+
+        base_delay, RETRY_CONF.retry_base_delay = RETRY_CONF.retry_base_delay, 0
+        try:
+            with self.assertRaises(ClientError):
+                with_retry(throttled)
+        finally:
+            RETRY_CONF.retry_base_delay = base_delay
+        self.assertEqual(len(calls), RETRY_CONF.retry_attempts)
+
+    def test_limiter(self):
+        """
+        Test the AIMD behaviour of the concurrency limiter
+        """
+        limiter = AdaptiveLimiter(8, cooldown=0)
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 4)
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(2):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 3)
+
+    def test_bulk_under_throttling(self):
+        """
+        Test that a bulk upload facing injected throttling eventually uploads all files
+        """
+        uploader = ThrottlingUploader(throttling_rate=0.3)
+        dests = [DATA_DIRECTORY / f'throttled/{index}.txt' for index in range(50)]
+        results = list(run_bulk(uploader, dests, max_workers=8))
+        self.assertTrue(all(error is None for _, _, error in results))
+        self.assertTrue(uploader.throttled > 0)
+        self.assertTrue(all(s3_exists(dest, location=TEST_BUCKET) for dest in dests))
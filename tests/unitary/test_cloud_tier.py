@@ -0,0 +1,99 @@
+"""
+Module testing the local disk write-back tier
+"""
+from pathlib import Path
+
+from parameterized import parameterized
+
+from ecodev_cloud import Cloud
+from ecodev_cloud import flush_tier
+from ecodev_cloud import tiered_storage
+from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_data
+from ecodev_cloud.cloud.cloud_tier import tier
+from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.path_utils import ROOT_DIRECTORY
+from tests.cloud_safe_test_case import CloudSafeTestCase
+
+DATA_DIRECTORY = ROOT_DIRECTORY / 'tests/unitary/data'
+TIER_PATH = DATA_DIRECTORY / 'tier/example.csv'
+CLOUDS: dict[Cloud, str] = {
+    Cloud.AWS: TEST_BUCKET,
+    Cloud.AZURE: TEST_CONTAINER
+}
+
+
+class CloudTierTest(CloudSafeTestCase):
+    """
+    Class testing the local disk write-back tier
+    """
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_tiered_storage(self, cloud: Cloud):
+        """
+        Test that tiered writes are served locally, and are on the cloud once flushed
+        """
+        local_data = disk_load(DATA_DIRECTORY / 'example.csv')
+        with tiered_storage() as local_tier:
+            save_cloud_data(TIER_PATH, local_data, cloud=cloud, location=CLOUDS[cloud])
+            self.assertTrue(local_tier.holds(cloud, CLOUDS[cloud], TIER_PATH))
+            self.assertTrue(
+                load_cloud_data(TIER_PATH, cloud=cloud, location=CLOUDS[cloud]).equals(local_data))
+            flush_tier()
+
+        self.assertIsNone(tier())
+        cloud_data = load_cloud_data(TIER_PATH, cloud=cloud, location=CLOUDS[cloud])
+        self.assertTrue(cloud_data.equals(local_data))
+
+    def test_tier_eviction(self):
+        """
+        Test that uploaded local copies beyond the tier size are evicted, least recently used first
+        """
+        local_data = disk_load(DATA_DIRECTORY / 'example.csv')
+        paths = [DATA_DIRECTORY / f'tier/example_{number}.csv' for number in range(3)]
+        with tiered_storage() as local_tier:
+            for file_path in paths:
+                save_cloud_data(file_path, local_data, cloud=Cloud.AWS, location=TEST_BUCKET)
+                flush_tier()
+                size = local_tier.local_path(Cloud.AWS, TEST_BUCKET, file_path).stat().st_size
+                local_tier.max_bytes = 2 * size
+            self.assertEqual([local_tier.holds(Cloud.AWS, TEST_BUCKET, file_path)
+                              for file_path in paths], [False, True, True])
+        self.assertTrue(load_cloud_data(paths[0], cloud=Cloud.AWS,
+                                        location=TEST_BUCKET).equals(local_data))
+
+    def test_failed_uploads_kept(self):
+        """
+        Test that local copies whose upload failed are never evicted, and are uploaded by a
+         flush with retry
+        """
+        failing = {'count': 1}
+
+        def serialize(folder: Path) -> Path:
+            (file_path := folder / 'example.txt').write_text('tiered')
+            return file_path
+
+        def upload(local_path: Path, store_path: Path) -> None:
+            if failing['count']:
+                failing['count'] -= 1
+                raise IOError('upload failed')
+            uploaded[store_path] = local_path.read_text()
+
+        uploaded: dict[Path, str] = {}
+        paths = [DATA_DIRECTORY / f'tier/example_{number}.txt' for number in range(3)]
+        with tiered_storage(max_bytes=1) as local_tier:
+            local_tier.save(Cloud.AWS, TEST_BUCKET, paths[0], serialize, upload)
+            with self.assertRaises(RuntimeError):
+                local_tier.flush()
+            local_tier.save(Cloud.AWS, TEST_BUCKET, paths[1], serialize, upload)
+            with self.assertRaises(RuntimeError):
+                local_tier.flush()
+            self.assertTrue(local_tier.holds(Cloud.AWS, TEST_BUCKET, paths[0]))
+            local_tier.flush(retry=True)
+            local_tier.save(Cloud.AWS, TEST_BUCKET, paths[2], serialize, upload)
+            local_tier.flush()
+            self.assertEqual(uploaded, {file_path: 'tiered' for file_path in paths})
+            self.assertEqual([local_tier.holds(Cloud.AWS, TEST_BUCKET, file_path)
+                              for file_path in paths], [False, False, True])
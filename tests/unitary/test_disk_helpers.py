@@ -8,6 +8,8 @@ from ecodev_cloud import disk_copy
 from ecodev_cloud import disk_is_dir
 from ecodev_cloud import disk_iterdir
 from ecodev_cloud import disk_move
+from ecodev_cloud import disk_rglob
+from ecodev_cloud import disk_scan
 from ecodev_cloud.path_utils import ROOT_DIRECTORY
 from tests.cloud_safe_test_case import CloudSafeTestCase
 
@@ -33,3 +35,33 @@ class DiskHelpersTest(CloudSafeTestCase):
             self.assertEqual(len(list(disk_iterdir(Path(folder_name)))), 1)
             disk_copy(Path(folder_name) / 'toto.csv', Path(folder_name) / 'example.csv')
             self.assertEqual(len(list(disk_iterdir(Path(folder_name)))), 2)
+
+    def test_disk_scan(self):
+        """
+        test the scandir based disk walker
+        """
+        folder = ROOT_DIRECTORY / 'tests/functional'
+        self.assertEqual(list(disk_rglob(folder, sort=True)), sorted(folder.rglob('*')))
+        self.assertCountEqual(list(disk_rglob(folder)), list(folder.rglob('*')))
+        self.assertCountEqual(list(disk_rglob(folder, '*.csv')), list(folder.rglob('*.csv')))
+        entries = list(disk_scan(folder, include_dirs=False))
+        self.assertTrue(all(not disk_is_dir(entry) for entry in entries))
+        self.assertTrue(all(entry.size == entry.path.stat().st_size for entry in entries))
+        self.assertEqual(list(disk_rglob(DATA_DIRECTORY / 'example.csv')), [])
+        self.assertEqual(list(disk_scan(folder / 'missing', sort=True)), [])
+
+    def test_disk_scan_symlinks(self):
+        """
+        test that symbolic links are not followed (no loop on cycles) and that broken ones do
+         not abort a scan
+        """
+        with tempfile.TemporaryDirectory() as folder_name:
+            folder = Path(folder_name)
+            (folder / 'sub').mkdir()
+            (folder / 'sub' / 'file.txt').write_text('content')
+            (folder / 'sub' / 'loop').symlink_to(folder)
+            (folder / 'broken').symlink_to(folder / 'missing')
+            self.assertEqual(sorted(fp.relative_to(folder) for fp in disk_rglob(folder)),
+                             [Path('broken'), Path('sub'), Path('sub/file.txt'), Path('sub/loop')])
+            sizes = {entry.path.name: entry.size for entry in disk_scan(folder)}
+            self.assertEqual(sizes['file.txt'], len('content'))
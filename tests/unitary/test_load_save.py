@@ -2,25 +2,45 @@
 Module testing that all loading and saving method are working properly
 """
 import itertools
+import threading
 from pathlib import Path
 from typing import Any
 from typing import Callable
+from unittest import mock
 
 import numpy as np
 from ecodev_core import logger_get
 from parameterized import parameterized
+from shapely.geometry import Point
 
 from ecodev_cloud import Cloud
 from ecodev_cloud import cloud_copy_file
 from ecodev_cloud import disk_save
+from ecodev_cloud.cloud import cloud_decoding
 from ecodev_cloud.cloud.blob.blob_container import TEST_CONTAINER
+from ecodev_cloud.cloud.blob.blob_helpers import get_blob_object
+from ecodev_cloud.cloud.cloud_cache import cache_folder
+from ecodev_cloud.cloud.cloud_cache import cached_download
+from ecodev_cloud.cloud.cloud_cache import evict
+from ecodev_cloud.cloud.cloud_loaders import cloud_iter_load
+from ecodev_cloud.cloud.cloud_loaders import load_cloud_batch
 from ecodev_cloud.cloud.cloud_loaders import load_cloud_data
+from ecodev_cloud.cloud.cloud_savers import save_cloud_batch
 from ecodev_cloud.cloud.cloud_savers import save_cloud_data
 from ecodev_cloud.cloud.s3.s3_bucket import TEST_BUCKET
+from ecodev_cloud.cloud.s3.s3_helpers import get_s3_object
+from ecodev_cloud.constants import NPY_EXT
 from ecodev_cloud.constants import SHP_EXT
 from ecodev_cloud.constants import ZIP_EXT
+from ecodev_cloud.disk.disk_helpers import disk_rglob
 from ecodev_cloud.disk.disk_loader import disk_load
+from ecodev_cloud.file_processing.compression_processing import detect_encoding
+from ecodev_cloud.file_processing.compression_processing import GZIP_ENCODING
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfData
+from ecodev_cloud.file_processing.netcdf_processing import NetcdfVariable
 from ecodev_cloud.file_processing.shapely_processing import load_points
+from ecodev_cloud.file_processing.stream_processing import MultipartWriter
+from ecodev_cloud.file_processing.tif_processing import GeoArray
 from ecodev_cloud.path_utils import ROOT_DIRECTORY
 from tests.cloud_safe_test_case import CloudSafeTestCase
 
@@ -31,6 +51,7 @@ CLOUDS: dict[Cloud, str] = {
     Cloud.AZURE: TEST_CONTAINER
 }
 SKOPS_FILE = DATA_DIRECTORY / 'example.skops'
+ZIPPED_DIRECTORY = ROOT_DIRECTORY / 'tests/functional/expected'
 log = logger_get(__name__)
 
 
@@ -63,7 +84,7 @@ def file_provider() -> list[list]:
     Provide config for tests
     """
     return [['example.npy.npz', _np_equal, True],
-            ['example.tif', _gdal_equal, False],
+            ['example.tif', _gdal_equal, True],
             ['example.json', _equal, True],
             ['example.csv', _csv_equal, True],
             ['example.gpkg', _equal, False],
@@ -73,7 +94,7 @@ def file_provider() -> list[list]:
             ['example.npy', _np_equal, True],
             ['example.tex', _equal, True],
             ['example.xlsx', _xlsx_equal, False],
-            ['example.nc', _nc_equal, False]]
+            ['example.nc', _nc_equal, True]]
 
 
 class LoadSaveTest(CloudSafeTestCase):
@@ -95,6 +116,262 @@ class LoadSaveTest(CloudSafeTestCase):
         """
         self._load_save_helper(Cloud.AZURE, filename, equality, should_save)
 
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_zipped_folder(self, cloud: Cloud):
+        """
+        Test that a folder streamed as a zip archive can be read back member by member
+        """
+        file_path = DATA_DIRECTORY / 'zipped_folder.zip'
+        save_cloud_data(file_path, ZIPPED_DIRECTORY, location=CLOUDS[cloud], cloud=cloud)
+        archive = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        files = [fp for fp in disk_rglob(ZIPPED_DIRECTORY) if fp.is_file()]
+        self.assertCountEqual([name for name in archive.namelist() if not name.endswith('/')],
+                              [str(fp.relative_to(ZIPPED_DIRECTORY)) for fp in files])
+        for fp in files:
+            self.assertEqual(archive.read(str(fp.relative_to(ZIPPED_DIRECTORY))), fp.read_bytes())
+
+    def test_multipart_abort(self):
+        """
+        Test that a multipart upload failing when closed is aborted, not left pending
+        """
+        calls = []
+
+        def upload_part(number: int, _: bytes) -> int:
+            if number == 2:
+                raise IOError('part upload failed')
+            return number
+
+        writer = MultipartWriter(upload_part, lambda _: calls.append('complete'),
+                                 lambda: calls.append('abort'), part_size=4)
+        writer.write(b'more than a part')
+        with self.assertRaises(IOError):
+            writer.close()
+        self.assertEqual(calls, ['abort'])
+
+    @parameterized.expand([[Cloud.AWS, 'example.csv', _csv_equal],
+                           [Cloud.AZURE, 'example.csv', _csv_equal],
+                           [Cloud.AWS, 'example.json', _equal],
+                           [Cloud.AZURE, 'example.json', _equal]])
+    def test_compressed_save(self, cloud: Cloud, filename: str, equality: Callable):
+        """
+        Test that gzip compressed text files are smaller once stored, and loaded transparently
+        """
+        local_data = disk_load(DATA_DIRECTORY / filename)
+        file_path = DATA_DIRECTORY / f'compressed/{filename}'
+        save_cloud_data(file_path, local_data, location=CLOUDS[cloud], cloud=cloud,
+                        compression=GZIP_ENCODING)
+        raw = get_blob_object(file_path, location=CLOUDS[cloud]) if cloud == Cloud.AZURE \
+            else get_s3_object(file_path, byte=False, location=CLOUDS[cloud])
+        self.assertEqual(detect_encoding(raw), GZIP_ENCODING)
+        cloud_data = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertTrue(equality(cloud_data, local_data))
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cog_save(self, cloud: Cloud):
+        """
+        Test that georeferenced arrays are saved as tiled Cloud Optimized GeoTIFFs with overviews
+        """
+        tile = disk_load(DATA_DIRECTORY / 'example.tif')
+        data = GeoArray(tile.ReadAsArray(), tile.GetGeoTransform(), tile.GetProjection())
+        file_path = DATA_DIRECTORY / 'cog/example.tif'
+        save_cloud_data(file_path, data, location=CLOUDS[cloud], cloud=cloud)
+        cloud_tile = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertTrue(np.array_equal(cloud_tile.ReadAsArray(), data.array))
+        self.assertEqual(cloud_tile.GetGeoTransform(), data.geotransform)
+        self.assertEqual(cloud_tile.GetMetadata('IMAGE_STRUCTURE').get('LAYOUT'), 'COG')
+        self.assertGreater(cloud_tile.GetRasterBand(1).GetOverviewCount(), 0)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_netcdf_save(self, cloud: Cloud):
+        """
+        Test that arrays saved as netcdf are chunked and compressed, and loaded back unchanged
+        """
+        values = np.arange(200 * 300, dtype=np.float32).reshape(200, 300)
+        data = NetcdfData(dimensions={'lat': 200, 'lon': 300},
+                          variables={'tas': NetcdfVariable(values, ('lat', 'lon'),
+                                                           {'units': 'K'}, (50, 100))},
+                          attributes={'title': 'example'})
+        file_path = DATA_DIRECTORY / 'chunked/example.nc'
+        save_cloud_data(file_path, data, location=CLOUDS[cloud], cloud=cloud)
+        dataset = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertTrue(np.array_equal(dataset['tas'][:], values))
+        self.assertEqual(dataset['tas'].chunking(), [50, 100])
+        self.assertTrue(dataset['tas'].filters()['zlib'])
+        self.assertEqual(dataset['tas'].units, 'K')
+        self.assertEqual(dataset.title, 'example')
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_gpkg_save(self, cloud: Cloud):
+        """
+        Test that features saved as a GeoPackage can be loaded filtered by bbox and attributes
+        """
+        features = [{'geometry': Point(x, y), 'properties': {'name': f'{x}_{y}', 'value': x * y}}
+                    for x, y in itertools.product(range(10), range(10))]
+        file_path = DATA_DIRECTORY / 'indexed/example.gpkg'
+        save_cloud_data(file_path, features, location=CLOUDS[cloud], cloud=cloud)
+        loaded = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertEqual(len(loaded), 100)
+        in_box = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud,
+                                 bbox=(-0.5, -0.5, 2.5, 1.5))
+        self.assertCountEqual([feature['properties']['name'] for feature in in_box],
+                              ['0_0', '0_1', '1_0', '1_1', '2_0', '2_1'])
+        matching = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud,
+                                   bbox=(-0.5, -0.5, 9.5, 9.5), where='value >= 72')
+        self.assertCountEqual([feature['properties']['value'] for feature in matching],
+                              [72, 72, 81])
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_gpkg_widened_types(self, cloud: Cloud):
+        """
+        Test that properties holding values of several types are saved with the widest one
+        """
+        features = [{'geometry': Point(0, 0), 'properties': {'value': 1, 'label': 2}},
+                    {'geometry': Point(1, 1), 'properties': {'value': 2.5, 'label': 'b'}},
+                    {'geometry': Point(2, 2), 'properties': {'value': None, 'label': 3}}]
+        file_path = DATA_DIRECTORY / 'widened/example.gpkg'
+        save_cloud_data(file_path, features, location=CLOUDS[cloud], cloud=cloud)
+        loaded = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertEqual([feature['properties']['value'] for feature in loaded], [1., 2.5, None])
+        self.assertEqual([feature['properties']['label'] for feature in loaded], ['2', 'b', '3'])
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cloud_iter_load(self, cloud: Cloud):
+        """
+        Test that prefetched loads are yielded in order, out of a prefix or of explicit paths
+        """
+        folder = DATA_DIRECTORY / 'iter_load'
+        arrays = {folder / f'array_{index}.npy': np.full(10, index) for index in range(5)}
+        save_cloud_batch(arrays, cloud=cloud, location=CLOUDS[cloud])
+        sources: list[Path | list[Path]] = [folder, list(arrays)]
+        for source in sources:
+            loaded = list(cloud_iter_load(source, NPY_EXT, prefetch=2, cloud=cloud,
+                                          location=CLOUDS[cloud]))
+            self.assertCountEqual([file_path for file_path, _ in loaded], list(arrays))
+            for file_path, data in loaded:
+                self.assertTrue(_np_equal(data, arrays[file_path]))
+        first = next(cloud_iter_load(list(arrays), cloud=cloud, location=CLOUDS[cloud]))
+        self.assertEqual(first[0], list(arrays)[0])
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_batch_failure(self, cloud: Cloud):
+        """
+        Test that a batch load raises when one of its objects cannot be loaded
+        """
+        folder = DATA_DIRECTORY / 'batch_failure'
+        arrays = {folder / f'array_{index}.npy': np.full(10, index) for index in range(3)}
+        save_cloud_batch(arrays, cloud=cloud, location=CLOUDS[cloud])
+        self.assertEqual(len(load_cloud_batch(arrays, cloud=cloud, location=CLOUDS[cloud])), 3)
+        with self.assertRaises(Exception):
+            load_cloud_batch([*arrays, folder / 'missing.npy'], cloud=cloud,
+                             location=CLOUDS[cloud])
+        self.assertIsNone(load_cloud_data(folder / 'missing.npy', cloud=cloud,
+                                          location=CLOUDS[cloud]))
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_missing_stream_objects(self, cloud: Cloud):
+        """
+        Test that failed loads and saves of streamed extensions (missing objects, unzippable
+         data) are logged and None returned, unless strict
+        """
+        for name in ['missing.tif', 'missing.zip']:
+            self.assertIsNone(load_cloud_data(DATA_DIRECTORY / name, cloud=cloud,
+                                              location=CLOUDS[cloud]))
+            with self.assertRaises(Exception):
+                load_cloud_data(DATA_DIRECTORY / name, cloud=cloud, location=CLOUDS[cloud],
+                                strict=True)
+        save_cloud_data(DATA_DIRECTORY / 'failed.zip', {}, cloud=cloud, location=CLOUDS[cloud])
+        with self.assertRaises(Exception):
+            save_cloud_data(DATA_DIRECTORY / 'failed.zip', {}, cloud=cloud,
+                            location=CLOUDS[cloud], strict=True)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_process_decoding(self, cloud: Cloud):
+        """
+        Test that bulk loads decoded in a process pool return transferable data
+        """
+        file_paths = [DATA_DIRECTORY / name for name in ['example.tif', 'example.nc',
+                                                         'example.csv']]
+        for file_path in file_paths:
+            cloud_copy_file(file_path, file_path, location=CLOUDS[cloud], cloud=cloud)
+        tif, nc, csv = file_paths
+        loaded = load_cloud_batch(file_paths, cloud=cloud, location=CLOUDS[cloud], processes=2)
+        self.assertTrue(np.array_equal(loaded[tif], disk_load(tif).ReadAsArray()))
+        self.assertTrue(np.allclose(loaded[nc]['tas'], disk_load(nc)['tas'][:]))
+        self.assertTrue(loaded[csv].equals(disk_load(csv)))
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_decoding_backlog(self, cloud: Cloud):
+        """
+        Test that bulk loads decoded in a process pool hold at most DECODING_BACKLOG payloads per
+         process in shared memory
+        """
+        local_data = disk_load(DATA_DIRECTORY / 'example.csv')
+        file_paths = [DATA_DIRECTORY / f'backlog/{index}.csv' for index in range(10)]
+        save_cloud_batch({file_path: local_data for file_path in file_paths}, cloud=cloud,
+                         location=CLOUDS[cloud])
+        payload, release = cloud_decoding.SharedPayload, cloud_decoding._release
+        lock, held, most = threading.Lock(), [0], [0]
+
+        def counted_payload(data: bytes) -> cloud_decoding.SharedPayload:
+            with lock:
+                held[0] += 1
+                most[0] = max(most[0], held[0])
+            return payload(data)
+
+        def counted_release(*args) -> None:
+            with lock:
+                held[0] -= 1
+            release(*args)
+
+        with mock.patch.object(cloud_decoding, 'SharedPayload', counted_payload), \
+                mock.patch.object(cloud_decoding, '_release', counted_release):
+            loaded = load_cloud_batch(file_paths, cloud=cloud, location=CLOUDS[cloud],
+                                      processes=1, max_workers=8)
+        self.assertTrue(all(loaded[file_path].equals(local_data) for file_path in file_paths))
+        self.assertLessEqual(most[0], cloud_decoding.DECODING_BACKLOG)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_zero_copy_npy(self, cloud: Cloud):
+        """
+        Test that loaded npy arrays are views on the downloaded buffer (no copy)
+        """
+        file_path = DATA_DIRECTORY / 'example.npy'
+        save_cloud_data(file_path, disk_load(file_path), location=CLOUDS[cloud], cloud=cloud)
+        cloud_data = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud)
+        self.assertFalse(cloud_data.flags.owndata)
+        self.assertTrue(_np_equal(cloud_data, disk_load(file_path)))
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_mmap_npy(self, cloud: Cloud):
+        """
+        Test that npy arrays are memory mapped from disk, and from the host cache for clouds
+        """
+        file_path = DATA_DIRECTORY / 'example.npy'
+        local_data = disk_load(file_path, mmap=True)
+        self.assertIsInstance(local_data, np.memmap)
+        save_cloud_data(file_path, disk_load(file_path), location=CLOUDS[cloud], cloud=cloud)
+        for _ in range(2):
+            cloud_data = load_cloud_data(file_path, location=CLOUDS[cloud], cloud=cloud, mmap=True)
+            self.assertIsInstance(cloud_data, np.memmap)
+            self.assertTrue(_np_equal(cloud_data, local_data))
+        with self.assertRaises(AttributeError):
+            load_cloud_data(DATA_DIRECTORY / 'example.csv', cloud=cloud, mmap=True)
+
+    @parameterized.expand([[Cloud.AWS], [Cloud.AZURE]])
+    def test_cache_versions(self, cloud: Cloud):
+        """
+        Test that caching a new version of an object deletes the older one, and that eviction
+         trims the cache
+        """
+        file_path = DATA_DIRECTORY / 'versioned/array.npy'
+        for index in range(2):
+            save_cloud_data(file_path, np.full(10, index), location=CLOUDS[cloud], cloud=cloud)
+            local_path = cached_download(file_path, cloud, CLOUDS[cloud])
+            self.assertEqual(list(local_path.parent.iterdir()), [local_path])
+        evict(0, keep=local_path)
+        self.assertEqual([path for path in cache_folder().rglob('*') if path.is_file()],
+                         [local_path])
+
     def test_erroneous_s3_load_save(self):
         """
         Test erroneous s3 load save